@@ -0,0 +1,170 @@
+"""Importação de pedidos do Bling contra um servidor falso local.
+
+Sobe um servidor HTTP que imita ``GET /pedidos/vendas`` (listagem
+paginada, sem itens) e ``GET /pedidos/vendas/{id}`` (detalhe), com
+latência configurável, cria vendedores conectados e roda
+``import_all_vendors``. Mostra pedidos/min no total e por vendedor,
+chamadas à API e a vazão sem a cota (``--rate`` alto), que é o teto do
+lado do banco.
+
+    python benchmarks/bling_orders.py --vendors 8 --orders 60
+    python benchmarks/bling_orders.py --vendors 8 --orders 2000 --rate 1000
+
+A cota real é 3 req/s por conta e cada pedido custa um GET de detalhe:
+~180 pedidos/min por vendedor. Usa um SQLite temporário.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRODUCTS = 500
+
+
+class FakeBling(BaseHTTPRequestHandler):
+    orders = {}  # token -> [payload de detalhe]
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        with self.lock:
+            FakeBling.calls += 1
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        orders = self.orders.get(token)
+        url = urlparse(self.path)
+        if orders is None:
+            return self._send(401, {"error": "invalid_token"})
+        if url.path == "/pedidos/vendas":
+            query = parse_qs(url.query)
+            page, limit = int(query["pagina"][0]), int(query["limite"][0])
+            chunk = orders[(page - 1) * limit : page * limit]
+            return self._send(200, {"data": [{"id": o["id"], "numero": o["numero"]} for o in chunk]})
+        match = re.fullmatch(r"/pedidos/vendas/(\d+)", url.path)
+        if match:
+            for payload in orders:
+                if payload["id"] == int(match.group(1)):
+                    return self._send(200, {"data": payload})
+        self._send(404, {"error": "not_found"})
+
+
+def _order_payload(order_id, rng):
+    return {
+        "id": order_id,
+        "numero": order_id % 100000,
+        "data": "2026-10-18",
+        "contato": {"nome": f"Cliente {order_id}", "numeroDocumento": "12345678909"},
+        "transporte": {"etiqueta": {"cep": f"{rng.randint(1000, 99999):05d}000", "uf": "SP"}},
+        "itens": [
+            {"codigo": f"BLG-{rng.randint(1, PRODUCTS):05d}", "quantidade": rng.randint(1, 3)}
+            for _ in range(rng.randint(1, 4))
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vendors", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=60, help="pedidos por vendedor")
+    parser.add_argument("--rate", type=float, default=3, help="req/s por conta (Bling: 3)")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBling)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeBling.latency = args.latency_ms / 1000
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}?timeout=60")
+    os.environ["BLING_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["BLING_RATE_LIMIT"] = str(args.rate)
+    os.environ["BLING_RATE_BURST"] = str(max(3, int(args.rate)))
+
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import func, select
+
+    from fastdrop import create_app
+    from fastdrop.bling.orders import import_all_vendors
+    from fastdrop.extensions import db
+    from fastdrop.models import BlingAccount, Order, OrderItem, Product, User, Vendor
+
+    rng = random.Random(11)
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(
+            Product.__table__.insert(),
+            [
+                {"sku": f"BLG-{i:05d}", "name": f"Produto {i}", "cost_price": 10,
+                 "wholesale_price": 20, "active": True}
+                for i in range(1, PRODUCTS + 1)
+            ],
+        )
+        next_id = 10**9
+        for v in range(args.vendors):
+            user = User(name=f"v{v}", email=f"v{v}@bling.bench", password_hash="-", role="vendor")
+            db.session.add(user)
+            db.session.flush()
+            vendor = Vendor(user_id=user.id, company_name=f"Vendor {v}", bling_connected=True)
+            db.session.add(vendor)
+            db.session.flush()
+            token = f"token-{v}"
+            db.session.add(
+                BlingAccount(
+                    vendor_id=vendor.id, access_token=token, refresh_token="-",
+                    token_expires_at=datetime.utcnow() + timedelta(hours=6),
+                )
+            )
+            FakeBling.orders[token] = [
+                _order_payload(next_id + n, rng) for n in range(args.orders)
+            ]
+            next_id += args.orders
+        db.session.commit()
+
+    started = time.perf_counter()
+    with app.app_context():
+        results = import_all_vendors(max_workers=args.workers)
+        elapsed = time.perf_counter() - started
+        orders = db.session.scalar(select(func.count(Order.id)))
+        items = db.session.scalar(select(func.count(OrderItem.id)))
+
+    total = sum(r.orders for r in results)
+    print(
+        f"{args.vendors} vendedores x {args.orders} pedidos, cota {args.rate:g} req/s por conta, "
+        f"latência {args.latency_ms:g} ms, {args.workers} threads"
+    )
+    print(
+        f"  importados {total} pedidos ({orders} no banco, {items} itens) em {elapsed:.1f}s: "
+        f"{total / elapsed * 60:,.0f} pedidos/min no total, "
+        f"{total / elapsed * 60 / max(1, args.vendors):,.0f} por vendedor"
+    )
+    print(f"  chamadas à API: {FakeBling.calls} ({FakeBling.calls / max(1, total):.2f} por pedido)")
+    return 0 if total == orders == args.vendors * args.orders else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
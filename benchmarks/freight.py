@@ -0,0 +1,190 @@
+"""Cotação de frete em lote (10k SKUs x um CEP).
+
+Gera uma tabela de frete sintética (3 serviços, faixas de CEP por UF,
+10 faixas de peso) e um catálogo com peso e medidas, e mede:
+
+- um laço Python por produto (referência, sem NumPy);
+- ``quote_skus`` com a zona fria (calcula o catálogo todo) e memoizada;
+- ``POST /vendor/freight/quotes`` com 10k SKUs, incluindo o JSON;
+- ``POST /vendor/freight/cart`` com um carrinho de 5 itens.
+
+    python benchmarks/freight.py --products 50000 --skus 10000
+
+Usa um SQLite temporário (o banco e a tabela de frete são criados aqui).
+"""
+import argparse
+import bisect
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "bench-freight"
+WEIGHT_BANDS = [0.3, 0.5, 1, 2, 3, 5, 10, 15, 20, 30]
+SERVICES = [
+    # (transportadora, serviço, preço base, R$/kg, prazo base, divisor cúbico, R$/kg extra)
+    ("Correios", "PAC", 16.0, 2.2, 4, 6000, None),
+    ("Correios", "SEDEX", 24.0, 4.1, 1, 6000, None),
+    ("Rodonaves", "Rodoviário", 28.0, 1.3, 5, 3333, 1.9),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def write_rate_table(path):
+    from fastdrop.geo import CEP_RANGES, STATE_CAPITALS, distance_km
+
+    origin = STATE_CAPITALS["SP"]
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(
+            ["carrier", "service", "cep_start", "cep_end", "weight_max", "price", "days",
+             "extra_kg_price", "cubic_divisor"]
+        )
+        for carrier, service, base, per_kg, days, divisor, extra in SERVICES:
+            for start, end, state in CEP_RANGES:
+                km = distance_km(origin, STATE_CAPITALS[state])
+                if service == "Rodoviário" and km > 2500:
+                    continue  # não atende o Norte
+                factor = 1 + km / 1500
+                for band in WEIGHT_BANDS:
+                    writer.writerow(
+                        [carrier, service, f"{start:05d}000", f"{end:05d}999", band,
+                         round((base + per_kg * band) * factor, 2), days + int(km // 800),
+                         extra or "", divisor]
+                    )
+
+
+def python_quote(products, rows, cep):
+    """Referência: um produto e um serviço por vez, em Python puro."""
+    quotes = {}
+    for sku, weight, volume in products:
+        prices = []
+        for service in rows:
+            band = next(((w, p) for start, end, w, p in service["ranges"] if start <= cep <= end), None)
+            if band is None or weight is None:
+                prices.append(None)
+                continue
+            billable = max(weight, volume / service["divisor"])
+            index = bisect.bisect_left(band[0], billable)
+            prices.append(band[1][index] if index < len(band[0]) else None)
+        quotes[sku] = prices
+    return quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--skus", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    rates = os.path.join(workdir, "rates.csv")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["FREIGHT_RATES_PATH"] = rates
+
+    from werkzeug.security import generate_password_hash
+
+    from fastdrop import create_app
+    from fastdrop.extensions import db
+    from fastdrop.freight import _zones, quote_skus, rate_table
+    from fastdrop.models import Product, User, Vendor
+
+    write_rate_table(rates)
+    rng = random.Random(7)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(
+            name="bench", email="bench@freight", role="vendor",
+            password_hash=generate_password_hash(PASSWORD),
+        )
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Vendor(user_id=user.id, company_name="Bench"))
+        products = []
+        for i in range(args.products):
+            weight = None if rng.random() < 0.02 else round(rng.lognormvariate(0, 1), 3)
+            dims = [round(rng.uniform(5, 80), 1) for _ in range(3)]
+            products.append(
+                {"sku": f"FRT-{i:06d}", "name": f"Produto {i}", "cost_price": 10,
+                 "wholesale_price": 20, "weight": weight, "length": dims[0],
+                 "width": dims[1], "height": dims[2], "active": True}
+            )
+        db.session.execute(Product.__table__.insert(), products)
+        db.session.commit()
+
+        table = rate_table()
+        skus = [p["sku"] for p in rng.sample(products, args.skus)]
+        ceps = ["01310100", "30130000", "40020000", "69005000", "90010000"]
+
+        # referência em Python puro
+        by_sku = {p["sku"]: p for p in products}
+        plain = [
+            (sku, float(by_sku[sku]["weight"]) if by_sku[sku]["weight"] else None,
+             by_sku[sku]["length"] * by_sku[sku]["width"] * by_sku[sku]["height"])
+            for sku in skus
+        ]
+        rows = [
+            {"divisor": s.cubic_divisor,
+             "ranges": [(int(a), int(b), list(band.weight_max), list(band.price))
+                        for a, b, band in zip(s.starts, s.ends, s.bands)]}
+            for s in table.services
+        ]
+        started = time.perf_counter()
+        python_quote(plain, rows, int(ceps[0]))
+        python_ms = (time.perf_counter() - started) * 1000
+
+        _zones.clear()
+        started = time.perf_counter()
+        quote_skus(ceps[0], skus)
+        cold_ms = (time.perf_counter() - started) * 1000
+        warm = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            quote_skus(ceps[0], skus)
+            warm.append((time.perf_counter() - started) * 1000)
+        dialect = db.engine.dialect.name
+
+    client = app.test_client()
+    client.post("/login", data={"email": "bench@freight", "password": PASSWORD})
+    http = []
+    for n in range(args.requests):
+        started = time.perf_counter()
+        resp = client.post("/vendor/freight/quotes", json={"cep": ceps[n % len(ceps)], "skus": skus})
+        http.append((time.perf_counter() - started) * 1000)
+        assert resp.status_code == 200, resp.get_data(as_text=True)[:200]
+    body = resp.get_json()
+    weighed = [sku for sku in skus if by_sku[sku]["weight"]]
+    cart = [{"sku": sku, "quantity": rng.randint(1, 3)} for sku in weighed[:5]]
+    cart_ms = []
+    for n in range(args.requests):
+        started = time.perf_counter()
+        resp = client.post("/vendor/freight/cart", json={"cep": ceps[n % len(ceps)], "items": cart})
+        cart_ms.append((time.perf_counter() - started) * 1000)
+    cart_body = resp.get_json()
+
+    print(f"banco: {dialect}, {args.products} produtos, {len(table.services)} serviços, "
+          f"{args.skus} SKUs por cotação")
+    print(f"  python por produto   {python_ms:8.1f} ms")
+    print(f"  quote_skus (fria)    {cold_ms:8.1f} ms  (carrega catálogo + zona)")
+    print(f"  quote_skus (memo)    p50 {percentile(warm, 50):6.2f}  p95 {percentile(warm, 95):6.2f} ms")
+    print(f"  POST freight/quotes  p50 {percentile(http, 50):6.1f}  p95 {percentile(http, 95):6.1f} ms  "
+          f"({len(body['skus'])} SKUs, {len(body['services'])} serviços em {body['cep']})")
+    print(f"  POST freight/cart    p50 {percentile(cart_ms, 50):6.1f}  p95 {percentile(cart_ms, 95):6.1f} ms  "
+          f"{[(s['service'], s['price']) for s in cart_body['services']]}")
+    print(f"  média HTTP {statistics.fmean(http):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Tempo de boot: importar ``fastdrop`` e rodar ``create_app()``.
+
+Roda ``python -X importtime`` em processos novos (como um worker do
+gunicorn subindo) e mostra a mediana do tempo total, os pacotes que mais
+pesam e se algum import pesado que deveria ser preguiçoso (boto3,
+requests, numpy, PIL, alembic) foi carregado no boot. Sai com erro se
+passar do orçamento ou se um desses módulos aparecer.
+
+    python benchmarks/import_time.py --runs 7 --budget-ms 1100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# só devem ser importados no primeiro uso (S3, Bling/Mercado Pago, frete,
+# imagens, `flask db`)
+LAZY_MODULES = ("boto3", "botocore", "requests", "urllib3", "numpy", "PIL", "alembic", "flask_migrate")
+
+SNIPPET = f"""
+import json, sys, time
+started = time.perf_counter()
+from fastdrop import create_app
+create_app()
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SNIPPET],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    lines = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip() == "cumulative":
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        lines.append((depth, name.strip().split(".")[0], int(cumulative)))
+
+    # a saída vem em pós-ordem (filhos antes do pai): de trás para frente,
+    # cada pacote conta o cumulativo de onde foi importado por outro pacote;
+    # o que o ``site`` importa é partida do interpretador, não da aplicação
+    packages = defaultdict(int)
+    stack = []
+    for depth, package, cumulative in reversed(lines):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        parents = {parent for _, parent in stack}
+        if package not in parents and "site" not in parents | {package}:
+            packages[package] += cumulative
+        stack.append((depth, package))
+    result["packages"] = packages
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1100,
+                        help="orçamento para a mediana de import + create_app")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'boot.db')}")
+    run_once(env)  # aquece o cache de bytecode e do sistema de arquivos
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    median = statistics.median(r["ms"] for r in runs)
+    packages = defaultdict(list)
+    for r in runs:
+        for name, us in r["packages"].items():
+            packages[name].append(us / 1000)
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+
+    print(f"import + create_app: mediana {median:.0f} ms, "
+          f"mín {min(r['ms'] for r in runs):.0f} ms ({args.runs} processos, com -X importtime)")
+    print("pacotes mais pesados (mediana do cumulativo):")
+    ranked = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    for name, samples in ranked[: args.top]:
+        print(f"  {name:<20} {statistics.median(samples):7.1f} ms")
+
+    failed = False
+    if loaded:
+        print(f"FALHA: importados no boot: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FALHA: {median:.0f} ms acima do orçamento de {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"OK: dentro do orçamento de {args.budget_ms:.0f} ms, nenhum import pesado no boot")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Notificações do Mercado Pago contra um servidor falso local.
+
+Sobe um servidor HTTP que imita ``GET /v1/payments/{id}`` (payload no
+formato da API, ~2 KB), gera pedidos com ``seed_database``, dispara as
+notificações assinadas pelo test client (com reenvios duplicados, como o
+Mercado Pago faz), drena o inbox e mostra:
+
+- notificações recebidas x chamadas à API (deduplicação);
+- pedidos que mudaram de status;
+- bytes que iriam inline em ``payments.raw_response`` x compactados.
+
+    python benchmarks/payment_webhooks.py --payments 2000 --duplicates 3
+
+Usa um SQLite temporário (ou ``DATABASE_URL``; o banco é recriado).
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET = "fake-webhook-secret"
+STATUSES = ["approved"] * 6 + ["pending", "in_process", "rejected", "cancelled", "refunded"]
+
+
+class FakeMercadoPago(BaseHTTPRequestHandler):
+    payments = {}  # id -> (order_id, status, amount)
+    calls = 0
+    bytes_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        payment_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        info = self.payments.get(payment_id)
+        if not self.path.startswith("/v1/payments/") or info is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(_payment_payload(payment_id, *info), indent=2).encode()
+        with self.lock:
+            FakeMercadoPago.calls += 1
+            FakeMercadoPago.bytes_served += len(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _payment_payload(payment_id, order_id, status, amount):
+    return {
+        "id": int(payment_id),
+        "date_created": "2026-10-18T10:00:00.000-03:00",
+        "date_approved": "2026-10-18T10:00:05.000-03:00" if status == "approved" else None,
+        "date_last_updated": "2026-10-18T10:00:05.000-03:00",
+        "money_release_date": "2026-11-01T10:00:05.000-03:00",
+        "operation_type": "regular_payment",
+        "payment_method_id": "pix",
+        "payment_type_id": "bank_transfer",
+        "status": status,
+        "status_detail": "accredited" if status == "approved" else status,
+        "currency_id": "BRL",
+        "description": f"Pedido {order_id} - Fast Drop",
+        "live_mode": True,
+        "collector_id": 123456789,
+        "payer": {
+            "id": "987654321",
+            "email": f"cliente{order_id}@example.com",
+            "identification": {"type": "CPF", "number": "12345678909"},
+            "type": "customer",
+        },
+        "metadata": {"order_id": order_id},
+        "additional_info": {
+            "items": [
+                {
+                    "id": f"SEED-{order_id:08d}",
+                    "title": "Produto",
+                    "quantity": "1",
+                    "unit_price": str(amount),
+                }
+            ],
+            "ip_address": "200.100.50.25",
+        },
+        "external_reference": str(order_id),
+        "transaction_amount": amount,
+        "transaction_amount_refunded": amount if status == "refunded" else 0,
+        "transaction_details": {
+            "net_received_amount": round(amount * 0.99, 2),
+            "total_paid_amount": amount,
+            "overpaid_amount": 0,
+            "installment_amount": 0,
+        },
+        "fee_details": [{"type": "mercadopago_fee", "amount": round(amount * 0.01, 2), "fee_payer": "collector"}],
+        "charges_details": [],
+        "point_of_interaction": {
+            "type": "PIX",
+            "transaction_data": {
+                "qr_code": "00020126580014br.gov.bcb.pix0136" + hashlib.sha256(payment_id.encode()).hexdigest(),
+                "ticket_url": f"https://www.mercadopago.com.br/payments/{payment_id}/ticket",
+            },
+        },
+        "installments": 1,
+        "captured": True,
+        "binary_mode": False,
+    }
+
+
+def _signature(data_id, request_id):
+    ts = str(int(time.time()))
+    manifest = f"id:{data_id};request-id:{request_id};ts:{ts};"
+    digest = hmac.new(SECRET.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    return f"ts={ts},v1={digest}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--duplicates", type=int, default=3, help="Máx. reenvios por pagamento.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeMercadoPago)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}?timeout=60")
+    os.environ["MERCADOPAGO_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["MERCADOPAGO_ACCESS_TOKEN"] = "TEST-token"
+    os.environ["MERCADOPAGO_WEBHOOK_SECRET"] = SECRET
+
+    from sqlalchemy import func, select
+
+    from fastdrop import create_app
+    from fastdrop.extensions import db
+    from fastdrop.models import Order
+    from fastdrop.payments.compaction import storage_stats
+    from fastdrop.payments.notifications import BATCH_SIZE, drain_payment_notifications
+    from fastdrop.seed import seed_database
+
+    rng = random.Random(7)
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_database(vendors=20, products=500, orders=args.payments)
+        order_ids = db.session.scalars(
+            select(Order.id).where(Order.status == "pendente").limit(args.payments)
+        ).all()
+        before = dict(
+            db.session.execute(select(Order.status, func.count()).group_by(Order.status)).all()
+        )
+
+    for n, order_id in enumerate(order_ids):
+        FakeMercadoPago.payments[str(10**9 + n)] = (
+            order_id,
+            rng.choice(STATUSES),
+            round(rng.uniform(20, 900), 2),
+        )
+
+    client = app.test_client()
+    notifications = []
+    for payment_id in FakeMercadoPago.payments:
+        notifications += [payment_id] * rng.randint(1, args.duplicates)
+    rng.shuffle(notifications)
+
+    started = time.perf_counter()
+    for n, payment_id in enumerate(notifications):
+        request_id = f"req-{n}"
+        resp = client.post(
+            f"/payments/webhook?data.id={payment_id}&type=payment",
+            json={"action": "payment.updated", "type": "payment", "data": {"id": payment_id}},
+            headers={"X-Signature": _signature(payment_id, request_id), "X-Request-Id": request_id},
+        )
+        assert resp.status_code == 200, resp.status_code
+    received = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with app.app_context():
+        while drain_payment_notifications() == BATCH_SIZE:
+            pass
+        drained = time.perf_counter() - started
+        after = dict(
+            db.session.execute(select(Order.status, func.count()).group_by(Order.status)).all()
+        )
+        stats = storage_stats()
+
+    print(f"banco: {os.environ['DATABASE_URL'].split(':')[0]}")
+    print(
+        f"webhooks: {len(notifications)} notificações de {len(FakeMercadoPago.payments)} "
+        f"pagamentos em {received:.1f}s ({len(notifications) / received:,.0f}/s)"
+    )
+    print(f"inbox: {FakeMercadoPago.calls} chamadas à API em {drained:.1f}s")
+    print(f"pedidos: {before} -> {after}")
+    print(
+        f"payload bruto: {FakeMercadoPago.bytes_served / 1e6:.2f} MB como veio da API, "
+        f"{stats['original_bytes'] / 1e6:.2f} MB normalizado, "
+        f"{stats['compressed_bytes'] / 1e6:.2f} MB compactado {stats['encodings']} "
+        f"({stats['compressed_bytes'] / FakeMercadoPago.bytes_served:.1%} do inline)"
+    )
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Benchmark da importação de produtos por CSV.
+
+Gera um CSV sintético, importa duas vezes (a segunda é toda de updates)
+e mostra linhas/s de cada passada.
+
+    python benchmarks/product_import.py --rows 100000
+    DATABASE_URL=postgresql://localhost/fastdrop_bench python benchmarks/product_import.py
+
+Sem ``DATABASE_URL`` usa um SQLite temporário. ATENÇÃO: o banco é
+recriado (drop_all/create_all).
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_csv(path, rows, seed=42):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh, delimiter=";")
+        writer.writerow(
+            ["sku", "name", "cost_price", "wholesale_price", "weight", "stock"]
+        )
+        for i in range(rows):
+            cost = rng.randint(100, 50000) / 100
+            writer.writerow(
+                [
+                    f"SKU-{i:07d}",
+                    f"Produto sintético {i}",
+                    f"{cost:.2f}".replace(".", ","),
+                    f"{cost * 1.4:.2f}".replace(".", ","),
+                    f"{rng.randint(50, 20000) / 1000:.3f}".replace(".", ","),
+                    rng.randint(0, 500),
+                ]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from fastdrop import create_app
+    from fastdrop.admin.product_import import import_products_csv
+    from fastdrop.extensions import db
+
+    path = os.path.join(workdir, "products.csv")
+    write_csv(path, args.rows)
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        print(f"banco: {db.engine.dialect.name}, linhas: {args.rows}")
+        for label in ("insert", "update"):
+            started = time.perf_counter()
+            with open(path, "rb") as fh:
+                report = import_products_csv(fh, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{label}: {elapsed:.2f}s ({args.rows / elapsed:,.0f} linhas/s) — "
+                f"{report.created} criados, {report.updated} atualizados, "
+                f"{report.failed} erros"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
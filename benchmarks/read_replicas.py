@@ -0,0 +1,167 @@
+"""Roteamento para réplicas de leitura e espera no pool de conexões.
+
+Sem ``DATABASE_URL``/``DATABASE_REPLICA_URLS``, cria um SQLite primário
+com dados do seed e copia o arquivo como "réplica" (a cópia não recebe
+as escritas seguintes, o que deixa visível de onde cada leitura veio).
+Mostra:
+
+- quantos statements cada engine executou em ``GET``/``POST``;
+- que o ``GET`` logo depois de uma escrita lê do primário (cookie com
+  prazo ``DB_REPLICA_STICKY_SECONDS``) e volta à réplica depois;
+- a espera no checkout com várias threads disputando um pool pequeno
+  (``DB_POOL_SIZE``/``DB_MAX_OVERFLOW``), a partir de ``pool_metrics``.
+
+    python benchmarks/read_replicas.py --threads 16 --pool-size 2
+
+Com URLs de Postgres no ambiente, usa os bancos como estão (precisam ter
+o schema e o seed).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def prepare_sqlite(args):
+    workdir = tempfile.mkdtemp()
+    primary = os.path.join(workdir, "primary.db")
+    replica = os.path.join(workdir, "replica.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{primary}?timeout=30"
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+    from fastdrop import create_app
+    from fastdrop.extensions import db
+    from fastdrop.search import ensure_search_index
+    from fastdrop.seed import seed_database
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed_database(vendors=5, products=args.products, orders=args.orders)
+        ensure_search_index()
+        db.engine.dispose()
+    shutil.copyfile(primary, replica)
+    os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{replica}?timeout=30"
+
+
+def count_statements(app):
+    from sqlalchemy import event
+
+    from fastdrop.extensions import db
+
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = key or "primary"
+            event.listen(
+                engine,
+                "before_cursor_execute",
+                lambda *a, name=name, **kw: counts.update([name]),
+            )
+    return counts
+
+
+def step(client, counts, label, method, url, **kwargs):
+    counts.clear()
+    resp = getattr(client, method)(url, **kwargs)
+    engines = ", ".join(f"{name}={n}" for name, n in sorted(counts.items())) or "nenhum"
+    print(f"  {label:<34} {resp.status_code}  {engines}")
+    return resp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_REPLICA_STICKY_SECONDS", "1")
+    os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    if not os.environ.get("DATABASE_REPLICA_URLS"):
+        prepare_sqlite(args)
+
+    from fastdrop import create_app
+    from fastdrop.db_routing import STICKY_SECONDS, pool_metrics
+    from fastdrop.extensions import db
+    from fastdrop.models import Product, User
+    from fastdrop.seed import SEED_ADMIN_EMAIL, SEED_PASSWORD
+
+    app = create_app()
+    counts = count_statements(app)
+    with app.app_context():
+        vendor_email = db.session.scalar(
+            db.select(User.email).where(User.role == "vendor").order_by(User.id).limit(1)
+        )
+        product = db.session.scalar(db.select(Product).order_by(Product.id).limit(1))
+        form = {
+            "name": f"{product.name} (editado)",
+            "sku": product.sku,
+            "cost_price": str(product.cost_price),
+            "wholesale_price": str(product.wholesale_price),
+            "description": product.description or "",
+            "stock": str(product.stock.estoque_total if product.stock else 0),
+        }
+        product_id = product.id
+    print(f"réplicas: {app.config['DATABASE_REPLICAS']}, sticky {STICKY_SECONDS:g}s")
+
+    admin = app.test_client()
+    step(admin, counts, "POST /login (admin)", "post", "/login",
+         data={"email": SEED_ADMIN_EMAIL, "password": SEED_PASSWORD})
+    step(admin, counts, "GET /admin/products", "get", "/admin/products")
+    step(admin, counts, f"POST /admin/products/{product_id}/edit", "post",
+         f"/admin/products/{product_id}/edit", data=form)
+    resp = step(admin, counts, "GET /admin/products (logo após)", "get", "/admin/products")
+    fresh = form["name"] in resp.get_data(as_text=True)
+    time.sleep(STICKY_SECONDS + 0.2)
+    resp = step(admin, counts, "GET /admin/products (após prazo)", "get", "/admin/products")
+    stale = form["name"] not in resp.get_data(as_text=True)
+    print(f"  leu a própria escrita: {fresh}; depois do prazo leu a réplica: {stale}")
+
+    # disputa pelo pool: cada thread com seu cliente logado
+    clients = []
+    for _ in range(args.threads):
+        client = app.test_client()
+        client.post("/login", data={"email": vendor_email, "password": SEED_PASSWORD})
+        clients.append(client)
+
+    def hit(n):
+        client = clients[n % len(clients)]
+        started = time.perf_counter()
+        resp = client.get(f"/vendor/catalog?format=json&q=produto&offset={n % 50}")
+        return resp.status_code, (time.perf_counter() - started) * 1000
+
+    counts.clear()
+    pool_metrics.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        results = list(executor.map(hit, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    statuses = Counter(status for status, _ in results)
+    print(
+        f"{args.requests} GET /vendor/catalog em {args.threads} threads, pool "
+        f"{args.pool_size}+{os.environ['DB_MAX_OVERFLOW']}: {elapsed:.2f}s "
+        f"({args.requests / elapsed:,.0f} req/s), status {dict(statuses)}"
+    )
+    print(f"  statements por engine: {dict(counts)}")
+    for name, row in pool_metrics.snapshot().items():
+        print(
+            f"  pool {name}: {row['checkouts']} checkouts, espera média "
+            f"{row['wait_ms_avg']} ms, máx {row['wait_ms_max']} ms, "
+            f"timeouts {row['timeouts']}"
+        )
+        print(f"    histograma (ms): {row['wait_ms_histogram']}")
+    return 0 if fresh and statuses.keys() == {200} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Benchmark das rotas principais (latência, vazão e consultas por requisição).
+
+Roda o ``create_app()`` em processo com o test client do Flask, sem
+servidor HTTP: mede o custo do app + banco. Faz login como admin e como
+um vendedor da massa gerada por ``flask seed``, aquece cada rota e depois
+mede p50/p95/p99, requisições/s e consultas (via ``Server-Timing`` do
+``SQL_PROFILING``). As rotas ``*.304`` repetem o ``If-None-Match`` da
+primeira resposta, como um navegador recarregando a página.
+
+    flask seed --create-tables --vendors 1000 --products 100000 --orders 500000
+    python benchmarks/routes.py --requests 300 --threads 4 --output runs/base.json
+    python benchmarks/routes.py --compare runs/base.json --max-regression 0.2
+
+Usa o banco de ``DATABASE_URL`` (ou o ``sqlite:///fastdrop.db`` padrão).
+Com ``--compare``, sai com código 1 se o p95 de alguma rota piorar mais que
+``--max-regression`` (fração) em relação ao arquivo anterior.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (nome, login, url, revalida com If-None-Match)
+ROUTES = [
+    ("auth.login", None, "/login", False),
+    ("admin.dashboard", "admin", "/admin/dashboard", False),
+    ("admin.list_products", "admin", "/admin/products", False),
+    ("admin.list_products.304", "admin", "/admin/products", True),
+    ("admin.orders", "admin", "/admin/orders", False),
+    ("admin.orders.status", "admin", "/admin/orders?status=cancelado", False),
+    ("vendor.dashboard", "vendor", "/vendor/dashboard", False),
+    ("vendor.catalog", "vendor", "/vendor/catalog", False),
+    ("vendor.catalog.304", "vendor", "/vendor/catalog", True),
+    ("vendor.catalog.json", "vendor", "/vendor/catalog?format=json", False),
+    ("vendor.catalog.q", "vendor", "/vendor/catalog?q=caneca+inox", False),
+    ("vendor.catalog_search", "vendor", "/vendor/catalog/search?q=cam", False),
+]
+
+_QUERIES = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_client(app, role, credentials):
+    client = app.test_client()
+    if role is not None:
+        email, password = credentials[role]
+        response = client.post("/login", data={"email": email, "password": password})
+        if response.status_code != 302:
+            raise SystemExit(f"login de {role} falhou ({email})")
+    return client
+
+
+def bench_route(app, credentials, role, url, requests, threads, warmup, conditional=False):
+    clients = [make_client(app, role, credentials) for _ in range(threads)]
+    for _ in range(warmup):
+        clients[0].get(url)
+    headers = {}
+    if conditional:
+        etag = clients[0].get(url).headers.get("ETag")
+        if etag:
+            headers["If-None-Match"] = etag
+
+    latencies, queries, db_ms, statuses = [], [], [], {}
+    lock = threading.Lock()
+
+    def worker(client, count):
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            match = _QUERIES.search(response.headers.get("Server-Timing", ""))
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if match:
+                    db_ms.append(float(match.group(1)))
+                    queries.append(int(match.group(2)))
+
+    per_thread = [requests // threads + (i < requests % threads) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for client, count in zip(clients, per_thread):
+            pool.submit(worker, client, count)
+    wall = time.perf_counter() - started
+
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "queries_avg": statistics.fmean(queries) if queries else None,
+        "queries_max": max(queries) if queries else None,
+        "db_ms_avg": statistics.fmean(db_ms) if db_ms else None,
+    }
+
+
+def compare(current, previous_path, max_regression):
+    with open(previous_path, encoding="utf-8") as fh:
+        previous = json.load(fh)["routes"]
+    regressions = []
+    print(f"\ncomparação com {previous_path}:")
+    for name, result in current.items():
+        before = previous.get(name)
+        if not before or not before["p95_ms"]:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        flag = ""
+        if change > max_regression:
+            flag = "  <-- regressão"
+            regressions.append(name)
+        print(
+            f"  {name:24} p95 {before['p95_ms']:8.1f} -> {result['p95_ms']:8.1f} ms "
+            f"({change:+.0%}); consultas {before.get('queries_avg')} -> "
+            f"{result.get('queries_avg')}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Por rota.")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--route", action="append", help="Só estas rotas (nome).")
+    parser.add_argument("--output", help="Grava o resultado em JSON.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SQL_PROFILING", "1")
+
+    import logging
+
+    from fastdrop import create_app
+    from fastdrop.models import User
+    from fastdrop.seed import SEED_ADMIN_EMAIL, SEED_PASSWORD
+
+    # uma linha de log por requisição distorceria a medição
+    logging.getLogger("fastdrop.perf").setLevel(logging.WARNING)
+
+    app = create_app()
+    with app.app_context():
+        vendor = (
+            User.query.filter_by(role="vendor", active=True)
+            .filter(User.email.like("%@seed.fastdrop.local"))
+            .order_by(User.id)
+            .first()
+        )
+        if vendor is None:
+            raise SystemExit("banco sem massa de dados: rode `flask seed` antes")
+        credentials = {
+            "admin": (SEED_ADMIN_EMAIL, SEED_PASSWORD),
+            "vendor": (vendor.email, SEED_PASSWORD),
+        }
+        dialect = app.extensions["sqlalchemy"].engine.dialect.name
+
+    routes = [r for r in ROUTES if not args.route or r[0] in args.route]
+    results = {}
+    print(f"banco: {dialect}, {args.requests} requisições/rota, {args.threads} threads")
+    for name, role, url, conditional in routes:
+        result = bench_route(
+            app,
+            credentials,
+            role,
+            url,
+            args.requests,
+            args.threads,
+            args.warmup,
+            conditional,
+        )
+        results[name] = result
+        queries = result["queries_avg"]
+        print(
+            f"  {name:24} p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  "
+            f"p99 {result['p99_ms']:7.1f} ms  {result['throughput_rps']:7.1f} req/s  "
+            f"{'-' if queries is None else f'{queries:.1f}'} consultas"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "database": dialect,
+                    "python": platform.python_version(),
+                    "requests": args.requests,
+                    "threads": args.threads,
+                    "routes": results,
+                },
+                fh,
+                indent=2,
+            )
+        print(f"resultado gravado em {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"regressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
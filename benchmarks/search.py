@@ -0,0 +1,108 @@
+"""Latência da busca de produtos (autocomplete e catálogo com ``q``).
+
+Gera consultas variadas a partir dos próprios produtos do banco: prefixos
+de palavras do nome (como alguém digitando), nomes com duas palavras,
+prefixos de SKU e SKUs parciais. Cada consulta é distinta, então o cache
+de respostas do catálogo não interfere; mede direto as funções de busca.
+
+    flask seed --create-tables --products 500000 --orders 20000
+    python benchmarks/search.py --queries 500 --max-p95 20
+
+Usa o banco de ``DATABASE_URL``. Com ``--max-p95``, sai com código 1 se o
+p95 do autocomplete passar do limite (ms).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_queries(rows, count, rng):
+    queries = []
+    for _ in range(count):
+        sku, name = rng.choice(rows)
+        words = name.split()
+        kind = rng.randrange(4)
+        if kind == 0:
+            word = rng.choice(words)
+            queries.append(word[: rng.randint(2, max(2, len(word)))])
+        elif kind == 1:
+            start = rng.randrange(max(1, len(words) - 1))
+            queries.append(" ".join(words[start : start + 2]))
+        elif kind == 2:
+            queries.append(sku[: rng.randint(3, len(sku))])
+        else:
+            queries.append(sku[-rng.randint(3, 6) :])
+    return queries
+
+
+def measure(label, queries, fn):
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(len(fn(q)))
+        latencies.append((time.perf_counter() - started) * 1000)
+    empty = sum(1 for n in results if n == 0)
+    print(
+        f"  {label:14} p50 {percentile(latencies, 50):6.1f}  p95 {percentile(latencies, 95):6.1f}  "
+        f"p99 {percentile(latencies, 99):6.1f} ms  média {statistics.fmean(results):5.1f} "
+        f"resultados, {empty} sem resultado"
+    )
+    return percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-p95", type=float, help="Limite de p95 do autocomplete (ms).")
+    args = parser.parse_args()
+
+    from sqlalchemy import func, select
+
+    from fastdrop import create_app
+    from fastdrop.extensions import db
+    from fastdrop.models import Product
+    from fastdrop.search import search_index_exists
+    from fastdrop.vendor.catalog import CatalogFilters, autocomplete, fetch_catalog_page
+
+    rng = random.Random(args.seed)
+    app = create_app()
+    with app.app_context():
+        if not search_index_exists():
+            raise SystemExit("índice de busca ausente: rode `flask search init`")
+        total = db.session.scalar(select(func.count(Product.id)))
+        rows = db.session.execute(
+            select(Product.sku, Product.name).order_by(func.random()).limit(2000)
+        ).all()
+        queries = make_queries(rows, args.queries, rng)
+        dialect = db.engine.dialect.name
+
+        print(f"banco: {dialect}, {total} produtos, {len(queries)} consultas")
+        for q in queries[:20]:
+            autocomplete(q)  # aquece cache de páginas do banco
+        p95 = measure("autocomplete", queries, autocomplete)
+        measure(
+            "catálogo",
+            queries,
+            lambda q: fetch_catalog_page(CatalogFilters(q=q)).products,
+        )
+
+    if args.max_p95 is not None and p95 > args.max_p95:
+        print(f"p95 do autocomplete acima de {args.max_p95} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Alocação de pedidos entre vários CDs.
+
+Cria CDs em regiões diferentes, produtos com saldo espalhado entre eles
+e pedidos em separação com CEPs do país inteiro; roda ``allocate_all`` e
+mostra vazão, pedidos divididos, distância média e a checagem de
+oversell. Depois repõe o saldo de parte dos produtos, cria uma segunda
+leva de pedidos e aloca de novo, para mostrar o índice em memória sendo
+atualizado só pelos produtos que mudaram.
+
+    python benchmarks/stock_allocation.py --orders 20000 --products 5000
+
+Sem ``DATABASE_URL`` usa um SQLite temporário. ATENÇÃO: o banco é
+recriado (drop_all/create_all).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WAREHOUSES = [
+    ("CD-SP", "Cajamar", "07750000", 0),
+    ("CD-MG", "Contagem", "32000000", 0),
+    ("CD-PR", "Curitiba", "81000000", 0),
+    ("CD-PE", "Recife", "54000000", 0),
+    ("CD-GO", "Aparecida de Goiânia", "74900000", 1),
+    ("CD-RS", "Canoas", "92000000", 1),
+]
+# peso de cada faixa de CEP nos pedidos (Sudeste concentra a demanda)
+DESTINATIONS = [
+    ((1000, 19999), 35),
+    ((20000, 28999), 12),
+    ((30000, 39999), 12),
+    ((40000, 65999), 15),
+    ((66000, 69999), 4),
+    ((70000, 79999), 8),
+    ((80000, 99999), 14),
+]
+
+
+def build(args, rng):
+    from fastdrop.extensions import db
+    from fastdrop.models import Product, ProductStock, User, Vendor, Warehouse
+
+    now = datetime.utcnow()
+    db.session.add_all(
+        Warehouse(code=code, name=name, postal_code=cep, priority=priority)
+        for code, name, cep, priority in WAREHOUSES
+    )
+    user = User(name="bench", email="bench@fastdrop", password_hash="-")
+    db.session.add(user)
+    db.session.flush()
+    vendor = Vendor(user_id=user.id, company_name="Bench")
+    db.session.add(vendor)
+    db.session.flush()
+
+    db.session.execute(
+        Product.__table__.insert(),
+        [
+            {
+                "id": pid,
+                "sku": f"ALLOC-{pid:06d}",
+                "name": f"Produto {pid}",
+                "cost_price": 10,
+                "wholesale_price": 20,
+                "active": True,
+            }
+            for pid in range(1, args.products + 1)
+        ],
+    )
+    codes = [code for code, *_ in WAREHOUSES]
+    stock_rows = []
+    for pid in range(1, args.products + 1):
+        # cada produto em 1 a 4 CDs; o CD-SP tem quase tudo
+        locations = set(rng.sample(codes, rng.randint(1, 4)))
+        if rng.random() < 0.8:
+            locations.add("CD-SP")
+        for location in locations:
+            stock_rows.append(
+                {
+                    "product_id": pid,
+                    "location": location,
+                    "estoque_total": rng.randint(0, args.max_stock),
+                    "estoque_reservado": 0,
+                    "updated_at": now,
+                }
+            )
+    db.session.execute(ProductStock.__table__.insert(), stock_rows)
+    db.session.commit()
+    return vendor.id, len(stock_rows)
+
+
+def create_orders(args, rng, vendor_id, count, first_id):
+    from fastdrop.extensions import db
+    from fastdrop.models import Order, OrderItem
+
+    ranges = [r for r, _ in DESTINATIONS]
+    weights = [w for _, w in DESTINATIONS]
+    now = datetime.utcnow()
+    orders, items = [], []
+    for oid in range(first_id, first_id + count):
+        low, high = rng.choices(ranges, weights)[0]
+        orders.append(
+            {
+                "id": oid,
+                "vendor_id": vendor_id,
+                "origin": "manual",
+                "status": "em_separacao",
+                "shipping_postal_code": f"{rng.randint(low, high):05d}{rng.randint(0, 999):03d}",
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        for pid in rng.sample(range(1, args.products + 1), rng.randint(1, args.lines)):
+            items.append(
+                {
+                    "order_id": oid,
+                    "product_id": pid,
+                    "quantity": rng.randint(1, 3),
+                    "unit_cost": 10,
+                    "unit_vendor_price": 20,
+                    "subtotal_cost": 10,
+                    "subtotal_vendor_price": 20,
+                }
+            )
+    db.session.execute(Order.__table__.insert(), orders)
+    db.session.execute(OrderItem.__table__.insert(), items)
+    db.session.commit()
+    return first_id + count
+
+
+def report(label, result, elapsed):
+    print(
+        f"{label}: {result.orders} pedidos em {elapsed:.2f}s "
+        f"({result.orders / elapsed:,.0f} pedidos/s), {result.refreshed} produtos relidos do outbox"
+    )
+    if result.allocated:
+        avg_distance = result.distance_km / result.located if result.located else 0
+        print(
+            f"  alocados {result.allocated}, sem saldo {result.unfilled}, "
+            f"replanejados {result.retries}; divididos {result.split} "
+            f"({result.split / result.allocated:.1%}), "
+            f"{result.shipments / result.allocated:.2f} remessas/pedido, "
+            f"distância média {avg_distance:,.0f} km"
+        )
+        print(f"  por CD: {dict(sorted(result.by_location.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=4, help="máx. linhas por pedido")
+    parser.add_argument("--max-stock", type=int, default=60, help="saldo máx. por CD")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restock", type=float, default=0.05, help="fração reposta na 2ª leva")
+    args = parser.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}?timeout=60"
+
+    from sqlalchemy import func, select
+
+    from fastdrop import create_app
+    from fastdrop.allocation import allocate_all
+    from fastdrop.extensions import db
+    from fastdrop.models import ProductStock, StockReservation
+
+    rng = random.Random(42)
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        vendor_id, stock_rows = build(args, rng)
+        next_id = create_orders(args, rng, vendor_id, args.orders, 1)
+        dialect = db.engine.dialect.name
+        print(
+            f"banco: {dialect}, {len(WAREHOUSES)} CDs, {args.products} produtos "
+            f"({stock_rows} saldos), lote {args.batch_size}"
+        )
+
+        started = time.perf_counter()
+        first = allocate_all(batch_size=args.batch_size)
+        report("1ª leva", first, time.perf_counter() - started)
+
+        # reposição pelo ORM (entra no outbox) e nova leva de pedidos
+        restocked = rng.sample(range(1, args.products + 1), int(args.products * args.restock))
+        for stock in db.session.scalars(
+            select(ProductStock).where(ProductStock.product_id.in_(restocked))
+        ):
+            stock.estoque_total = (stock.estoque_total or 0) + args.max_stock
+        db.session.commit()
+        create_orders(args, rng, vendor_id, args.orders // 2, next_id)
+
+        started = time.perf_counter()
+        second = allocate_all(batch_size=args.batch_size)
+        report("2ª leva", second, time.perf_counter() - started)
+
+        oversold = db.session.scalar(
+            select(func.count(ProductStock.id)).where(
+                ProductStock.estoque_reservado > ProductStock.estoque_total
+            )
+        )
+        reserved = db.session.scalar(select(func.sum(ProductStock.estoque_reservado)))
+        booked = db.session.scalar(
+            select(func.sum(StockReservation.quantity)).where(StockReservation.status == "active")
+        )
+
+    print(f"saldo reservado: {reserved} / reservas ativas: {booked}")
+    if oversold or reserved != booked:
+        print(f"FALHA: {oversold} saldos com oversell")
+        return 1
+    print("OK: nenhum oversell")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Stress de reservas concorrentes de estoque.
+
+Cria produtos com pouco saldo e muitos pedidos disputando os mesmos SKUs,
+reserva tudo em paralelo e confere que nenhum ``ProductStock`` terminou
+com ``estoque_reservado`` acima de ``estoque_total``.
+
+    python benchmarks/stock_reservation.py --threads 16 --orders 2000
+    DATABASE_URL=postgresql://localhost/fastdrop_bench python benchmarks/stock_reservation.py
+
+Sem ``DATABASE_URL`` usa um SQLite temporário. ATENÇÃO: o banco é
+recriado (drop_all/create_all).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--stock", type=int, default=100, help="saldo por produto")
+    parser.add_argument("--lines", type=int, default=3, help="linhas por pedido")
+    args = parser.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}?timeout=60"
+
+    from sqlalchemy import func, select
+
+    from fastdrop import create_app
+    from fastdrop.extensions import db
+    from fastdrop.models import (
+        Order,
+        OrderItem,
+        Product,
+        ProductStock,
+        StockReservation,
+        User,
+        Vendor,
+    )
+    from fastdrop.stock import InsufficientStock, reserve_order
+
+    app = create_app()
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(name="bench", email="bench@fastdrop", password_hash="-")
+        db.session.add(user)
+        db.session.flush()
+        vendor = Vendor(user_id=user.id, company_name="Bench")
+        db.session.add(vendor)
+        db.session.flush()
+
+        product_ids = []
+        for i in range(args.products):
+            product = Product(
+                sku=f"BENCH-{i}",
+                name=f"Bench {i}",
+                cost_price=Decimal("1"),
+                wholesale_price=Decimal("2"),
+            )
+            db.session.add(product)
+            db.session.flush()
+            db.session.add(
+                ProductStock(product_id=product.id, estoque_total=args.stock)
+            )
+            product_ids.append(product.id)
+
+        order_ids = []
+        for _ in range(args.orders):
+            order = Order(vendor_id=vendor.id, origin="manual")
+            db.session.add(order)
+            db.session.flush()
+            for product_id in rng.sample(product_ids, min(args.lines, len(product_ids))):
+                db.session.add(
+                    OrderItem(
+                        order_id=order.id,
+                        product_id=product_id,
+                        quantity=rng.randint(1, 3),
+                        unit_cost=1,
+                        unit_vendor_price=2,
+                        subtotal_cost=1,
+                        subtotal_vendor_price=2,
+                    )
+                )
+            order_ids.append(order.id)
+        db.session.commit()
+
+    counters = {"reserved": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    chunks = [order_ids[i :: args.threads] for i in range(args.threads)]
+
+    def worker(ids):
+        with app.app_context():
+            for order_id in ids:
+                key = "reserved"
+                try:
+                    reserve_order(db.session.get(Order, order_id))
+                except InsufficientStock:
+                    key = "rejected"
+                except Exception:
+                    key = "errors"
+                with lock:
+                    counters[key] += 1
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        oversold = db.session.scalar(
+            select(func.count(ProductStock.id)).where(
+                ProductStock.estoque_reservado > ProductStock.estoque_total
+            )
+        )
+        reserved = db.session.scalar(select(func.sum(ProductStock.estoque_reservado)))
+        booked = db.session.scalar(
+            select(func.sum(StockReservation.quantity)).where(
+                StockReservation.status == "active"
+            )
+        )
+        dialect = db.engine.dialect.name
+
+    print(f"banco: {dialect}, threads: {args.threads}")
+    print(
+        f"pedidos: {args.orders} em {elapsed:.2f}s "
+        f"({args.orders / elapsed:.0f} pedidos/s) — "
+        f"reservados {counters['reserved']}, sem saldo {counters['rejected']}, "
+        f"erros {counters['errors']}"
+    )
+    print(f"saldo reservado: {reserved} / reservas ativas: {booked}")
+    if oversold or reserved != booked:
+        print(f"FALHA: {oversold} SKUs com oversell")
+        return 1
+    print("OK: nenhum oversell")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
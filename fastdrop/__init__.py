@@ -1,7 +1,6 @@
 import os
 from flask import Flask, redirect, url_for
-from .extensions import db, migrate, login_manager
-from .models import User
+from .extensions import db, db_router, login_manager, sql_profiler
 
 
 def create_app():
@@ -17,14 +16,28 @@ def create_app():
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
     )
 
-    # Extensões
+    # Extensões (o router define binds e pool antes de criar os engines)
+    db_router.init_app(app)
     db.init_app(app)
-    migrate.init_app(app, db)
     login_manager.init_app(app)
+    sql_profiler.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    from .stock import register_stock_events
+    from .admin.stats import register_stats_events
+    from .auth.loader import load_user, register_user_cache_events
+    from .rollups import register_rollup_events
+    from .http_cache import register_http_cache_events
+
+    register_stock_events()
+    register_stats_events()
+    register_user_cache_events()
+    register_rollup_events()
+    register_http_cache_events()
+
+    login_manager.user_loader(load_user)
+
+    # registra os jobs da fila (fastdrop.jobs)
+    from . import tasks  # noqa: F401
 
     login_manager.login_view = "auth.login"
 
@@ -33,12 +46,19 @@ def create_app():
     from .admin.routes import admin_bp
     from .vendor.routes import vendor_bp
     from .bling.routes import bling_bp
+    from .payments.routes import payments_bp
 
     # sem prefixo no auth → /login, /logout etc.
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix="/admin")
     app.register_blueprint(vendor_bp, url_prefix="/vendor")
     app.register_blueprint(bling_bp, url_prefix="/bling")
+    app.register_blueprint(payments_bp, url_prefix="/payments")
+
+    # ===== Comandos CLI =====
+    from .cli import register_commands
+
+    register_commands(app)
 
     # ===== Rota raiz =====
     @app.route("/")
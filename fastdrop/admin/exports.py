@@ -0,0 +1,267 @@
+"""Exportação de pedidos e acertos por vendedor em CSV/XLSX, em streaming.
+
+As linhas saem de um cursor no servidor (``yield_per`` +
+``stream_results``) direto para um gerador de bytes: a resposta começa
+com o cabeçalho antes da consulta rodar e a memória fica constante, seja
+qual for o número de linhas.
+
+- ``orders``: uma linha por item de pedido, com custo e preço do vendedor;
+- ``settlements``: por vendedor, pedidos e somas de ``total_cost`` e
+  ``total_vendor_price`` (filtros de status/vendedor/período valem nos dois).
+
+O CSV usa ``;`` e vírgula decimal (mesmo formato aceito na importação de
+produtos) e pode sair com gzip. O XLSX é montado à mão num zip em
+streaming, com strings inline, sem carregar a planilha em memória.
+"""
+import csv
+import io
+import zipfile
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func, select
+
+from ..extensions import db
+from ..models import Order, OrderItem, Vendor
+from .orders import apply_order_filters
+
+YIELD_PER = 2000
+FORMATS = ("csv", "xlsx")
+MIMETYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+# ---------- Consultas ----------
+
+
+def _orders_query(filters):
+    stmt = (
+        select(
+            Order.id,
+            Order.external_number,
+            Order.created_at,
+            Order.status,
+            Vendor.id,
+            Vendor.company_name,
+            OrderItem.sku,
+            OrderItem.quantity,
+            OrderItem.unit_cost,
+            OrderItem.unit_vendor_price,
+            OrderItem.subtotal_cost,
+            OrderItem.subtotal_vendor_price,
+        )
+        .join(Vendor, Vendor.id == Order.vendor_id)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+    )
+    return apply_order_filters(stmt, filters).order_by(Order.id, OrderItem.id)
+
+
+def _settlements_query(filters):
+    stmt = (
+        select(
+            Vendor.id,
+            Vendor.company_name,
+            func.count(Order.id),
+            func.sum(Order.total_cost),
+            func.sum(Order.total_vendor_price),
+            func.sum(Order.total_vendor_price) - func.sum(Order.total_cost),
+        )
+        .join(Vendor, Vendor.id == Order.vendor_id)
+        .group_by(Vendor.id, Vendor.company_name)
+    )
+    return apply_order_filters(stmt, filters).order_by(Vendor.company_name)
+
+
+EXPORTS = {
+    "orders": (
+        [
+            "pedido_id",
+            "numero",
+            "criado_em",
+            "status",
+            "vendedor_id",
+            "vendedor",
+            "sku",
+            "quantidade",
+            "custo_unitario",
+            "preco_vendedor_unitario",
+            "subtotal_custo",
+            "subtotal_preco_vendedor",
+        ],
+        _orders_query,
+    ),
+    "settlements": (
+        [
+            "vendedor_id",
+            "vendedor",
+            "pedidos",
+            "total_custo",
+            "total_preco_vendedor",
+            "margem",
+        ],
+        _settlements_query,
+    ),
+}
+
+
+def iter_rows(kind, filters, yield_per=YIELD_PER):
+    """Gera listas de linhas (uma por lote do cursor)."""
+    stmt = EXPORTS[kind][1](filters).execution_options(
+        yield_per=yield_per, stream_results=True
+    )
+    result = db.session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+# ---------- Formatos ----------
+
+
+def _csv_value(value):
+    if isinstance(value, Decimal):
+        return str(value).replace(".", ",")
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return "" if value is None else value
+
+
+def _iter_csv(header, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    # BOM: o Excel abre o arquivo como UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    yield buffer.getvalue().encode("utf-8")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo só de escrita para o ``zipfile``; os bytes são drenados em pedaços."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+def _iter_xlsx(header, batches):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>" + _xlsx_row(header).encode("utf-8")
+            )
+            yield sink.drain()
+            for batch in batches:
+                sheet.write("".join(_xlsx_row(row) for row in batch).encode("utf-8"))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: cabeçalho gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, fmt, filters, gzip=False):
+    """Gerador de bytes da exportação ``kind`` no formato ``fmt``."""
+    if kind not in EXPORTS:
+        raise ExportError(f"Exportação desconhecida: {kind}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Formato desconhecido: {fmt}")
+    header = EXPORTS[kind][0]
+    batches = iter_rows(kind, filters)
+    chunks = _iter_csv(header, batches) if fmt == "csv" else _iter_xlsx(header, batches)
+    # xlsx já é um zip: gzip por cima não ganha nada
+    return _gzip(chunks) if gzip and fmt == "csv" else chunks
+
+
+def export_filename(kind, fmt, gzip=False):
+    name = f"{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return name + ".gz" if gzip and fmt == "csv" else name
@@ -0,0 +1,156 @@
+"""Consulta da listagem de pedidos do admin.
+
+Pedidos e vendedores vêm num único SELECT (JOIN + ``contains_eager``), os
+mais recentes primeiro, paginados por keyset em ``(created_at, id)``. Cada
+combinação de filtro tem um índice que termina em ``(created_at, id)``
+(ver ``Order.__table_args__``), então a página custa o mesmo na primeira
+ou na milésima tela.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import contains_eager, load_only
+
+from ..extensions import db
+from ..models import Order, Vendor
+from .stats import ORDER_STATUSES
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _parse_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_cursor(value):
+    """Cursor ``<created_at ISO>,<id>`` da última linha da página anterior."""
+    try:
+        created_at, order_id = (value or "").rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        return None
+
+
+@dataclass
+class OrderFilters:
+    """Filtros da listagem de pedidos (vindos da query string)."""
+
+    status: str = None
+    vendor_id: int = None
+    date_from: date = None
+    date_to: date = None
+    number: str = None
+    after: tuple = None
+    per_page: int = DEFAULT_PAGE_SIZE
+
+    @classmethod
+    def from_args(cls, args):
+        status = args.get("status") or None
+        per_page = _parse_int(args.get("per_page"), DEFAULT_PAGE_SIZE)
+        return cls(
+            status=status if status in ORDER_STATUSES else None,
+            vendor_id=_parse_int(args.get("vendor_id")),
+            date_from=_parse_date(args.get("date_from")),
+            date_to=_parse_date(args.get("date_to")),
+            number=(args.get("number") or "").strip() or None,
+            after=_parse_cursor(args.get("after")),
+            per_page=max(1, min(per_page, MAX_PAGE_SIZE)),
+        )
+
+    def to_args(self, after=None):
+        """Query string para a próxima página, preservando os filtros."""
+        args = {"per_page": self.per_page}
+        if after is not None:
+            args["after"] = after
+        if self.status:
+            args["status"] = self.status
+        if self.vendor_id:
+            args["vendor_id"] = self.vendor_id
+        if self.date_from:
+            args["date_from"] = self.date_from.isoformat()
+        if self.date_to:
+            args["date_to"] = self.date_to.isoformat()
+        if self.number:
+            args["number"] = self.number
+        return args
+
+
+@dataclass
+class OrdersPage:
+    orders: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def apply_order_filters(stmt, filters):
+    """Aplica status/vendedor/número/período (não o cursor) a um SELECT de pedidos."""
+    if filters.status:
+        stmt = stmt.where(Order.status == filters.status)
+    if filters.vendor_id:
+        stmt = stmt.where(Order.vendor_id == filters.vendor_id)
+    if filters.number:
+        stmt = stmt.where(Order.external_number == filters.number)
+    if filters.date_from:
+        start = datetime.combine(filters.date_from, datetime.min.time())
+        stmt = stmt.where(Order.created_at >= start)
+    if filters.date_to:
+        end = datetime.combine(filters.date_to + timedelta(days=1), datetime.min.time())
+        stmt = stmt.where(Order.created_at < end)
+    return stmt
+
+
+def fetch_orders_page(filters):
+    """Uma página de pedidos com o vendedor já carregado."""
+    stmt = (
+        select(Order)
+        .join(Order.vendor)
+        .options(
+            load_only(
+                Order.id,
+                Order.vendor_id,
+                Order.external_number,
+                Order.customer_name,
+                Order.status,
+                Order.total_vendor_price,
+                Order.created_at,
+            ),
+            contains_eager(Order.vendor).load_only(Vendor.id, Vendor.company_name),
+        )
+    )
+
+    stmt = apply_order_filters(stmt, filters)
+    if filters.after:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < filters.after)
+
+    # busca um item a mais só para saber se existe próxima página
+    rows = db.session.scalars(
+        stmt.order_by(Order.created_at.desc(), Order.id.desc()).limit(filters.per_page + 1)
+    ).all()
+    orders = rows[: filters.per_page]
+    next_cursor = None
+    if len(rows) > filters.per_page:
+        last = orders[-1]
+        next_cursor = f"{last.created_at.isoformat()},{last.id}"
+    return OrdersPage(orders=orders, next_cursor=next_cursor)
+
+
+def vendor_choices():
+    """(id, nome) dos vendedores para o filtro da listagem."""
+    return db.session.execute(
+        select(Vendor.id, Vendor.company_name).order_by(Vendor.company_name)
+    ).all()
@@ -0,0 +1,243 @@
+"""Importação em massa de produtos a partir de CSV (upsert por SKU).
+
+O arquivo é lido em streaming e processado em blocos: cada bloco é
+validado em Python e gravado com um ``INSERT ... ON CONFLICT (sku)`` para
+os produtos e outro ``ON CONFLICT (product_id, location)`` para o
+estoque, sem criar objetos do ORM por linha.
+
+Colunas aceitas (cabeçalho obrigatório, ``,`` ou ``;``): sku, name,
+cost_price, wholesale_price, suggested_price, description, weight, width,
+height, length, stock, active.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..extensions import db
+from ..http_cache import CATALOG, bump_version
+from ..models import Product, ProductStock
+from ..sql import upsert_statement
+from ..stock import DEFAULT_LOCATION, record_stock_changes
+from .stats import invalidate_dashboard_stats
+
+CHUNK_SIZE = 2000
+MAX_ERRORS = 500  # linhas com erro guardadas no relatório (o resto só é contado)
+REQUIRED_COLUMNS = {"sku", "name", "cost_price", "wholesale_price"}
+DECIMAL_COLUMNS = (
+    "cost_price",
+    "wholesale_price",
+    "suggested_price",
+    "weight",
+    "width",
+    "height",
+    "length",
+)
+# Numeric(p, s): até p - s dígitos antes da vírgula
+DECIMAL_LIMITS = {
+    column: Decimal(10) ** (Product.__table__.c[column].type.precision
+                            - Product.__table__.c[column].type.scale)
+    for column in DECIMAL_COLUMNS
+}
+PRODUCT_UPDATE_COLUMNS = ("name", "description", "active") + DECIMAL_COLUMNS
+TRUE_VALUES = {"1", "true", "sim", "s", "yes", "y"}
+FALSE_VALUES = {"0", "false", "nao", "não", "n", "no"}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)  # (linha, mensagem), até MAX_ERRORS
+
+    @property
+    def ok(self):
+        return self.created + self.updated
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def _decimal(value, column):
+    value = (value or "").strip()
+    if not value:
+        return None
+    if "," in value:
+        # formato brasileiro: 1.234,56
+        value = value.replace(".", "").replace(",", ".")
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{column}: valor inválido '{value}'")
+    if not number.is_finite():
+        raise ValueError(f"{column}: valor inválido '{value}'")
+    if number < 0:
+        raise ValueError(f"{column}: não pode ser negativo")
+    if number >= DECIMAL_LIMITS[column]:
+        raise ValueError(f"{column}: deve ser menor que {DECIMAL_LIMITS[column]:.0f}")
+    return number
+
+
+def _validate(raw):
+    """Converte uma linha do CSV em (produto, estoque) ou levanta ValueError."""
+    sku = (raw.get("sku") or "").strip()
+    name = (raw.get("name") or "").strip()
+    if not sku:
+        raise ValueError("sku obrigatório")
+    if len(sku) > 100:
+        raise ValueError("sku com mais de 100 caracteres")
+    if not name:
+        raise ValueError("name obrigatório")
+
+    product = {"sku": sku, "name": name[:255]}
+    for column in DECIMAL_COLUMNS:
+        if column in raw:
+            product[column] = _decimal(raw[column], column)
+    for column in ("cost_price", "wholesale_price"):
+        if product.get(column) is None:
+            raise ValueError(f"{column} obrigatório")
+    if "description" in raw:
+        product["description"] = (raw["description"] or "").strip() or None
+
+    active = (raw.get("active") or "").strip().lower()
+    if active in FALSE_VALUES:
+        product["active"] = False
+    elif not active or active in TRUE_VALUES:
+        product["active"] = True
+    else:
+        raise ValueError(f"active: valor inválido '{active}'")
+
+    stock = None
+    raw_stock = (raw.get("stock") or "").strip()
+    if raw_stock:
+        try:
+            stock = int(raw_stock)
+        except ValueError:
+            raise ValueError(f"stock: valor inválido '{raw_stock}'")
+        if stock < 0:
+            raise ValueError("stock: não pode ser negativo")
+    return product, stock
+
+
+def _write_chunk(products, stocks, columns, update_columns, report):
+    skus = list(products)
+    existing = set(
+        db.session.scalars(select(Product.sku).where(Product.sku.in_(skus)))
+    )
+
+    stmt = upsert_statement(Product.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sku"],
+        set_={column: stmt.excluded[column] for column in update_columns},
+    )
+    # todas as linhas do executemany precisam das mesmas chaves
+    rows = [{column: row.get(column) for column in columns} for row in products.values()]
+    db.session.execute(stmt, rows)
+
+    if stocks:
+        ids = dict(
+            db.session.execute(
+                select(Product.sku, Product.id).where(Product.sku.in_(list(stocks)))
+            ).all()
+        )
+        stmt = upsert_statement(ProductStock.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["product_id", "location"],
+            set_={
+                "estoque_total": stmt.excluded.estoque_total,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        now = datetime.utcnow()
+        db.session.execute(
+            stmt,
+            [
+                {
+                    "product_id": ids[sku],
+                    "location": DEFAULT_LOCATION,
+                    "estoque_total": quantity,
+                    "estoque_reservado": 0,
+                    "updated_at": now,
+                }
+                for sku, quantity in stocks.items()
+            ],
+        )
+        record_stock_changes(ids.values())
+
+    # upsert em lote não passa pelo after_flush: invalida os ETags do catálogo
+    bump_version(CATALOG)
+    db.session.commit()
+    report.created += len(products) - len(existing)
+    report.updated += len(existing)
+
+
+def _flush_chunk(products, stocks, lines, columns, update_columns, report):
+    """Grava um bloco; se o banco recusar, desfaz só esse bloco e segue."""
+    try:
+        _write_chunk(products, stocks, columns, update_columns, report)
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        reason = str(getattr(exc, "orig", None) or exc)[:300]
+        message = f"bloco de {len(products)} linhas não gravado (erro no banco: {reason})"
+        for sku in products:
+            report.add_error(lines[sku], message)
+
+
+def import_products_csv(stream, chunk_size=CHUNK_SIZE, encoding="utf-8-sig"):
+    """Importa um CSV (arquivo binário ou texto) e devolve o ``ImportReport``."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding=encoding, newline="")
+
+    header = stream.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    columns = [c.strip().lower() for c in next(csv.reader([header], delimiter=delimiter))]
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise ImportFormatError(
+            "Colunas obrigatórias ausentes: " + ", ".join(sorted(missing))
+        )
+
+    product_columns = (
+        ["sku", "name", "active"]
+        + [c for c in DECIMAL_COLUMNS if c in columns]
+        + (["description"] if "description" in columns else [])
+    )
+    # só sobrescreve o que veio no arquivo (ex.: sem coluna active, mantém)
+    update_columns = [c for c in PRODUCT_UPDATE_COLUMNS if c in columns]
+    reader = csv.DictReader(stream, fieldnames=columns, delimiter=delimiter)
+    report = ImportReport()
+    products, stocks, lines = {}, {}, {}
+    for raw in reader:
+        report.rows += 1
+        # +1: o cabeçalho foi lido fora do reader
+        line = reader.line_num + 1
+        try:
+            product, stock = _validate(raw)
+        except ValueError as exc:
+            report.add_error(line, str(exc))
+            continue
+        # SKU repetido no mesmo bloco: vale a última linha
+        products[product["sku"]] = product
+        lines[product["sku"]] = line
+        if stock is not None:
+            stocks[product["sku"]] = stock
+        if len(products) >= chunk_size:
+            _flush_chunk(products, stocks, lines, product_columns, update_columns, report)
+            products, stocks, lines = {}, {}, {}
+
+    if products:
+        _flush_chunk(products, stocks, lines, product_columns, update_columns, report)
+    invalidate_dashboard_stats()
+    return report
@@ -1,5 +1,4 @@
-import os
-import uuid
+from decimal import Decimal, InvalidOperation
 
 from flask import (
     Blueprint,
@@ -8,82 +7,246 @@ from flask import (
     redirect,
     url_for,
     flash,
+    jsonify,
+    abort,
+    current_app,
+    Response,
+    stream_with_context,
 )
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
-import boto3
-
-from ..extensions import db
-from ..models import Product, Vendor, User
+from ..extensions import db, sql_profiler
+from ..http_cache import cached_response, catalog_version
+from ..images import schedule_image_processing
+from ..models import Product, ProductStock, Vendor, User
+from ..storage import (
+    complete_multipart_upload,
+    create_presigned_post,
+    is_upload_key,
+    start_multipart_upload,
+    upload_image_to_s3,
+)
+from .exports import MIMETYPES, ExportError, export_filename, stream_export
+from .orders import OrderFilters, fetch_orders_page, vendor_choices
+from .product_import import ImportFormatError, import_products_csv
+from .stats import ORDER_STATUSES, get_dashboard_stats
 
 admin_bp = Blueprint("admin", __name__)
 
 
-# ---------- Helpers S3 ----------
+# ---------- Helpers ----------
 
 
-def _get_s3_client():
-    """Retorna o client do S3 usando as variáveis de ambiente."""
-    region = os.getenv("AWS_S3_REGION") or os.getenv("AWS_REGION") or "us-east-2"
+def _decimal_field(name):
+    try:
+        value = Decimal(request.form.get(name, "").replace(",", "."))
+    except InvalidOperation:
+        return None
+    # Numeric(10, 2): até 8 dígitos antes da vírgula
+    return value if value.is_finite() and 0 <= value < MAX_PRICE else None
+
+
+MAX_PRICE = Decimal("1e8")
+PRICE_FIELDS = {"cost_price": "Preço de custo", "wholesale_price": "Preço de atacado"}
+
+
+def _product_form_errors(product=None):
+    """Mensagens de erro do formulário de produto (lista vazia se válido)."""
+    errors = []
+    if not (request.form.get("name") or "").strip():
+        errors.append("Informe o nome do produto.")
+    sku = (request.form.get("sku") or "").strip()
+    if not sku:
+        errors.append("Informe o SKU.")
+    else:
+        query = db.select(Product.id).where(Product.sku == sku)
+        if product is not None:
+            query = query.where(Product.id != product.id)
+        if db.session.scalar(query):
+            errors.append(f"O SKU {sku} já está em uso.")
+    for name, label in PRICE_FIELDS.items():
+        if _decimal_field(name) is None:
+            errors.append(f"{label} inválido.")
+    if request.form.get("stock") and request.form.get("stock", type=int) is None:
+        errors.append("Estoque inválido.")
+    return errors
+
+
+def _render_product_form(product, errors):
+    """Devolve o formulário com os valores digitados e os erros."""
+    for message in errors:
+        flash(message, "danger")
+    return render_template("admin/product_form.html", product=product), 400
+
+
+def _image_key_from_form():
+    """Chave enviada direto ao S3 pelo navegador ou, sem JS, upload pelo servidor."""
+    key = request.form.get("image_key")
+    if is_upload_key(key):
+        return key
+    image_file = request.files.get("image")
+    if image_file and image_file.filename:
+        return upload_image_to_s3(image_file)
+    return None
+
+
+def _apply_product_form(product):
+    product.name = request.form.get("name").strip()
+    product.sku = request.form.get("sku").strip()
+    product.cost_price = _decimal_field("cost_price")
+    product.wholesale_price = _decimal_field("wholesale_price")
+    product.description = request.form.get("description")
+
+    image_key = _image_key_from_form()
+    if image_key:
+        product.image_key = image_key
+
+    if product.stock is None:
+        product.stock = ProductStock()
+    product.stock.estoque_total = request.form.get("stock", type=int) or 0
+    return bool(image_key)
 
-    return boto3.client(
-        "s3",
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        region_name=region,
-    )
 
+# ---------- Rotas Admin ----------
 
-def upload_image_to_s3(file_obj, folder="products"):
-    """Faz upload do arquivo para o S3 e devolve a URL pública."""
-    if not file_obj or file_obj.filename == "":
-        return None
 
-    bucket = (
-        os.getenv("AWS_BUCKET_NAME")
-        or os.getenv("S3_BUCKET_NAME")
-        or os.getenv("AWS_S3_BUCKET")
-    )
-    if not bucket:
-        raise RuntimeError("Bucket S3 não configurado nas variáveis de ambiente.")
-
-    filename = secure_filename(file_obj.filename)
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "jpg"
-    key = f"{folder}/{uuid.uuid4().hex}.{ext}"
-
-    s3 = _get_s3_client()
-    # IMPORTANTE: sem ACL (bucket owner enforced)
-    s3.upload_fileobj(
-        file_obj,
-        bucket,
-        key,
-        ExtraArgs={"ContentType": file_obj.mimetype},
+@admin_bp.route("/dashboard")
+@login_required
+def dashboard():
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    stats = get_dashboard_stats()
+    return render_template(
+        "admin/dashboard.html",
+        product_count=stats["product_count"],
+        vendor_count=stats["vendor_count"],
+        pending_orders=stats["orders_by_status"]["pendente"],
+        stats=stats,
     )
 
-    region = os.getenv("AWS_S3_REGION") or os.getenv("AWS_REGION") or "us-east-2"
-    url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
-    return url
 
+@admin_bp.route("/stock/propagation")
+@login_required
+def stock_propagation():
+    """Backlog e atraso do envio de estoque para o Bling (JSON)."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    from ..bling.stock_sync import outbox_metrics
 
-# ---------- Rotas Admin ----------
+    return jsonify(outbox_metrics())
 
 
-@admin_bp.route("/dashboard")
+@admin_bp.route("/user-cache")
 @login_required
-def dashboard():
+def user_cache_stats():
+    """Acertos do cache do user_loader (consultas evitadas)."""
     if current_user.role != "admin":
         return "Acesso negado", 403
 
-    products_count = Product.query.count()
-    vendors_count = Vendor.query.count()
-    pending_orders_count = 0  # ainda não temos pedidos
+    from ..auth.loader import user_cache
+
+    return jsonify(user_cache.stats())
+
 
+@admin_bp.route("/db-pool")
+@login_required
+def db_pool_stats():
+    """Espera por conexão no pool de cada engine (JSON)."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    from ..db_routing import pool_metrics, replica_keys
+
+    if request.args.get("reset"):
+        pool_metrics.reset()
+    return jsonify(replicas=replica_keys(), pools=pool_metrics.snapshot())
+
+
+@admin_bp.route("/perf")
+@login_required
+def perf():
+    """Endpoints mais lentos e suspeitas de N+1 (só com SQL_PROFILING=1)."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+    if not current_app.config.get("SQL_PROFILING"):
+        abort(404)
+
+    if request.args.get("reset"):
+        sql_profiler.reset()
+        return redirect(url_for("admin.perf"))
     return render_template(
-        "admin/dashboard.html",
-        products_count=products_count,
-        vendors_count=vendors_count,
-        pending_orders_count=pending_orders_count,
+        "admin/perf.html",
+        endpoints=sql_profiler.slowest_endpoints(),
+        patterns=sql_profiler.suspected_n_plus_one(),
+    )
+
+
+@admin_bp.route("/orders")
+@login_required
+def orders():
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    filters = OrderFilters.from_args(request.args)
+    page = fetch_orders_page(filters)
+    next_url = (
+        url_for("admin.orders", **filters.to_args(after=page.next_cursor))
+        if page.has_next
+        else None
+    )
+    return render_template(
+        "admin/orders.html",
+        orders=page.orders,
+        filters=filters,
+        vendors=vendor_choices(),
+        statuses=ORDER_STATUSES,
+        next_url=next_url,
+    )
+
+
+@admin_bp.route("/orders/<int:order_id>/ship", methods=["POST"])
+@login_required
+def ship_order(order_id):
+    """Marca o pedido como enviado e dá baixa no estoque reservado."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    from ..stock import ship_orders
+
+    if ship_orders([order_id]):
+        flash(f"Pedido {order_id} enviado.", "success")
+    else:
+        flash(
+            f"Pedido {order_id} não foi enviado: precisa estar em separação "
+            "e com estoque reservado (alocado).",
+            "warning",
+        )
+    return redirect(url_for("admin.orders"))
+
+
+@admin_bp.route("/exports/<kind>.<fmt>")
+@login_required
+def export(kind, fmt):
+    """Exporta pedidos/acertos em streaming (``?gzip=1`` compacta o CSV)."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    filters = OrderFilters.from_args(request.args)
+    gzip = request.args.get("gzip") in ("1", "true")
+    try:
+        chunks = stream_export(kind, fmt, filters, gzip=gzip)
+    except ExportError:
+        abort(404)
+    filename = export_filename(kind, fmt, gzip=gzip)
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if filename.endswith(".gz") else MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",
+        },
     )
 
 
@@ -94,8 +257,14 @@ def list_products():
     if current_user.role != "admin":
         return "Acesso negado", 403
 
-    products = Product.query.order_by(Product.id.desc()).all()
-    return render_template("admin/products.html", products=products)
+    return cached_response(
+        catalog_version(),
+        lambda: render_template(
+            "admin/products.html",
+            products=Product.query.order_by(Product.id.desc()).all(),
+        ),
+        templates=("base.html", "admin/products.html"),
+    )
 
 
 @admin_bp.route("/products/new", methods=["GET", "POST"])
@@ -105,26 +274,16 @@ def add_product():
         return "Acesso negado", 403
 
     if request.method == "POST":
-        name = request.form.get("name")
-        sku = request.form.get("sku")
-        price = request.form.get("price")
-        stock = request.form.get("stock")
-        description = request.form.get("description")
-        image_file = request.files.get("image")
-
-        image_url = upload_image_to_s3(image_file)
-
-        product = Product(
-            name=name,
-            sku=sku,
-            # CORRIGIDO: Mudança de 'price=' para 'preco=' para corresponder ao modelo do SQLAlchemy
-            preco=price, 
-            stock=stock,
-            description=description,
-            image_url=image_url,
-            active=True,
-        )
+        errors = _product_form_errors()
+        if errors:
+            return _render_product_form(None, errors)
+        product = Product(active=True)
+        image_changed = _apply_product_form(product)
         db.session.add(product)
+        db.session.flush()
+        if image_changed:
+            # o job vai no mesmo commit do produto
+            schedule_image_processing(product.id)
         db.session.commit()
 
         flash("Produto criado com sucesso!", "success")
@@ -133,6 +292,32 @@ def add_product():
     return render_template("admin/product_form.html", product=None)
 
 
+@admin_bp.route("/products/import", methods=["GET", "POST"])
+@login_required
+def import_products():
+    """Upload de CSV de fornecedor: upsert em massa por SKU."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    report = None
+    if request.method == "POST":
+        csv_file = request.files.get("file")
+        if not csv_file or not csv_file.filename:
+            flash("Selecione um arquivo CSV.", "warning")
+            return redirect(url_for("admin.import_products"))
+        try:
+            report = import_products_csv(csv_file.stream)
+        except ImportFormatError as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("admin.import_products"))
+        flash(
+            f"{report.created} produtos criados, {report.updated} atualizados.",
+            "success" if not report.errors else "warning",
+        )
+
+    return render_template("admin/product_import.html", report=report)
+
+
 @admin_bp.route("/products/<int:product_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_product(product_id):
@@ -142,19 +327,11 @@ def edit_product(product_id):
     product = Product.query.get_or_404(product_id)
 
     if request.method == "POST":
-        product.name = request.form.get("name")
-        product.sku = request.form.get("sku")
-        # CORRIGIDO: Mudança de 'product.price' para 'product.preco'
-        product.preco = request.form.get("price") 
-        product.stock = request.form.get("stock")
-        product.description = request.form.get("description")
-
-        image_file = request.files.get("image")
-        if image_file and image_file.filename:
-            image_url = upload_image_to_s3(image_file)
-            if image_url:
-                product.image_url = image_url
-
+        errors = _product_form_errors(product)
+        if errors:
+            return _render_product_form(product, errors)
+        if _apply_product_form(product):
+            schedule_image_processing(product.id)
         db.session.commit()
         flash("Produto atualizado com sucesso!", "success")
         return redirect(url_for("admin.list_products"))
@@ -162,6 +339,57 @@ def edit_product(product_id):
     return render_template("admin/product_form.html", product=product)
 
 
+# ---------- Upload direto para o S3 ----------
+
+
+@admin_bp.route("/uploads/presign", methods=["POST"])
+@login_required
+def presign_upload():
+    """POST pré-assinado para o navegador enviar a imagem direto ao S3."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    data = request.get_json(silent=True) or {}
+    content_type = data.get("content_type") or ""
+    if not content_type.startswith("image/"):
+        return jsonify(error="Envie uma imagem."), 400
+    return jsonify(create_presigned_post(data.get("filename"), content_type))
+
+
+@admin_bp.route("/uploads/multipart", methods=["POST"])
+@login_required
+def start_multipart():
+    """Inicia upload multipart (arquivos grandes) com URLs por parte."""
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    data = request.get_json(silent=True) or {}
+    content_type = data.get("content_type") or ""
+    if not content_type.startswith("image/"):
+        return jsonify(error="Envie uma imagem."), 400
+    try:
+        upload = start_multipart_upload(
+            data.get("filename"), content_type, data.get("size") or 0
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(upload)
+
+
+@admin_bp.route("/uploads/multipart/complete", methods=["POST"])
+@login_required
+def finish_multipart():
+    if current_user.role != "admin":
+        return "Acesso negado", 403
+
+    data = request.get_json(silent=True) or {}
+    key = data.get("key")
+    if not is_upload_key(key) or not data.get("upload_id"):
+        return jsonify(error="Upload inválido."), 400
+    complete_multipart_upload(key, data["upload_id"], data.get("parts") or [])
+    return jsonify(key=key)
+
+
 @admin_bp.route("/products/<int:product_id>/toggle", methods=["POST"])
 @login_required
 def toggle_product(product_id):
@@ -0,0 +1,82 @@
+"""Indicadores do dashboard do admin.
+
+Contagens de pedidos e GMV vêm de ``daily_vendor_sales`` (ver
+``fastdrop.rollups``). O resultado fica em cache por processo
+durante ``DASHBOARD_CACHE_TTL`` segundos; qualquer escrita em
+``Product``, ``Vendor`` ou ``Order`` feita por este processo, ou um
+refresh dos rollups, invalida o cache.
+"""
+import os
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Order, Product, Vendor
+
+ORDER_STATUSES = ("pendente", "em_separacao", "enviado", "entregue", "cancelado")
+CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "60"))
+
+_cache = {"value": None, "expires_at": 0.0}
+_lock = threading.Lock()
+
+
+def _compute():
+    from ..rollups import orders_by_status
+
+    counts = db.session.execute(
+        select(
+            select(func.count(Product.id)).scalar_subquery().label("product_count"),
+            select(func.count(Vendor.id)).scalar_subquery().label("vendor_count"),
+        )
+    ).one()
+    # pedidos e GMV saem dos rollups diários, não de orders
+    by_status = orders_by_status()
+    return {
+        "product_count": counts.product_count,
+        "vendor_count": counts.vendor_count,
+        "order_count": sum(orders for orders, _ in by_status.values()),
+        # GMV não considera pedidos cancelados
+        "gmv": sum(
+            (revenue for status, (_, revenue) in by_status.items() if status != "cancelado"),
+            Decimal(0),
+        ),
+        "orders_by_status": {
+            status: by_status.get(status, (0, 0))[0] for status in ORDER_STATUSES
+        },
+    }
+
+
+def get_dashboard_stats():
+    now = time.monotonic()
+    cached = _cache["value"]
+    if cached is not None and _cache["expires_at"] > now:
+        return cached
+    with _lock:
+        if _cache["value"] is None or _cache["expires_at"] <= time.monotonic():
+            _cache["value"] = _compute()
+            _cache["expires_at"] = time.monotonic() + CACHE_TTL
+        return _cache["value"]
+
+
+def invalidate_dashboard_stats():
+    _cache["value"] = None
+    _cache["expires_at"] = 0.0
+
+
+_WATCHED = (Product, Vendor, Order)
+
+
+def _invalidate_on_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _WATCHED):
+            invalidate_dashboard_stats()
+            return
+
+
+def register_stats_events():
+    if not event.contains(Session, "after_flush", _invalidate_on_flush):
+        event.listen(Session, "after_flush", _invalidate_on_flush)
@@ -0,0 +1,507 @@
+"""Alocação de pedidos pagos entre centros de distribuição.
+
+Cada produto pode ter saldo em vários CDs (uma linha de ``ProductStock``
+por ``location``). A alocação pega um lote de pedidos em separação ainda
+sem CD, escolhe de onde sai cada linha e reserva o saldo, tudo numa
+transação por lote:
+
+1. um único CD que atenda o pedido inteiro, o mais próximo do destino;
+2. senão, o par de CDs mais próximo que cubra o pedido;
+3. senão, divide de forma gulosa (CD que cobre mais linhas primeiro).
+
+A disponibilidade vem de um índice em memória (``AvailabilityIndex``):
+cada produto é lido do banco na primeira vez que aparece e depois só é
+relido quando ganha linha no ``stock_outbox``. O índice só orienta a
+escolha; a reserva continua sendo o ``UPDATE`` condicional de
+``fastdrop.stock``, então saldo desatualizado nunca vira oversell: o
+produto é relido e o pedido replanejado.
+"""
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import combinations
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from .extensions import db
+from .geo import distance_km, find_postal_code, normalize_postal_code, postal_code_location
+from .models import Order, OrderItem, ProductStock, StockOutbox, StockReservation, Warehouse
+from .stock import _available
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get("ALLOCATION_BATCH_SIZE", "1000"))
+# ``expires_at`` das reservas da alocação; como o pedido já está pago, elas
+# não vencem em ``expire_reservations`` (só saem no envio ou cancelamento)
+ALLOCATION_TTL = timedelta(days=int(os.environ.get("ALLOCATION_TTL_DAYS", "7")))
+ALLOCATE_STATUSES = ("em_separacao",)
+MAX_ATTEMPTS = 3
+MAX_PAIR_CANDIDATES = 12  # CDs mais próximos considerados na busca por pares
+UNKNOWN_DISTANCE_KM = 10_000.0  # CD ou destino sem localização: por último
+OUTBOX_OVERLAP = 1000
+INDEX_MAX_PRODUCTS = 200_000
+IN_CHUNK = 500
+
+
+def _chunks(items, size=IN_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# ---------- Índice de disponibilidade ----------
+
+
+class AvailabilityIndex:
+    """``{product_id: {location: [product_stock.id, disponível]}}`` em memória."""
+
+    def __init__(self):
+        self._stock = {}
+        self._outbox_id = None
+        self._seen = set()  # ids do outbox já lidos dentro da janela de sobreposição
+
+    def clear(self):
+        self._stock.clear()
+        self._outbox_id = None
+        self._seen.clear()
+
+    def __len__(self):
+        return len(self._stock)
+
+    def load(self, product_ids):
+        """(Re)lê o saldo dos produtos do banco."""
+        for chunk in _chunks(product_ids):
+            fresh = {product_id: {} for product_id in chunk}
+            rows = db.session.execute(
+                select(
+                    ProductStock.product_id,
+                    ProductStock.location,
+                    ProductStock.id,
+                    _available,
+                ).where(ProductStock.product_id.in_(chunk))
+            )
+            for product_id, location, stock_id, available in rows:
+                fresh[product_id][location] = [stock_id, max(0, int(available or 0))]
+            self._stock.update(fresh)
+
+    def ensure(self, product_ids):
+        missing = [pid for pid in set(product_ids) if pid not in self._stock]
+        if len(self._stock) + len(missing) > INDEX_MAX_PRODUCTS:
+            self._stock.clear()
+            missing = list(set(product_ids))
+        self.load(missing)
+
+    def refresh(self):
+        """Relê os produtos que mudaram no outbox desde a última leitura.
+
+        Os ids do outbox são atribuídos antes do commit, então uma
+        transação lenta pode confirmar um id menor que o último lido: as
+        últimas ``OUTBOX_OVERLAP`` posições são relidas a cada vez.
+        """
+        last = db.session.scalar(select(func.max(StockOutbox.id))) or 0
+        if self._outbox_id is None or last < self._outbox_id:
+            # primeira leitura (ou banco recriado): tudo que vier depois é fresco
+            self.clear()
+            self._outbox_id = last
+            return 0
+
+        floor = self._outbox_id - OUTBOX_OVERLAP
+        rows = db.session.execute(
+            select(StockOutbox.id, StockOutbox.product_id).where(StockOutbox.id > floor)
+        ).all()
+        changed = {
+            product_id
+            for outbox_id, product_id in rows
+            if outbox_id not in self._seen and product_id in self._stock
+        }
+        self._outbox_id = max([self._outbox_id, *(outbox_id for outbox_id, _ in rows)])
+        floor = self._outbox_id - OUTBOX_OVERLAP
+        self._seen = {outbox_id for outbox_id, _ in rows if outbox_id > floor}
+        self.load(changed)
+        return len(changed)
+
+    def mark_seen(self, outbox_ids):
+        """Linhas do outbox gravadas por quem já atualizou o índice."""
+        self._seen.update(outbox_ids)
+
+    def available(self, product_id):
+        return {
+            location: available
+            for location, (_, available) in self._stock.get(product_id, {}).items()
+            if available > 0
+        }
+
+    def stock_id(self, product_id, location):
+        return self._stock[product_id][location][0]
+
+    def take(self, product_id, location, quantity):
+        self._stock[product_id][location][1] -= quantity
+
+
+_index = AvailabilityIndex()
+_run_lock = threading.Lock()
+
+
+# ---------- Plano ----------
+
+
+@dataclass
+class Site:
+    code: str
+    location: tuple = None  # (lat, lon)
+    priority: int = 0
+
+
+def load_sites():
+    """CDs cadastrados: ``({code: Site} ativos, {code} inativos)``."""
+    sites, inactive = {}, set()
+    for warehouse in db.session.scalars(select(Warehouse)):
+        if not warehouse.active:
+            inactive.add(warehouse.code)
+            continue
+        location = None
+        if warehouse.latitude is not None and warehouse.longitude is not None:
+            location = (warehouse.latitude, warehouse.longitude)
+        else:
+            location = postal_code_location(warehouse.postal_code)
+        sites[warehouse.code] = Site(warehouse.code, location, warehouse.priority or 0)
+    return sites, inactive
+
+
+def plan_order(lines, stock, sites, destination=None):
+    """Escolhe os CDs que atendem ``lines`` (``{product_id: qtd}``).
+
+    ``stock`` é ``{product_id: {location: disponível}}``. Devolve
+    ``[(location, product_id, qtd)]``, ou ``None`` se nem somando todos os
+    CDs o pedido é atendido.
+    """
+    for product_id, quantity in lines.items():
+        if sum(stock.get(product_id, {}).values()) < quantity:
+            return None
+
+    costs = {}
+
+    def cost(location):
+        if location not in costs:
+            site = sites.get(location) or Site(location)
+            distance = UNKNOWN_DISTANCE_KM
+            if site.location is not None and destination is not None:
+                distance = distance_km(site.location, destination)
+            costs[location] = (distance, site.priority, location)
+        return costs[location]
+
+    def has(location, product_id):
+        return stock.get(product_id, {}).get(location, 0)
+
+    locations = set()
+    for product_id in lines:
+        locations.update(stock.get(product_id, {}))
+
+    # 1. um CD só
+    whole = [
+        loc for loc in locations if all(has(loc, pid) >= qty for pid, qty in lines.items())
+    ]
+    if whole:
+        best = min(whole, key=cost)
+        return [(best, pid, qty) for pid, qty in lines.items()]
+
+    # 2. melhor par entre os CDs mais próximos
+    nearest = sorted(locations, key=cost)[:MAX_PAIR_CANDIDATES]
+    best_pair = None
+    for first, second in combinations(nearest, 2):
+        if all(has(first, pid) + has(second, pid) >= qty for pid, qty in lines.items()):
+            pair_cost = cost(first)[0] + cost(second)[0]
+            if best_pair is None or pair_cost < best_pair[0]:
+                best_pair = (pair_cost, first, second)
+    if best_pair is not None:
+        _, first, second = best_pair
+        plan = []
+        for pid, qty in lines.items():
+            # linha inteira num CD sempre que possível, o mais próximo primeiro
+            if has(first, pid) >= qty:
+                plan.append((first, pid, qty))
+            elif has(second, pid) >= qty:
+                plan.append((second, pid, qty))
+            else:
+                plan.append((first, pid, has(first, pid)))
+                plan.append((second, pid, qty - has(first, pid)))
+        return plan
+
+    # 3. guloso: CD que fecha mais linhas (e mais unidades) a cada passo
+    remaining = dict(lines)
+    plan = []
+    candidates = set(locations)
+    while remaining:
+        location = max(
+            candidates,
+            key=lambda loc: (
+                sum(1 for pid, qty in remaining.items() if has(loc, pid) >= qty),
+                sum(min(has(loc, pid), qty) for pid, qty in remaining.items()),
+                -cost(loc)[0],
+            ),
+        )
+        candidates.discard(location)
+        for pid, qty in list(remaining.items()):
+            taken = min(has(location, pid), qty)
+            if taken <= 0:
+                continue
+            plan.append((location, pid, taken))
+            if taken == qty:
+                del remaining[pid]
+            else:
+                remaining[pid] = qty - taken
+    return plan
+
+
+# ---------- Execução ----------
+
+
+@dataclass
+class AllocationResult:
+    orders: int = 0
+    allocated: int = 0
+    already_reserved: int = 0
+    unfilled: int = 0
+    split: int = 0
+    shipments: int = 0
+    retries: int = 0
+    refreshed: int = 0  # produtos relidos do banco por mudança no outbox
+    distance_km: float = 0.0
+    located: int = 0  # pedidos com destino e CD localizados
+    last_id: int = 0
+    by_location: dict = field(default_factory=dict)  # CD -> pedidos atendidos
+    outbox_ids: list = field(default_factory=list, repr=False)
+
+
+def _destination(postal_code, address):
+    cep = normalize_postal_code(postal_code) or find_postal_code(address)
+    return postal_code_location(cep)
+
+
+_stock = ProductStock.__table__
+_reserved = func.coalesce(_stock.c.estoque_reservado, 0)
+# montados uma vez: no lote, o custo de compilar cada UPDATE passava o de executar
+_RESERVE = (
+    update(_stock)
+    .where(
+        _stock.c.id == bindparam("stock_id"),
+        func.coalesce(_stock.c.estoque_total, 0) - _reserved >= bindparam("quantity"),
+    )
+    .values(estoque_reservado=_reserved + bindparam("quantity"), updated_at=bindparam("now"))
+)
+_UNDO = (
+    update(_stock)
+    .where(_stock.c.id == bindparam("stock_id"))
+    .values(estoque_reservado=_reserved - bindparam("quantity"))
+)
+
+
+def _reserve(connection, rows, now):
+    """``UPDATE`` condicional de cada ``(stock_id, product_id, qtd)``.
+
+    Se alguma linha não tiver mais saldo, desfaz as anteriores e devolve
+    o ``product_id`` dela; senão ``None``. Não faz commit.
+    """
+    applied = []
+    for stock_id, product_id, quantity in sorted(rows):
+        params = {"stock_id": stock_id, "quantity": quantity}
+        if connection.execute(_RESERVE, {**params, "now": now}).rowcount == 1:
+            applied.append(params)
+            continue
+        if applied:
+            connection.execute(_UNDO, applied)
+        return product_id
+    return None
+
+
+def _pending_orders(order_ids, after_id, batch_size):
+    query = select(Order.id, Order.shipping_postal_code, Order.shipping_address).where(
+        Order.allocated_at.is_(None)
+    )
+    if order_ids is not None:
+        query = query.where(Order.id.in_(list(order_ids)))
+    else:
+        query = query.where(Order.status.in_(ALLOCATE_STATUSES), Order.id > after_id)
+    return db.session.execute(
+        query.order_by(Order.id).limit(batch_size).with_for_update(skip_locked=True)
+    ).all()
+
+
+def _lines_by_order(order_ids):
+    lines = {order_id: {} for order_id in order_ids}
+    for chunk in _chunks(order_ids):
+        rows = db.session.execute(
+            select(OrderItem.order_id, OrderItem.product_id, func.sum(OrderItem.quantity))
+            .where(OrderItem.order_id.in_(chunk), OrderItem.product_id.is_not(None))
+            .group_by(OrderItem.order_id, OrderItem.product_id)
+        )
+        for order_id, product_id, quantity in rows:
+            lines[order_id][product_id] = int(quantity)
+    return lines
+
+
+def _with_reservations(order_ids):
+    reserved = set()
+    for chunk in _chunks(order_ids):
+        reserved.update(
+            db.session.scalars(
+                select(StockReservation.order_id)
+                .where(
+                    StockReservation.order_id.in_(chunk),
+                    StockReservation.status == "active",
+                )
+                .distinct()
+            )
+        )
+    return reserved
+
+
+def allocate_orders(order_ids=None, after_id=0, batch_size=BATCH_SIZE, ttl=ALLOCATION_TTL):
+    """Aloca um lote de pedidos em separação sem CD. Faz commit.
+
+    Sem ``order_ids``, pega os próximos ``batch_size`` pedidos com id acima
+    de ``after_id``. Pedidos sem saldo suficiente ficam sem alocação e são
+    tentados de novo na próxima rodada; nada é reservado parcialmente.
+    """
+    with _run_lock:
+        try:
+            result = _allocate_batch(order_ids, after_id, batch_size, ttl)
+            db.session.commit()
+            _index.mark_seen(result.outbox_ids)
+        except Exception:
+            db.session.rollback()
+            # o índice já descontou reservas que não foram confirmadas
+            _index.clear()
+            raise
+    logger.info(
+        "Alocação: %s pedidos, %s alocados (%s divididos), %s sem saldo, %s replanejados",
+        result.orders,
+        result.allocated,
+        result.split,
+        result.unfilled,
+        result.retries,
+    )
+    return result
+
+
+def _allocate_batch(order_ids, after_id, batch_size, ttl):
+    result = AllocationResult(last_id=after_id)
+    orders = _pending_orders(order_ids, after_id, batch_size)
+    if not orders:
+        return result
+    result.orders = len(orders)
+    result.last_id = orders[-1][0]
+
+    ids = [order_id for order_id, _, _ in orders]
+    reserved = _with_reservations(ids)  # ex.: reservados no checkout
+    lines_by_order = _lines_by_order([oid for oid in ids if oid not in reserved])
+    sites, inactive = load_sites()
+
+    result.refreshed = _index.refresh()
+    _index.ensure({pid for lines in lines_by_order.values() for pid in lines})
+
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    expires_at = now + ttl
+    reservations, allocated, touched = [], [], set()
+    for order_id, postal_code, address in orders:
+        if order_id in reserved:
+            result.already_reserved += 1
+            allocated.append(order_id)
+            continue
+        lines = lines_by_order.get(order_id)
+        if not lines:
+            continue
+        destination = _destination(postal_code, address)
+
+        for _ in range(MAX_ATTEMPTS):
+            stock = {
+                pid: {
+                    loc: qty for loc, qty in _index.available(pid).items() if loc not in inactive
+                }
+                for pid in lines
+            }
+            plan = plan_order(lines, stock, sites, destination)
+            if plan is None:
+                result.unfilled += 1
+                break
+            rows = [(_index.stock_id(pid, loc), pid, qty) for loc, pid, qty in plan]
+            stale = _reserve(connection, rows, now)
+            if stale is not None:
+                # outra transação levou o saldo: relê o produto e replaneja
+                result.retries += 1
+                _index.load([stale])
+                continue
+
+            for location, pid, qty in plan:
+                _index.take(pid, location, qty)
+                touched.add(pid)
+            for stock_id, _, qty in rows:
+                reservations.append(
+                    {
+                        "order_id": order_id,
+                        "product_stock_id": stock_id,
+                        "quantity": qty,
+                        "status": "active",
+                        "expires_at": expires_at,
+                    }
+                )
+            used = {location for location, _, _ in plan}
+            for location in used:
+                result.by_location[location] = result.by_location.get(location, 0) + 1
+            result.allocated += 1
+            result.shipments += len(used)
+            result.split += len(used) > 1
+            located = [sites[loc].location for loc in used if loc in sites and sites[loc].location]
+            if destination is not None and len(located) == len(used):
+                result.located += 1
+                result.distance_km += sum(distance_km(loc, destination) for loc in located)
+            allocated.append(order_id)
+            break
+        else:
+            result.unfilled += 1
+
+    if reservations:
+        db.session.execute(StockReservation.__table__.insert(), reservations)
+    for chunk in _chunks(allocated):
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_(chunk))
+            .values(allocated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if touched:
+        # mesmo efeito de ``record_stock_changes``, guardando os ids: são
+        # alterações que o índice já conhece e não precisa reler
+        result.outbox_ids = connection.execute(
+            insert(StockOutbox).returning(StockOutbox.id),
+            [{"product_id": pid} for pid in touched],
+        ).scalars().all()
+    return result
+
+
+def allocate_all(batch_size=BATCH_SIZE):
+    """Roda lotes até o fim da fila. Devolve o ``AllocationResult`` somado."""
+    total = AllocationResult()
+    while True:
+        result = allocate_orders(after_id=total.last_id, batch_size=batch_size)
+        for name in (
+            "orders",
+            "allocated",
+            "already_reserved",
+            "unfilled",
+            "split",
+            "shipments",
+            "retries",
+            "refreshed",
+            "distance_km",
+            "located",
+        ):
+            setattr(total, name, getattr(total, name) + getattr(result, name))
+        for location, count in result.by_location.items():
+            total.by_location[location] = total.by_location.get(location, 0) + count
+        total.last_id = result.last_id
+        if result.orders < batch_size:
+            return total
@@ -0,0 +1,164 @@
+"""``user_loader`` do Flask-Login com cache por processo.
+
+O ``User`` é carregado junto com ``Vendor`` e ``BlingAccount`` num único
+SELECT. Uma cópia dos valores fica em cache por ``USER_CACHE_TTL``
+segundos; nas requisições seguintes o usuário é remontado e anexado à
+sessão sem ir ao banco. Qualquer flush que altere o usuário, seu
+vendedor ou sua conta Bling invalida a entrada.
+
+O cache guarda no máximo ``USER_CACHE_SIZE`` usuários (descarta o usado
+há mais tempo) e não guarda segredos: hash de senha e tokens do Bling
+ficam de fora e, se alguém os ler, vêm do banco na hora.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
+
+from ..extensions import db
+from ..models import BlingAccount, User, Vendor
+
+CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+SECRET_COLUMNS = {"password_hash", "access_token", "refresh_token"}
+
+
+def _columns(obj):
+    if obj is None:
+        return None
+    mapper = obj.__mapper__
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in mapper.column_attrs
+        if attr.key not in SECRET_COLUMNS
+    }
+
+
+class UserCache:
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry["expires_at"] <= time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        return entry
+
+    def put(self, user):
+        vendor = user.vendor
+        entry = {
+            "user": _columns(user),
+            "vendor": _columns(vendor),
+            "bling_account": _columns(vendor.bling_account) if vendor else None,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        with self._lock:
+            self._entries[user.id] = entry
+            self._entries.move_to_end(user.id)
+            now = time.monotonic()
+            # o usado há mais tempo fica no começo: descarta excesso e vencidos
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if len(self._entries) <= self.max_entries and oldest["expires_at"] > now:
+                    break
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id=None, vendor_id=None):
+        with self._lock:
+            if user_id is None and vendor_id is not None:
+                user_id = next(
+                    (
+                        uid
+                        for uid, entry in self._entries.items()
+                        if entry["vendor"] and entry["vendor"]["id"] == vendor_id
+                    ),
+                    None,
+                )
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "ttl_seconds": self.ttl,
+        }
+
+
+user_cache = UserCache()
+
+
+def _rebuild(entry):
+    """Remonta o grafo User → Vendor → BlingAccount como objetos detached."""
+    user = User(**entry["user"])
+    vendor = Vendor(**entry["vendor"]) if entry["vendor"] else None
+    if vendor is not None:
+        vendor.bling_account = (
+            BlingAccount(**entry["bling_account"]) if entry["bling_account"] else None
+        )
+    user.vendor = vendor
+    for obj in (user, vendor, vendor.bling_account if vendor else None):
+        if obj is not None:
+            make_transient_to_detached(obj)
+    return user
+
+
+def load_user(user_id):
+    user_id = int(user_id)
+    entry = user_cache.get(user_id)
+    if entry is not None:
+        # load=False: anexa à sessão sem SELECT
+        return db.session.merge(_rebuild(entry), load=False)
+
+    user = (
+        db.session.query(User)
+        .options(joinedload(User.vendor).joinedload(Vendor.bling_account))
+        .filter(User.id == user_id)
+        .one_or_none()
+    )
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+
+def _invalidate_on_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            user_cache.invalidate(user_id=obj.id)
+        elif isinstance(obj, Vendor):
+            user_cache.invalidate(user_id=obj.user_id)
+        elif isinstance(obj, BlingAccount):
+            user_cache.invalidate(vendor_id=obj.vendor_id)
+
+
+def register_user_cache_events():
+    if not event.contains(Session, "after_flush", _invalidate_on_flush):
+        event.listen(Session, "after_flush", _invalidate_on_flush)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from ..db_routing import use_primary
 from ..extensions import db
 from ..models import User, Vendor
 
@@ -87,6 +88,7 @@ def register_vendor():
 # INICIAR SISTEMA / CRIAR ADMIN
 # ============================
 @auth_bp.route("/init-admin")
+@use_primary
 def init_admin():
     # cria todas as tabelas
     db.create_all()
@@ -0,0 +1,39 @@
+"""Conexão da conta Bling do vendedor (roda no worker, ver ``fastdrop.tasks``)."""
+import requests
+
+from ..extensions import db
+from ..models import BlingAccount, Vendor
+from .client import BlingClient, BlingError, exchange_code
+
+
+def connect_vendor(vendor_id, code, redirect_uri):
+    """Troca o code do OAuth pelos tokens e grava a ``BlingAccount`` do vendedor."""
+    vendor = db.session.get(Vendor, vendor_id)
+    if vendor is None:
+        raise LookupError(f"Vendedor {vendor_id} não encontrado.")
+
+    access_token, refresh_token, expires_at = exchange_code(code, redirect_uri)
+    if vendor.bling_account:
+        vendor.bling_account.access_token = access_token
+        vendor.bling_account.refresh_token = refresh_token
+        vendor.bling_account.token_expires_at = expires_at
+    else:
+        db.session.add(
+            BlingAccount(
+                vendor_id=vendor.id,
+                access_token=access_token,
+                refresh_token=refresh_token,
+                token_expires_at=expires_at,
+            )
+        )
+    vendor.bling_connected = True
+    db.session.commit()
+
+    # companyId identifica a conta nos webhooks
+    try:
+        company = BlingClient(vendor.bling_account).get("/empresas/me/dados-basicos")
+        vendor.bling_account.company_id = str(company["data"]["id"])
+        db.session.commit()
+    except (BlingError, requests.RequestException, KeyError):
+        db.session.rollback()
+    return vendor.bling_account
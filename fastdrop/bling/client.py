@@ -0,0 +1,237 @@
+"""Cliente HTTP compartilhado para a API v3 do Bling.
+
+Toda chamada ao Bling deve passar por aqui: a sessão ``requests`` é única
+por processo (criada, e o ``requests`` importado, no primeiro uso; com
+keep-alive e retries com backoff), cada vendedor tem seu próprio token
+bucket respeitando a cota de requisições por segundo e o access token é
+renovado antes de expirar.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..extensions import db
+from ..models import BlingAccount
+
+BLING_API_URL = os.environ.get("BLING_API_URL", "https://www.bling.com.br/Api/v3")
+BLING_TOKEN_URL = f"{BLING_API_URL}/oauth/token"
+
+# cota do Bling: 3 requisições por segundo por conta
+RATE_LIMIT_PER_SECOND = float(os.environ.get("BLING_RATE_LIMIT", "3"))
+RATE_LIMIT_BURST = int(os.environ.get("BLING_RATE_BURST", "3"))
+# renova o token quando faltar menos que isso para expirar
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+REQUEST_TIMEOUT = 30
+TOKEN_COLUMNS = ("access_token", "refresh_token", "token_expires_at")
+
+
+class BlingError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token bucket thread-safe; ``acquire`` bloqueia até haver ficha."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_session = None
+_session_lock = threading.Lock()
+_buckets = {}
+_refresh_locks = {}
+_registry_lock = threading.Lock()
+
+
+def get_session():
+    """Sessão HTTP única do processo, criada no primeiro uso."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=4,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=32, max_retries=retry
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _bucket_for(vendor_id):
+    with _registry_lock:
+        bucket = _buckets.get(vendor_id)
+        if bucket is None:
+            bucket = _buckets[vendor_id] = TokenBucket(
+                RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST
+            )
+        return bucket
+
+
+def _refresh_lock_for(account_id):
+    with _registry_lock:
+        return _refresh_locks.setdefault(account_id, threading.Lock())
+
+
+def _client_auth():
+    client_id = os.environ.get("BLING_CLIENT_ID")
+    client_secret = os.environ.get("BLING_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        raise BlingError("Credenciais do Bling não configuradas.")
+    return client_id, client_secret
+
+
+def _request_token(data):
+    resp = get_session().post(
+        BLING_TOKEN_URL, data=data, auth=_client_auth(), timeout=REQUEST_TIMEOUT
+    )
+    if resp.status_code != 200:
+        raise BlingError(f"Erro ao obter token do Bling ({resp.status_code}).")
+    token_data = resp.json()
+    expires_at = datetime.utcnow() + timedelta(
+        seconds=token_data.get("expires_in", 3600)
+    )
+    return token_data["access_token"], token_data["refresh_token"], expires_at
+
+
+def exchange_code(code, redirect_uri):
+    """Troca o ``code`` do OAuth por (access_token, refresh_token, expires_at)."""
+    return _request_token(
+        {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+        }
+    )
+
+
+def _token_expiring(account):
+    return account.token_expires_at - datetime.utcnow() <= TOKEN_REFRESH_MARGIN
+
+
+def _renew(locked, rejected_token):
+    if _token_expiring(locked) or locked.access_token == rejected_token:
+        (
+            locked.access_token,
+            locked.refresh_token,
+            locked.token_expires_at,
+        ) = _request_token(
+            {"grant_type": "refresh_token", "refresh_token": locked.refresh_token}
+        )
+
+
+def _refresh_token(account_id, rejected_token):
+    """Renova o token numa transação própria e devolve os valores gravados.
+
+    Roda numa sessão separada para não commitar (nem perder os locks de)
+    a transação de quem chamou; qualquer erro desfaz só esta transação.
+    """
+    with Session(db.engine) as session, session.begin():
+        locked = session.scalars(
+            select(BlingAccount).where(BlingAccount.id == account_id).with_for_update()
+        ).one()
+        _renew(locked, rejected_token)
+        return tuple(getattr(locked, name) for name in TOKEN_COLUMNS)
+
+
+def ensure_fresh_token(account, rejected_token=None):
+    """Renova o token da conta se estiver perto de expirar.
+
+    ``rejected_token`` força a renovação quando o Bling recusou esse token.
+    O lock por conta evita que threads do mesmo processo renovem juntas;
+    o ``SELECT ... FOR UPDATE`` faz o mesmo entre processos no Postgres.
+    Quem chega depois relê a conta e aproveita o token já renovado. A
+    ``account`` de quem chamou recebe os valores novos sem ficar suja.
+    """
+    if rejected_token is None and not _token_expiring(account):
+        return account
+
+    with _refresh_lock_for(account.id):
+        if db.engine.dialect.name == "sqlite":
+            # um escritor só: outra conexão esperaria o lock de quem chamou,
+            # então renova num savepoint e grava junto com o chamador
+            with db.session.begin_nested():
+                db.session.refresh(account)
+                _renew(account, rejected_token)
+            return account
+        tokens = _refresh_token(account.id, rejected_token)
+    for name, value in zip(TOKEN_COLUMNS, tokens):
+        set_committed_value(account, name, value)
+    return account
+
+
+class BlingClient:
+    """Chamadas autenticadas em nome de um vendedor."""
+
+    def __init__(self, account):
+        self.account = account
+        self.bucket = _bucket_for(account.vendor_id)
+
+    def request(self, method, path, **kwargs):
+        self.account = ensure_fresh_token(self.account)
+        for attempt in range(2):
+            self.bucket.acquire()
+            resp = get_session().request(
+                method,
+                f"{BLING_API_URL}{path}",
+                headers={"Authorization": f"Bearer {self.account.access_token}"},
+                timeout=REQUEST_TIMEOUT,
+                **kwargs,
+            )
+            if resp.status_code == 401 and attempt == 0:
+                # token revogado ou renovado por outro processo
+                self.account = ensure_fresh_token(
+                    self.account, rejected_token=self.account.access_token
+                )
+                continue
+            break
+        if resp.status_code >= 400:
+            raise BlingError(
+                f"Bling respondeu {resp.status_code} em {method} {path}: {resp.text[:200]}"
+            )
+        return resp.json() if resp.content else {}
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params)
+
+    def post(self, path, json=None):
+        return self.request("POST", path, json=json)
+
+    def put(self, path, json=None):
+        return self.request("PUT", path, json=json)
@@ -0,0 +1,365 @@
+"""Importação incremental de pedidos de venda do Bling.
+
+Cada vendedor conectado tem um high-water mark (``orders_synced_at``) na
+sua ``BlingAccount``; a importação pede ao Bling só os pedidos alterados
+desde então, resolve todos os SKUs de uma vez e grava pedidos e itens em
+lote, usando ``(vendor_id, external_order_id)`` como chave de upsert.
+
+O high-water mark é gravado em UTC, como as demais datas do banco; o
+Bling interpreta ``dataAlteracaoInicial`` no horário de Brasília, então
+o valor é convertido na hora de montar a consulta.
+"""
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import case, delete, insert, select
+
+from ..admin.stats import invalidate_dashboard_stats
+from ..extensions import db
+from ..geo import normalize_postal_code
+from ..models import (
+    DEFAULT_LOCATION,
+    BlingAccount,
+    Order,
+    OrderItem,
+    Product,
+    StockReservation,
+    Vendor,
+)
+from ..rollups import mark_orders_dirty
+from ..sql import upsert_statement
+from ..stock import RESERVATION_TTL, InsufficientStock, _reserve_lines, release_orders
+from .client import BlingClient, BlingError
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+# margem para não perder pedidos alterados durante a execução anterior
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# depois de pago/alocado, itens e totais do pedido não mudam na reimportação
+EDITABLE_STATUS = "pendente"
+MAX_VENDOR_WORKERS = int(os.environ.get("BLING_IMPORT_WORKERS", "8"))
+# fuso em que o Bling lê os filtros de data da API
+BLING_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+
+
+@dataclass
+class OrderImportResult:
+    vendor_id: int
+    orders: int = 0
+    items: int = 0
+    unknown_skus: set = field(default_factory=set)
+    # pedidos pendentes que perderam a reserva ao mudar de itens
+    unreserved: set = field(default_factory=set)
+
+    def merge(self, other):
+        self.orders += other.orders
+        self.items += other.items
+        self.unknown_skus |= other.unknown_skus
+        self.unreserved |= other.unreserved
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _format_address(payload):
+    etiqueta = (payload.get("transporte") or {}).get("etiqueta") or {}
+    parts = [
+        etiqueta.get("endereco"),
+        etiqueta.get("numero"),
+        etiqueta.get("complemento"),
+        etiqueta.get("bairro"),
+        etiqueta.get("municipio"),
+        etiqueta.get("uf"),
+        etiqueta.get("cep"),
+    ]
+    address = ", ".join(str(p) for p in parts if p)
+    return address or None
+
+
+def _postal_code(payload):
+    etiqueta = (payload.get("transporte") or {}).get("etiqueta") or {}
+    return normalize_postal_code(etiqueta.get("cep"))
+
+
+def upsert_orders(vendor_id, payloads):
+    """Grava em lote pedidos no formato do Bling (detalhe de /pedidos/vendas).
+
+    Reexecuções com os mesmos pedidos são idempotentes: o pedido é
+    atualizado e seus itens substituídos. O status interno do Fast Drop
+    não é sobrescrito, e itens e totais só mudam enquanto o pedido está
+    ``pendente`` (depois disso as reservas de estoque valem pelos itens
+    já gravados). Reservas de um pedido pendente são refeitas para os
+    itens novos. Não faz commit.
+    """
+    result = OrderImportResult(vendor_id=vendor_id)
+    if not payloads:
+        return result
+
+    # um único SELECT para todos os SKUs do lote
+    skus = {
+        item.get("codigo")
+        for payload in payloads
+        for item in payload.get("itens") or []
+        if item.get("codigo")
+    }
+    products = {}
+    if skus:
+        rows = db.session.execute(
+            select(
+                Product.id, Product.sku, Product.cost_price, Product.wholesale_price
+            ).where(Product.sku.in_(skus))
+        )
+        products = {row.sku: row for row in rows}
+
+    order_rows = []
+    items_by_external_id = {}
+    for payload in payloads:
+        external_id = str(payload["id"])
+        contato = payload.get("contato") or {}
+        total_cost = Decimal("0")
+        total_vendor_price = Decimal("0")
+        items = []
+        for item in payload.get("itens") or []:
+            sku = item.get("codigo")
+            product = products.get(sku)
+            if product is None:
+                result.unknown_skus.add(sku)
+                continue
+            quantity = int(Decimal(str(item.get("quantidade") or 0)))
+            subtotal_cost = product.cost_price * quantity
+            subtotal_vendor_price = product.wholesale_price * quantity
+            total_cost += subtotal_cost
+            total_vendor_price += subtotal_vendor_price
+            items.append(
+                {
+                    "product_id": product.id,
+                    "sku": sku,
+                    "quantity": quantity,
+                    "unit_cost": product.cost_price,
+                    "unit_vendor_price": product.wholesale_price,
+                    "subtotal_cost": subtotal_cost,
+                    "subtotal_vendor_price": subtotal_vendor_price,
+                }
+            )
+        items_by_external_id[external_id] = items
+
+        now = datetime.utcnow()
+        order_rows.append(
+            {
+                "vendor_id": vendor_id,
+                "origin": "bling",
+                "external_order_id": external_id,
+                "external_number": str(payload.get("numero") or "") or None,
+                "customer_name": contato.get("nome"),
+                "customer_document": contato.get("numeroDocumento"),
+                "customer_phone": contato.get("telefone") or contato.get("celular"),
+                "customer_email": contato.get("email"),
+                "shipping_address": _format_address(payload),
+                "shipping_postal_code": _postal_code(payload),
+                "status": "pendente",
+                "total_cost": total_cost,
+                "total_vendor_price": total_vendor_price,
+                "created_at": _parse_date(payload.get("data")) or now,
+                "updated_at": now,
+            }
+        )
+
+    stmt = upsert_statement(Order.__table__)
+    editable = Order.__table__.c.status == EDITABLE_STATUS
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["vendor_id", "external_order_id"],
+        set_={
+            **{
+                column: stmt.excluded[column]
+                for column in (
+                    "external_number",
+                    "customer_name",
+                    "customer_document",
+                    "customer_phone",
+                    "customer_email",
+                    "shipping_address",
+                    "shipping_postal_code",
+                    "updated_at",
+                )
+            },
+            **{
+                column: case(
+                    (editable, stmt.excluded[column]),
+                    else_=Order.__table__.c[column],
+                )
+                for column in ("total_cost", "total_vendor_price")
+            },
+        },
+    )
+    db.session.execute(stmt, order_rows)
+
+    rows = db.session.execute(
+        select(Order.external_order_id, Order.id, Order.status).where(
+            Order.vendor_id == vendor_id,
+            Order.external_order_id.in_(items_by_external_id.keys()),
+        )
+    ).all()
+    order_ids = {external_id: order_id for external_id, order_id, _ in rows}
+    editable_ids = {
+        external_id: order_id
+        for external_id, order_id, status in rows
+        if status == EDITABLE_STATUS
+    }
+    reserved = set(
+        db.session.scalars(
+            select(StockReservation.order_id).where(
+                StockReservation.order_id.in_(editable_ids.values()),
+                StockReservation.status == "active",
+            )
+        )
+    )
+    # reservas do checkout valem pelos itens antigos: devolve e refaz abaixo
+    release_orders(reserved)
+    db.session.execute(
+        delete(OrderItem).where(OrderItem.order_id.in_(editable_ids.values()))
+    )
+    item_rows = [
+        dict(item, order_id=editable_ids[external_id])
+        for external_id, items in items_by_external_id.items()
+        if external_id in editable_ids
+        for item in items
+    ]
+    if item_rows:
+        db.session.execute(insert(OrderItem), item_rows)
+    result.unreserved = _reserve_again(reserved, item_rows)
+
+    mark_orders_dirty(order_ids.values())
+    invalidate_dashboard_stats()
+    result.orders = len(order_rows)
+    result.items = len(item_rows)
+    return result
+
+
+def _reserve_again(order_ids, item_rows):
+    """Reserva de novo os itens dos pedidos; devolve os que ficaram sem saldo."""
+    lines_by_order = defaultdict(lambda: defaultdict(int))
+    for item in item_rows:
+        if item["order_id"] in order_ids:
+            lines_by_order[item["order_id"]][item["product_id"]] += item["quantity"]
+    unreserved = set(order_ids) - set(lines_by_order)
+    for order_id, lines in sorted(lines_by_order.items()):
+        try:
+            with db.session.begin_nested():
+                _reserve_lines(order_id, lines, DEFAULT_LOCATION, RESERVATION_TTL)
+        except InsufficientStock:
+            unreserved.add(order_id)
+    return unreserved
+
+
+def bling_datetime(value):
+    """Formata um datetime UTC (sem fuso, como no banco) no horário do Bling."""
+    local = value.replace(tzinfo=timezone.utc).astimezone(BLING_TIMEZONE)
+    return local.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def iter_changed_orders(client, since):
+    """Percorre as páginas de pedidos alterados desde ``since`` (UTC)."""
+    page = 1
+    while True:
+        params = {"pagina": page, "limite": PAGE_SIZE}
+        if since is not None:
+            params["dataAlteracaoInicial"] = bling_datetime(since)
+        data = client.get("/pedidos/vendas", params).get("data") or []
+        if not data:
+            return
+        yield data
+        if len(data) < PAGE_SIZE:
+            return
+        page += 1
+
+
+def import_vendor_orders(vendor):
+    """Importa os pedidos do Bling de um vendedor e avança o high-water mark."""
+    account = vendor.bling_account
+    result = OrderImportResult(vendor_id=vendor.id)
+    if account is None:
+        return result
+
+    client = BlingClient(account)
+    started_at = datetime.utcnow()
+    since = (
+        account.orders_synced_at - WATERMARK_OVERLAP
+        if account.orders_synced_at
+        else None
+    )
+    for summaries in iter_changed_orders(client, since):
+        # a listagem não traz os itens; o detalhe é buscado por pedido
+        payloads = [
+            client.get(f"/pedidos/vendas/{summary['id']}")["data"]
+            for summary in summaries
+        ]
+        result.merge(upsert_orders(vendor.id, payloads))
+        db.session.commit()
+
+    account.orders_synced_at = started_at
+    db.session.commit()
+
+    if result.unknown_skus:
+        logger.warning(
+            "Pedidos do vendedor %s com SKUs desconhecidos: %s",
+            vendor.id,
+            ", ".join(sorted(s for s in result.unknown_skus if s)),
+        )
+    if result.unreserved:
+        logger.warning(
+            "Pedidos do vendedor %s sem saldo para os itens alterados no Bling: %s",
+            vendor.id,
+            ", ".join(map(str, sorted(result.unreserved))),
+        )
+    return result
+
+
+def _import_vendor(app, vendor_id):
+    import requests
+
+    with app.app_context():
+        vendor = db.session.get(Vendor, vendor_id)
+        try:
+            return import_vendor_orders(vendor)
+        except (BlingError, requests.RequestException):
+            db.session.rollback()
+            logger.exception("Falha ao importar pedidos do vendedor %s", vendor_id)
+            return None
+
+
+def import_all_vendors(max_workers=MAX_VENDOR_WORKERS):
+    """Importa todos os vendedores conectados, vários em paralelo.
+
+    A cota do Bling é por conta (um GET de detalhe por pedido, 3 req/s),
+    então um vendedor sozinho não passa de ~180 pedidos/min; a vazão do
+    worker vem de importar vendedores em paralelo.
+    """
+    vendor_ids = db.session.scalars(
+        select(Vendor.id)
+        .join(BlingAccount, BlingAccount.vendor_id == Vendor.id)
+        .where(Vendor.bling_connected.is_(True))
+        .order_by(Vendor.id)
+    ).all()
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(_import_vendor, app, vendor_id) for vendor_id in vendor_ids]
+        results = [future.result() for future in futures]
+    return [result for result in results if result is not None]
@@ -1,15 +1,15 @@
 import os
-from datetime import datetime, timedelta
-import requests
-from flask import Blueprint, redirect, request, url_for, flash, render_template
+from flask import Blueprint, redirect, request, url_for, flash, render_template, abort
 from flask_login import login_required, current_user
+from ..db_routing import use_primary
 from ..extensions import db
-from ..models import Vendor, BlingAccount
+from ..models import Vendor
+from ..jobs import enqueue
+from .webhooks import SIGNATURE_HEADER, store_event, verify_signature
 
 bling_bp = Blueprint("bling", __name__)
 
 BLING_AUTH_URL = "https://www.bling.com.br/Api/v3/oauth/authorize"
-BLING_TOKEN_URL = "https://www.bling.com.br/Api/v3/oauth/token"
 
 def get_bling_client_credentials():
     client_id = os.environ.get("BLING_CLIENT_ID")
@@ -37,6 +37,7 @@ def connect():
     return redirect(auth_url)
 
 @bling_bp.route("/callback")
+@use_primary
 def callback():
     code = request.args.get("code")
     state = request.args.get("state")  # vendor_id
@@ -50,44 +51,16 @@ def callback():
         flash("Credenciais do Bling não configuradas.", "danger")
         return redirect(url_for("auth.login"))
 
-    data = {
-        "grant_type": "authorization_code",
-        "code": code,
-        "redirect_uri": redirect_uri,
-        "client_id": client_id,
-        "client_secret": client_secret,
-    }
-    resp = requests.post(BLING_TOKEN_URL, data=data, timeout=30)
-    if resp.status_code != 200:
-        flash("Erro ao obter token do Bling.", "danger")
-        return redirect(url_for("auth.login"))
-    token_data = resp.json()
-    access_token = token_data.get("access_token")
-    refresh_token = token_data.get("refresh_token")
-    expires_in = token_data.get("expires_in", 3600)
-
     vendor = Vendor.query.get(int(state))
     if not vendor:
         flash("Vendedor não encontrado.", "danger")
         return redirect(url_for("auth.login"))
 
-    expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-    if vendor.bling_account:
-        vendor.bling_account.access_token = access_token
-        vendor.bling_account.refresh_token = refresh_token
-        vendor.bling_account.token_expires_at = expires_at
-    else:
-        ba = BlingAccount(
-            vendor_id=vendor.id,
-            access_token=access_token,
-            refresh_token=refresh_token,
-            token_expires_at=expires_at,
-        )
-        db.session.add(ba)
-    vendor.bling_connected = True
+    # a troca do code pelos tokens roda no worker
+    enqueue("bling.connect", vendor.id, code, redirect_uri)
     db.session.commit()
-    flash("Bling conectado com sucesso!", "success")
-    return redirect(url_for("vendor.dashboard"))
+    flash("Conexão com o Bling em andamento; atualize o status em instantes.", "info")
+    return redirect(url_for("bling.status"))
 
 @bling_bp.route("/status")
 @login_required
@@ -97,3 +70,15 @@ def status():
         return redirect(url_for("admin.dashboard"))
     vendor = current_user.vendor
     return render_template("bling/status.html", vendor=vendor)
+
+@bling_bp.route("/webhook", methods=["POST"])
+def webhook():
+    """Recebe eventos do Bling: valida, grava no inbox e responde na hora."""
+    body = request.get_data(cache=False)
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER)):
+        abort(401)
+    try:
+        store_event(body)
+    except ValueError:
+        abort(400)
+    return "", 204
@@ -0,0 +1,352 @@
+"""Envio em lote dos saldos de estoque para o Bling de cada vendedor.
+
+Consome o ``stock_outbox``: várias alterações do mesmo produto viram um
+único envio com o saldo disponível atual, e cada vendedor conectado
+recebe o lote inteiro numa thread própria (concorrência limitada).
+
+O lote é marcado como pego e commitado antes dos envios. Falhas ficam
+por vendedor em ``stock_sync_failures``, com backoff; depois de
+``MAX_ATTEMPTS`` param (``dead_at``) e aparecem em ``outbox_metrics``
+até ``flask stock retry-failed``.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from ..extensions import db
+from ..jobs import _backoff
+from ..models import (
+    BlingAccount,
+    Product,
+    ProductStock,
+    StockOutbox,
+    StockSyncFailure,
+    Vendor,
+)
+from ..sql import upsert_statement
+from .client import BlingClient
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+MAX_VENDOR_WORKERS = int(os.environ.get("STOCK_SYNC_WORKERS", "8"))
+MAX_ATTEMPTS = 8  # por vendedor/produto, com backoff de jobs._backoff (~10 min no total)
+# lote pego por um propagador que não terminou volta depois disso
+CLAIM_TIMEOUT = timedelta(minutes=30)
+BLING_DEPOSITO_ID = os.environ.get("BLING_DEPOSITO_ID")
+SKU_LOOKUP_CHUNK = 100
+
+# id do produto no Bling de cada vendedor, por SKU
+_bling_product_ids = {}
+_bling_ids_lock = threading.Lock()
+
+last_run = {}
+
+
+def _resolve_bling_ids(client, vendor_id, skus):
+    with _bling_ids_lock:
+        missing = [sku for sku in skus if (vendor_id, sku) not in _bling_product_ids]
+    for start in range(0, len(missing), SKU_LOOKUP_CHUNK):
+        chunk = missing[start : start + SKU_LOOKUP_CHUNK]
+        data = client.get(
+            "/produtos", {"codigos[]": chunk, "limite": SKU_LOOKUP_CHUNK}
+        ).get("data") or []
+        with _bling_ids_lock:
+            for product in data:
+                _bling_product_ids[(vendor_id, product.get("codigo"))] = product["id"]
+    with _bling_ids_lock:
+        return {
+            sku: _bling_product_ids[(vendor_id, sku)]
+            for sku in skus
+            if (vendor_id, sku) in _bling_product_ids
+        }
+
+
+def _push_vendor(app, vendor_id, balances):
+    """Envia ``{sku: saldo}`` para o Bling de um vendedor."""
+    with app.app_context():
+        account = BlingAccount.query.filter_by(vendor_id=vendor_id).first()
+        if account is None:
+            return 0
+        client = BlingClient(account)
+        bling_ids = _resolve_bling_ids(client, vendor_id, list(balances))
+        for sku, bling_id in bling_ids.items():
+            payload = {
+                "produto": {"id": bling_id},
+                "operacao": "B",  # balanço: define o saldo absoluto
+                "quantidade": balances[sku],
+                "observacoes": "Fast Drop",
+            }
+            if BLING_DEPOSITO_ID:
+                payload["deposito"] = {"id": int(BLING_DEPOSITO_ID)}
+            client.post("/estoques", payload)
+        return len(bling_ids)
+
+
+def _available(product_ids):
+    """``{product_id: (sku, saldo disponível)}``."""
+    available = func.sum(
+        func.coalesce(ProductStock.estoque_total, 0)
+        - func.coalesce(ProductStock.estoque_reservado, 0)
+    )
+    rows = db.session.execute(
+        select(Product.id, Product.sku, func.coalesce(available, 0))
+        .outerjoin(ProductStock, ProductStock.product_id == Product.id)
+        .where(Product.id.in_(product_ids))
+        .group_by(Product.id, Product.sku)
+    )
+    return {product_id: (sku, max(0, int(qty))) for product_id, sku, qty in rows}
+
+
+def _claim_outbox(batch_size, now):
+    """Pega um lote do outbox e grava a posse; o commit é de quem chama.
+
+    O envio acontece depois do commit, sem linhas travadas. Um lote cujo
+    propagador morreu volta a ser pego depois de ``CLAIM_TIMEOUT``.
+    """
+    claimable = and_(
+        StockOutbox.processed_at.is_(None),
+        or_(
+            StockOutbox.claimed_at.is_(None),
+            StockOutbox.claimed_at < now - CLAIM_TIMEOUT,
+        ),
+    )
+    candidates = (
+        select(StockOutbox.id)
+        .where(claimable)
+        .order_by(StockOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    # o UPDATE repete a condição: no SQLite (sem SKIP LOCKED) quem chegar
+    # depois não leva as mesmas linhas
+    return db.session.execute(
+        update(StockOutbox)
+        .where(StockOutbox.id.in_(candidates.scalar_subquery()), claimable)
+        .values(claimed_at=now, attempts=func.coalesce(StockOutbox.attempts, 0) + 1)
+        .returning(StockOutbox.id, StockOutbox.product_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _claim_retries(vendor_ids, batch_size, now):
+    """Pega as falhas vencidas dos vendedores conectados (adia o próximo retry)."""
+    if not vendor_ids:
+        return []
+    candidates = (
+        select(StockSyncFailure.id)
+        .where(
+            StockSyncFailure.dead_at.is_(None),
+            StockSyncFailure.retry_at <= now,
+            StockSyncFailure.vendor_id.in_(vendor_ids),
+        )
+        .order_by(StockSyncFailure.retry_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    return db.session.execute(
+        update(StockSyncFailure)
+        .where(
+            StockSyncFailure.id.in_(candidates.scalar_subquery()),
+            StockSyncFailure.retry_at <= now,
+        )
+        .values(retry_at=now + CLAIM_TIMEOUT)
+        .returning(StockSyncFailure.vendor_id, StockSyncFailure.product_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _record_failures(vendor_id, product_ids, error, now):
+    """Soma uma tentativa às falhas do vendedor; esgotadas, marca ``dead_at``."""
+    db.session.execute(
+        upsert_statement(StockSyncFailure.__table__).on_conflict_do_nothing(
+            index_elements=["vendor_id", "product_id"]
+        ),
+        [
+            {
+                "vendor_id": vendor_id,
+                "product_id": product_id,
+                "attempts": 0,
+                "retry_at": now,
+                "created_at": now,
+            }
+            for product_id in product_ids
+        ],
+    )
+    rows = db.session.execute(
+        update(StockSyncFailure)
+        .where(
+            StockSyncFailure.vendor_id == vendor_id,
+            StockSyncFailure.product_id.in_(product_ids),
+        )
+        .values(
+            attempts=func.coalesce(StockSyncFailure.attempts, 0) + 1,
+            error=error[:4000],
+            updated_at=now,
+        )
+        .returning(StockSyncFailure.id, StockSyncFailure.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.execute(
+        update(StockSyncFailure),
+        [
+            {
+                "id": failure_id,
+                "retry_at": now + _backoff(attempts),
+                "dead_at": now if attempts >= MAX_ATTEMPTS else None,
+            }
+            for failure_id, attempts in rows
+        ],
+    )
+
+
+def propagate_stock(batch_size=BATCH_SIZE, max_workers=MAX_VENDOR_WORKERS):
+    """Drena um lote do outbox e as falhas vencidas. Retorna quantos produtos foram enviados.
+
+    Cada vendedor recebe os produtos do lote mais os que falharam antes
+    para ele. Se o envio de um vendedor falha, só os pares
+    vendedor/produto dele ficam em ``stock_sync_failures``; o lote do
+    outbox é concluído para os demais.
+    """
+    started = time.monotonic()
+    now = datetime.utcnow()
+    vendor_ids = db.session.scalars(
+        select(Vendor.id)
+        .join(BlingAccount, BlingAccount.vendor_id == Vendor.id)
+        .where(Vendor.bling_connected.is_(True))
+    ).all()
+    pending = _claim_outbox(batch_size, now)
+    retries = _claim_retries(vendor_ids, batch_size, now)
+    db.session.commit()
+    if not pending and not retries:
+        last_run.update(changes=0, retries=0, failed_vendors=[])
+        return 0
+
+    outbox_products = {row.product_id for row in pending}
+    products_by_vendor = {
+        vendor_id: set(outbox_products) for vendor_id in vendor_ids
+    }
+    for vendor_id, product_id in retries:
+        products_by_vendor[vendor_id].add(product_id)
+    products_by_vendor = {v: p for v, p in products_by_vendor.items() if p}
+    available = _available(set().union(*products_by_vendor.values()))
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            vendor_id: pool.submit(
+                _push_vendor,
+                app,
+                vendor_id,
+                dict(available[p] for p in product_ids if p in available),
+            )
+            for vendor_id, product_ids in products_by_vendor.items()
+        }
+        for vendor_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as exc:
+                failed[vendor_id] = f"{type(exc).__name__}: {exc}"
+                logger.exception(
+                    "Falha ao enviar estoque para o Bling do vendedor %s", vendor_id
+                )
+
+    now = datetime.utcnow()
+    try:
+        for vendor_id, product_ids in products_by_vendor.items():
+            if vendor_id in failed:
+                _record_failures(vendor_id, product_ids, failed[vendor_id], now)
+            else:
+                db.session.execute(
+                    delete(StockSyncFailure).where(
+                        StockSyncFailure.vendor_id == vendor_id,
+                        StockSyncFailure.product_id.in_(product_ids),
+                    )
+                )
+        if pending:
+            db.session.execute(
+                update(StockOutbox)
+                .where(StockOutbox.id.in_([row.id for row in pending]))
+                .values(processed_at=now)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    last_run.update(
+        finished_at=now.isoformat(),
+        duration_ms=round((time.monotonic() - started) * 1000, 1),
+        changes=len(pending),
+        retries=len(retries),
+        products=len(available),
+        vendors=len(products_by_vendor),
+        failed_vendors=sorted(failed),
+    )
+    return len(available)
+
+
+def retry_dead_failures(vendor_id=None):
+    """Devolve à fila as falhas paradas (ex.: depois de reconectar o Bling)."""
+    stmt = update(StockSyncFailure).where(StockSyncFailure.dead_at.is_not(None))
+    if vendor_id is not None:
+        stmt = stmt.where(StockSyncFailure.vendor_id == vendor_id)
+    count = db.session.execute(
+        stmt.values(dead_at=None, attempts=0, retry_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def run_propagator(
+    window=5.0,
+    batch_size=BATCH_SIZE,
+    max_workers=MAX_VENDOR_WORKERS,
+    stop_event=None,
+):
+    """Drena o outbox continuamente, juntando as alterações de cada janela.
+
+    Só emenda um lote no outro quando o anterior veio cheio (backlog);
+    caso contrário espera ``window`` segundos para acumular alterações.
+    """
+    while stop_event is None or not stop_event.is_set():
+        propagate_stock(batch_size=batch_size, max_workers=max_workers)
+        if last_run.get("changes", 0) < batch_size or last_run.get("failed_vendors"):
+            time.sleep(window)
+
+
+def outbox_metrics():
+    backlog, oldest = db.session.execute(
+        select(func.count(StockOutbox.id), func.min(StockOutbox.created_at)).where(
+            StockOutbox.processed_at.is_(None)
+        )
+    ).one()
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    retrying = db.session.scalar(
+        select(func.count(StockSyncFailure.id)).where(StockSyncFailure.dead_at.is_(None))
+    )
+    # esgotaram as tentativas: não são reenviadas sozinhas
+    dead = dict(
+        db.session.execute(
+            select(StockSyncFailure.vendor_id, func.count(StockSyncFailure.id))
+            .where(StockSyncFailure.dead_at.is_not(None))
+            .group_by(StockSyncFailure.vendor_id)
+        ).all()
+    )
+    return {
+        "backlog": backlog,
+        "lag_seconds": round(lag, 1),
+        "retrying": retrying,
+        "failed": sum(dead.values()),
+        "failed_by_vendor": dead,
+        "last_run": last_run,
+    }
@@ -0,0 +1,194 @@
+"""Webhooks do Bling: recepção em inbox e processamento em lote.
+
+A rota ``/bling/webhook`` só confere a assinatura e grava o evento bruto
+em ``bling_webhook_events`` (ignorando reenvios pelo ``eventId``). O
+``drain_webhook_inbox`` roda fora da requisição, busca o detalhe de cada
+pedido uma única vez por lote e grava tudo com ``upsert_orders``. O lote
+é marcado como pego e commitado antes das chamadas ao Bling, então
+nenhuma linha fica travada durante o HTTP.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+
+from ..extensions import db
+from ..models import BlingAccount, BlingWebhookEvent
+from ..sql import upsert_statement
+from .client import BlingClient
+from .orders import upsert_orders
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Bling-Signature-256"
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+# lote pego por um drain que não terminou volta depois disso
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+
+def verify_signature(body, header_value):
+    """HMAC-SHA256 do corpo com o client secret do app Bling."""
+    secret = os.environ.get("BLING_CLIENT_SECRET")
+    if not secret or not header_value:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    received = header_value.split("=", 1)[-1].strip()
+    return hmac.compare_digest(expected, received)
+
+
+def store_event(body):
+    """Grava o evento no inbox; reenvios do mesmo ``eventId`` são ignorados.
+
+    ``ValueError`` se o corpo não for um objeto JSON (a rota responde 400).
+    """
+    data = json.loads(body)
+    if not isinstance(data, dict) or not isinstance(data.get("data") or {}, dict):
+        raise ValueError("Evento do Bling não é um objeto JSON.")
+    event_id = data.get("eventId") or hashlib.sha256(body).hexdigest()
+    stmt = upsert_statement(BlingWebhookEvent.__table__).on_conflict_do_nothing(
+        index_elements=["event_id"]
+    )
+    db.session.execute(
+        stmt,
+        {
+            "event_id": str(event_id),
+            "company_id": str(data.get("companyId") or "") or None,
+            "event": data.get("event"),
+            "payload": body.decode("utf-8"),
+            "attempts": 0,
+            "received_at": datetime.utcnow(),
+        },
+    )
+    db.session.commit()
+
+
+def _accounts_by_company(company_ids):
+    accounts = BlingAccount.query.filter(BlingAccount.company_id.in_(company_ids)).all()
+    return {account.company_id: account for account in accounts}
+
+
+def _process_batch(events):
+    """Processa um lote.
+
+    Devolve ``({event_id: erro}, ids inválidos)``: os que falharam (vão ser
+    tentados de novo) e os que não têm como ser processados.
+    """
+    orders_by_company = defaultdict(set)
+    failures, invalid = {}, set()
+    for event in events:
+        if not (event.event or "").startswith("order."):
+            continue
+        if event.event == "order.deleted":
+            continue
+        try:
+            order_id = (json.loads(event.payload).get("data") or {}).get("id")
+            if order_id:
+                orders_by_company[event.company_id].add(int(order_id))
+        except (AttributeError, TypeError, ValueError) as exc:
+            failures[event.id] = f"Evento inválido: {exc}"[:500]
+            invalid.add(event.id)
+
+    accounts = _accounts_by_company(list(orders_by_company))
+    for company_id, order_ids in orders_by_company.items():
+        company_events = [
+            e.id for e in events if e.company_id == company_id and e.id not in invalid
+        ]
+        account = accounts.get(company_id)
+        if account is None:
+            for event_id in company_events:
+                failures[event_id] = f"Nenhuma conta Bling com companyId {company_id}"
+            continue
+        try:
+            client = BlingClient(account)
+            # vários eventos do mesmo pedido no lote viram um único GET
+            payloads = [
+                client.get(f"/pedidos/vendas/{order_id}")["data"]
+                for order_id in sorted(order_ids)
+            ]
+            with db.session.begin_nested():
+                upsert_orders(account.vendor_id, payloads)
+        except Exception as exc:
+            logger.exception("Falha ao processar webhooks da empresa %s", company_id)
+            for event_id in company_events:
+                failures[event_id] = str(exc)[:500]
+    return failures, invalid
+
+
+def _claim_events(batch_size, now):
+    """Pega um lote pendente e grava a posse; o commit é de quem chama."""
+    claimable = and_(
+        BlingWebhookEvent.processed_at.is_(None),
+        or_(
+            BlingWebhookEvent.claimed_at.is_(None),
+            BlingWebhookEvent.claimed_at < now - CLAIM_TIMEOUT,
+        ),
+    )
+    candidates = (
+        select(BlingWebhookEvent.id)
+        .where(claimable)
+        .order_by(BlingWebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    # a condição se repete no UPDATE: no SQLite (sem SKIP LOCKED) quem
+    # chegar depois não leva os mesmos eventos
+    return db.session.scalars(
+        update(BlingWebhookEvent)
+        .where(BlingWebhookEvent.id.in_(candidates.scalar_subquery()), claimable)
+        .values(claimed_at=now)
+        .returning(BlingWebhookEvent.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def drain_webhook_inbox(batch_size=BATCH_SIZE):
+    """Processa um lote do inbox. Retorna quantos eventos foram lidos."""
+    event_ids = _claim_events(batch_size, datetime.utcnow())
+    db.session.commit()
+    if not event_ids:
+        return 0
+    events = db.session.scalars(
+        select(BlingWebhookEvent)
+        .where(BlingWebhookEvent.id.in_(event_ids))
+        .order_by(BlingWebhookEvent.id)
+    ).all()
+
+    failures, invalid = _process_batch(events)
+    now = datetime.utcnow()
+    ok_ids = [e.id for e in events if e.id not in failures]
+    if ok_ids:
+        db.session.execute(
+            update(BlingWebhookEvent)
+            .where(BlingWebhookEvent.id.in_(ok_ids))
+            .values(processed_at=now, error=None)
+        )
+    for event in events:
+        if event.id in failures:
+            event.attempts = (event.attempts or 0) + 1
+            event.error = failures[event.id]
+            event.claimed_at = None
+            if event.id in invalid or event.attempts >= MAX_ATTEMPTS:
+                event.processed_at = now
+    db.session.commit()
+    return len(events)
+
+
+def run_webhook_worker(idle_sleep=1.0, batch_size=BATCH_SIZE, stop_event=None):
+    while stop_event is None or not stop_event.is_set():
+        if drain_webhook_inbox(batch_size) < batch_size:
+            time.sleep(idle_sleep)
+
+
+def inbox_backlog():
+    return db.session.scalar(
+        select(func.count(BlingWebhookEvent.id)).where(
+            BlingWebhookEvent.processed_at.is_(None)
+        )
+    )
@@ -0,0 +1,430 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+bling_cli = AppGroup("bling", help="Integração com o Bling.")
+stock_cli = AppGroup("stock", help="Estoque e reservas.")
+images_cli = AppGroup("images", help="Imagens de produto.")
+products_cli = AppGroup("products", help="Catálogo de produtos.")
+orders_cli = AppGroup("orders", help="Pedidos.")
+rollups_cli = AppGroup("rollups", help="Rollups diários de vendas.")
+payments_cli = AppGroup("payments", help="Pagamentos (Mercado Pago).")
+search_cli = AppGroup("search", help="Índice de busca de produtos.")
+freight_cli = AppGroup("freight", help="Cotação de frete.")
+
+
+class MigrateGroup(click.Group):
+    """``flask db`` do Flask-Migrate, carregado só quando usado.
+
+    O Flask-Migrate importa o alembic (~0,2 s), que nenhum worker web
+    precisa; a linha de comando é repassada ao grupo original.
+    """
+
+    def _migrate_cli(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as migrate_cli
+
+        from .extensions import db
+
+        if "migrate" not in current_app.extensions:
+            Migrate(current_app, db, render_as_batch=True)
+        return migrate_cli
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self._migrate_cli().make_context(info_name, args, parent=parent, **extra)
+
+    def list_commands(self, ctx):
+        return self._migrate_cli().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._migrate_cli().get_command(ctx, name)
+
+
+migrate_cli = MigrateGroup("db", help="Migrações do banco (Flask-Migrate).")
+
+
+@bling_cli.command("import-orders")
+@click.option("--vendor-id", type=int, help="Importa apenas este vendedor.")
+def import_orders(vendor_id):
+    """Importa pedidos novos/alterados do Bling desde o último sync."""
+    from .bling.orders import import_all_vendors, import_vendor_orders
+    from .models import Vendor
+
+    if vendor_id:
+        vendor = Vendor.query.get(vendor_id)
+        if vendor is None:
+            raise click.ClickException(f"Vendedor {vendor_id} não encontrado.")
+        results = [import_vendor_orders(vendor)]
+    else:
+        results = import_all_vendors()
+
+    for result in results:
+        click.echo(
+            f"vendedor {result.vendor_id}: {result.orders} pedidos, "
+            f"{result.items} itens, {len(result.unknown_skus)} SKUs desconhecidos"
+        )
+
+
+@bling_cli.command("drain-webhooks")
+@click.option("--loop", is_flag=True, help="Continua processando o inbox.")
+@click.option("--batch-size", default=200, show_default=True)
+def drain_webhooks_command(loop, batch_size):
+    """Processa os webhooks do Bling pendentes no inbox."""
+    from .bling.webhooks import drain_webhook_inbox, inbox_backlog, run_webhook_worker
+
+    if loop:
+        run_webhook_worker(batch_size=batch_size)
+    else:
+        click.echo(f"{drain_webhook_inbox(batch_size)} eventos processados")
+    click.echo(f"{inbox_backlog()} eventos pendentes")
+
+
+@stock_cli.command("expire-reservations")
+def expire_reservations_command():
+    """Libera as reservas de estoque vencidas."""
+    from .stock import expire_reservations
+
+    click.echo(f"{expire_reservations()} reservas expiradas")
+
+
+@stock_cli.command("allocate")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--order-id", "order_ids", type=int, multiple=True, help="Aloca só estes pedidos.")
+def allocate_command(batch_size, order_ids):
+    """Escolhe o(s) CD(s) dos pedidos em separação e reserva o saldo."""
+    from .allocation import allocate_all, allocate_orders
+
+    if order_ids:
+        result = allocate_orders(order_ids=order_ids, batch_size=len(order_ids))
+    else:
+        result = allocate_all(batch_size=batch_size)
+    click.echo(
+        f"{result.orders} pedidos: {result.allocated} alocados "
+        f"({result.split} divididos em mais de um CD), {result.unfilled} sem saldo"
+    )
+    for location, count in sorted(result.by_location.items()):
+        click.echo(f"  {location}: {count} pedidos")
+
+
+@stock_cli.command("propagate")
+@click.option("--loop", is_flag=True, help="Continua drenando o outbox.")
+@click.option("--window", default=5.0, show_default=True, help="Janela em segundos.")
+@click.option("--workers", default=8, show_default=True, help="Vendedores em paralelo.")
+def propagate_command(loop, window, workers):
+    """Envia os saldos alterados para o Bling dos vendedores."""
+    from .bling import stock_sync
+
+    if loop:
+        stock_sync.run_propagator(window=window, max_workers=workers)
+    else:
+        products = stock_sync.propagate_stock(max_workers=workers)
+        click.echo(f"{products} produtos enviados")
+    click.echo(stock_sync.outbox_metrics())
+
+
+@stock_cli.command("retry-failed")
+@click.option("--vendor-id", type=int, help="Só as falhas deste vendedor.")
+def retry_failed_command(vendor_id):
+    """Reenvia os saldos que esgotaram as tentativas (ex.: token revogado)."""
+    from .bling.stock_sync import retry_dead_failures
+
+    count = retry_dead_failures(vendor_id)
+    click.echo(f"{count} envios devolvidos à fila")
+
+
+@images_cli.command("process")
+@click.option("--product-id", type=int, help="Processa apenas este produto.")
+def process_images_command(product_id):
+    """Gera miniaturas/WebP das imagens que ainda não têm variantes."""
+    from .images import process_product_image
+    from .models import Product
+
+    if product_id:
+        ids = [product_id]
+    else:
+        ids = [
+            p.id
+            for p in Product.query.filter(
+                Product.image_key.is_not(None), Product.thumbnail_key.is_(None)
+            ).with_entities(Product.id)
+        ]
+    generated = sum(1 for pid in ids if process_product_image(pid))
+    click.echo(f"{len(ids)} produtos verificados, {generated} imagens novas geradas")
+
+
+@products_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=2000, show_default=True)
+def import_products_command(path, chunk_size):
+    """Importa/atualiza produtos por SKU a partir de um CSV."""
+    import time
+
+    from .admin.product_import import ImportFormatError, import_products_csv
+
+    started = time.perf_counter()
+    with open(path, "rb") as fh:
+        try:
+            report = import_products_csv(fh, chunk_size=chunk_size)
+        except ImportFormatError as exc:
+            raise click.ClickException(str(exc))
+    elapsed = time.perf_counter() - started
+
+    for line, message in report.errors:
+        click.echo(f"linha {line}: {message}", err=True)
+    click.echo(
+        f"{report.rows} linhas em {elapsed:.1f}s: {report.created} criados, "
+        f"{report.updated} atualizados, {report.failed} com erro"
+    )
+
+
+@orders_cli.command("export")
+@click.argument("kind", type=click.Choice(["orders", "settlements"]))
+@click.option("--format", "fmt", type=click.Choice(["csv", "xlsx"]), default="csv", show_default=True)
+@click.option("--gzip", is_flag=True, help="Compacta o CSV.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Padrão: nome com data/hora.")
+@click.option("--status")
+@click.option("--vendor-id", type=int)
+@click.option("--date-from", help="AAAA-MM-DD")
+@click.option("--date-to", help="AAAA-MM-DD")
+def export_orders_command(kind, fmt, gzip, output, status, vendor_id, date_from, date_to):
+    """Exporta pedidos (por item) ou acertos por vendedor em streaming."""
+    import time
+
+    from .admin.exports import export_filename, stream_export
+    from .admin.orders import OrderFilters
+    from .db_routing import read_replica
+
+    filters = OrderFilters.from_args(
+        {
+            "status": status,
+            "vendor_id": vendor_id,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
+    )
+    output = output or export_filename(kind, fmt, gzip=gzip)
+    started = time.perf_counter()
+    size = 0
+    with open(output, "wb") as fh, read_replica():
+        for chunk in stream_export(kind, fmt, filters, gzip=gzip):
+            fh.write(chunk)
+            size += len(chunk)
+    click.echo(f"{output}: {size / 1e6:.1f} MB em {time.perf_counter() - started:.1f}s")
+
+
+@orders_cli.command("ship")
+@click.argument("order_ids", nargs=-1, type=int, required=True)
+def ship_orders_command(order_ids):
+    """Marca pedidos em separação como enviados e dá baixa no estoque."""
+    from .stock import ship_orders
+
+    shipped = ship_orders(order_ids)
+    skipped = sorted(set(order_ids) - set(shipped))
+    click.echo(f"{len(shipped)} pedidos enviados")
+    if skipped:
+        click.echo(
+            "ignorados (fora de separação ou sem estoque reservado): "
+            + ", ".join(map(str, skipped))
+        )
+
+
+@rollups_cli.command("rebuild")
+@click.option("--since", help="Só a partir deste dia (AAAA-MM-DD).")
+def rebuild_rollups_command(since):
+    """Recalcula daily_vendor_sales/daily_product_sales a partir dos pedidos."""
+    import time
+    from datetime import date
+
+    from .rollups import rebuild_rollups
+
+    try:
+        since = date.fromisoformat(since) if since else None
+    except ValueError:
+        raise click.BadParameter("use AAAA-MM-DD", param_hint="--since")
+    started = time.perf_counter()
+    rebuild_rollups(since)
+    click.echo(f"rollups recalculados em {time.perf_counter() - started:.1f}s")
+
+
+@rollups_cli.command("refresh")
+def refresh_rollups_command():
+    """Recalcula os vendedores/dias pendentes em rollup_dirty."""
+    from .rollups import refresh_rollups
+
+    click.echo(f"{refresh_rollups()} entradas da fila processadas")
+
+
+@payments_cli.command("drain")
+@click.option("--batch-size", default=200, show_default=True)
+def drain_payments_command(batch_size):
+    """Processa as notificações de pagamento pendentes."""
+    from .payments.notifications import drain_payment_notifications, notification_backlog
+
+    click.echo(f"{drain_payment_notifications(batch_size)} notificações processadas")
+    click.echo(f"{notification_backlog()} pendentes")
+
+
+@payments_cli.command("compact")
+def compact_payments_command():
+    """Move raw_response inline para payment_payloads (compactado)."""
+    from .payments.compaction import compact_raw_responses
+
+    click.echo(f"{compact_raw_responses()} payloads movidos")
+
+
+@payments_cli.command("storage-stats")
+def payments_storage_stats_command():
+    """Tamanho dos payloads brutos: inline x compactados."""
+    from .payments.compaction import storage_stats
+
+    stats = storage_stats()
+    click.echo(f"inline: {stats['inline_rows']} linhas, {stats['inline_bytes'] / 1e6:.2f} MB")
+    click.echo(
+        f"compactado: {stats['compressed_rows']} linhas, "
+        f"{stats['compressed_bytes'] / 1e6:.2f} MB de {stats['original_bytes'] / 1e6:.2f} MB "
+        f"(razão {stats['ratio']}) {stats['encodings']}"
+    )
+
+
+DEFAULT_WORKER_QUEUES = ("default=2", "images=2", "sync=2")
+
+
+def _parse_queues(values):
+    queues = {}
+    for value in values:
+        name, _, threads = value.partition("=")
+        try:
+            queues[name.strip()] = int(threads or 1)
+        except ValueError:
+            raise click.BadParameter(f"use fila=threads, não '{value}'")
+    return queues
+
+
+@click.command("worker")
+@click.option(
+    "-q",
+    "--queue",
+    "queues",
+    multiple=True,
+    default=DEFAULT_WORKER_QUEUES,
+    show_default=True,
+    help="Fila e número de threads (fila=N); pode repetir.",
+)
+@click.option("--poll-interval", default=1.0, show_default=True)
+@with_appcontext
+def worker_command(queues, poll_interval):
+    """Processa a fila de jobs (imagens, Bling, estoque) até SIGTERM."""
+    from .jobs import Worker
+
+    worker = Worker(
+        current_app._get_current_object(),
+        _parse_queues(queues),
+        poll_interval=poll_interval,
+    )
+    click.echo(f"worker {worker.worker_id}: {worker.queues}")
+    worker.run()
+
+
+@click.command("seed")
+@click.option("--vendors", default=100, show_default=True)
+@click.option("--products", default=10_000, show_default=True)
+@click.option("--orders", default=100_000, show_default=True)
+@click.option("--seed", "random_seed", default=42, show_default=True)
+@click.option("--create-tables", is_flag=True, help="Roda db.create_all() antes.")
+@with_appcontext
+def seed_command(vendors, products, orders, random_seed, create_tables):
+    """Gera massa de dados sintética (vendedores, produtos, pedidos)."""
+    import time
+
+    from .extensions import db
+    from .seed import SEED_ADMIN_EMAIL, SEED_PASSWORD, seed_database
+
+    if create_tables:
+        from .search import ensure_search_index
+
+        db.create_all()
+        ensure_search_index()
+    started = time.perf_counter()
+    report = seed_database(
+        vendors=vendors,
+        products=products,
+        orders=orders,
+        seed=random_seed,
+        progress=lambda msg: click.echo(
+            f"[{time.perf_counter() - started:7.1f}s] {msg}"
+        ),
+    )
+    for table, rows in report.counts.items():
+        click.echo(f"{table}: {rows}")
+    click.echo(f"admin: {SEED_ADMIN_EMAIL} / {SEED_PASSWORD}")
+
+
+@search_cli.command("init")
+def search_init_command():
+    """Cria os índices de busca do banco em uso (idempotente)."""
+    import time
+
+    from .search import ensure_search_index
+
+    started = time.perf_counter()
+    ensure_search_index()
+    click.echo(f"índice de busca pronto em {time.perf_counter() - started:.1f}s")
+
+
+@search_cli.command("rebuild")
+def search_rebuild_command():
+    """Reindexa todos os produtos."""
+    import time
+
+    from .search import rebuild_search_index
+
+    started = time.perf_counter()
+    rebuild_search_index()
+    click.echo(f"índice de busca refeito em {time.perf_counter() - started:.1f}s")
+
+
+@freight_cli.command("quote")
+@click.argument("cep")
+@click.option("--sku", "skus", multiple=True, help="Padrão: todo o catálogo ativo.")
+def freight_quote_command(cep, skus):
+    """Cota o frete dos SKUs para um CEP com as tabelas locais."""
+    import time
+
+    import numpy as np
+
+    from .freight import RATES_PATH, RateTableError, quote_skus
+
+    started = time.perf_counter()
+    try:
+        quote = quote_skus(cep, list(skus) or None)
+    except (RateTableError, ValueError) as exc:
+        raise click.ClickException(str(exc))
+    elapsed = (time.perf_counter() - started) * 1000
+    if not quote.services:
+        click.echo(f"nenhum serviço atende o CEP {quote.postal_code} (tabelas em {RATES_PATH})")
+    for column, service in enumerate(quote.services):
+        prices = quote.prices[:, column]
+        quoted = prices[~np.isnan(prices)] if len(prices) else prices
+        click.echo(
+            f"{service['carrier']} {service['service']} ({service['days']} dias): "
+            f"{len(quoted)}/{len(quote.skus)} SKUs cotados"
+            + (f", R$ {quoted.min():.2f} a R$ {quoted.max():.2f}" if len(quoted) else "")
+        )
+    for sku in quote.missing:
+        click.echo(f"SKU desconhecido: {sku}", err=True)
+    click.echo(f"{len(quote.skus)} SKUs em {elapsed:.1f} ms")
+
+
+def register_commands(app):
+    app.cli.add_command(migrate_cli)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bling_cli)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(products_cli)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(freight_cli)
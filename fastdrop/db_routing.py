@@ -0,0 +1,262 @@
+"""Réplicas de leitura e pool de conexões.
+
+Com ``DATABASE_REPLICA_URLS`` (URLs separadas por vírgula), cada réplica
+vira um bind ``replica_N`` em ``SQLALCHEMY_BINDS`` e a ``RoutingSession``
+decide o engine de cada statement:
+
+- requisições ``GET``/``HEAD`` escolhem uma réplica ao começar; ``SELECT``
+  sem ``FOR UPDATE`` vai para ela;
+- flush, ``INSERT``/``UPDATE``/``DELETE``, ``FOR UPDATE`` e SQL textual
+  que não seja um ``SELECT`` simples vão para o primário e deixam a
+  sessão presa nele até o fim (lê o que acabou de escrever);
+- depois de uma requisição que escreveu, o cookie de sessão guarda um
+  prazo (``DB_REPLICA_STICKY_SECONDS``) em que as próximas requisições
+  do mesmo usuário também leem do primário, cobrindo o atraso da
+  replicação;
+- views ``GET`` que escrevem usam ``@use_primary``; relatórios fora de
+  requisição (CLI) usam ``with read_replica():``.
+
+Sem réplicas configuradas, tudo continua no primário.
+
+Pool: ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``, ``DB_POOL_TIMEOUT``,
+``DB_POOL_RECYCLE`` e ``DB_POOL_PRE_PING`` valem por processo, ou seja,
+por worker do gunicorn (sem ``--preload``): o total de conexões no banco é
+``workers x (pool_size + max_overflow)`` por engine. Com worker
+``gthread``, ``pool_size`` deve acompanhar ``--threads``. O
+``TimedQueuePool`` mede quanto cada checkout esperou por uma conexão
+(``/admin/db-pool``).
+"""
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import current_app, request, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import CompoundSelect, Select, TextClause, UpdateBase, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+REPLICA_PREFIX = "replica_"
+STICKY_SECONDS = float(os.environ.get("DB_REPLICA_STICKY_SECONDS", "5"))
+STICKY_KEY = "_db_primary_until"
+
+# chaves em ``Session.info``
+REPLICA = "replica_bind"
+WROTE = "wrote"
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(url, name):
+    """Opções de pool do engine ``name`` (vazias para SQLite em memória)."""
+    url = make_url(url)
+    if url.drivername.startswith("sqlite") and url.database in (None, "", ":memory:"):
+        return {}
+    prefix = "DB_REPLICA_" if name.startswith(REPLICA_PREFIX) else "DB_"
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": _env_int(f"{prefix}POOL_SIZE", _env_int("DB_POOL_SIZE", 5)),
+        "max_overflow": _env_int(f"{prefix}MAX_OVERFLOW", _env_int("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") in ("1", "true"),
+    }
+
+
+# ---------- Métricas do pool ----------
+
+
+class PoolMetrics:
+    """Espera no checkout de conexões, por engine."""
+
+    BUCKETS_MS = (0.1, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._stats = {}
+
+    def _row(self, name):
+        row = self._stats.get(name)
+        if row is None:
+            row = self._stats[name] = {
+                "checkouts": 0,
+                "timeouts": 0,
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+                "histogram": [0] * (len(self.BUCKETS_MS) + 1),
+            }
+        return row
+
+    def record(self, pool, wait_ms, timed_out=False):
+        name = pool.logging_name or "default"
+        with self._lock:
+            self._pools[name] = pool
+            row = self._row(name)
+            row["checkouts"] += 1
+            row["timeouts"] += timed_out
+            row["wait_ms_total"] += wait_ms
+            row["wait_ms_max"] = max(row["wait_ms_max"], wait_ms)
+            row["histogram"][bisect_left(self.BUCKETS_MS, wait_ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, row in self._stats.items():
+                pool = self._pools[name]
+                checkouts = row["checkouts"] or 1
+                result[name] = {
+                    "checkouts": row["checkouts"],
+                    "timeouts": row["timeouts"],
+                    "wait_ms_avg": round(row["wait_ms_total"] / checkouts, 3),
+                    "wait_ms_max": round(row["wait_ms_max"], 3),
+                    "wait_ms_histogram": {
+                        f"<={bound}": count
+                        for bound, count in zip(self.BUCKETS_MS, row["histogram"])
+                    }
+                    | {f">{self.BUCKETS_MS[-1]}": row["histogram"][-1]},
+                    "size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": pool.overflow(),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` que registra a espera de cada checkout em ``pool_metrics``."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            pool_metrics.record(self, (time.perf_counter() - started) * 1000, timed_out)
+
+
+# ---------- Roteamento ----------
+
+
+# SQL textual só é leitura se for um SELECT simples (CTE pode escrever)
+_TEXT_READ = re.compile(r"^\s*SELECT\b(?!.*\bFOR\s+(UPDATE|SHARE)\b)", re.I | re.S)
+
+
+def _writes(clause):
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not _TEXT_READ.match(clause.text)
+    return isinstance(clause, (Select, CompoundSelect)) and clause._for_update_arg is not None
+
+
+def _reads(clause):
+    if isinstance(clause, TextClause):
+        return bool(_TEXT_READ.match(clause.text))
+    return isinstance(clause, (Select, CompoundSelect)) and clause._for_update_arg is None
+
+
+class RoutingSession(FlaskSession):
+    """Sessão que manda leituras para ``info["replica_bind"]``, se houver."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or _writes(clause):
+                self.info[WROTE] = True
+            elif self.info.get(REPLICA) and not self.info.get(WROTE) and _reads(clause):
+                engine = self._db.engines.get(self.info[REPLICA])
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_keys(app=None):
+    return (app or current_app).config.get("DATABASE_REPLICAS", [])
+
+
+@contextmanager
+def read_replica():
+    """Leituras do bloco vão para uma réplica (relatórios fora de requisição)."""
+    from .extensions import db
+
+    keys = replica_keys()
+    info = db.session.info
+    previous = info.get(REPLICA)
+    if keys and not info.get(WROTE):
+        info[REPLICA] = random.choice(keys)
+    try:
+        yield
+    finally:
+        if previous is None:
+            info.pop(REPLICA, None)
+        else:
+            info[REPLICA] = previous
+
+
+def use_primary(view):
+    """Marca uma view ``GET`` que escreve: não usa réplica."""
+    view._use_primary = True
+    return view
+
+
+class DatabaseRouter:
+    """Configura binds/pool a partir do ambiente e roteia as requisições."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # precisa rodar antes de ``db.init_app``, que cria os engines
+        primary = app.config["SQLALCHEMY_DATABASE_URI"]
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(primary, "primary"))
+        urls = [
+            url.strip()
+            for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+            if url.strip()
+        ]
+        binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+        for n, url in enumerate(urls):
+            key = f"{REPLICA_PREFIX}{n}"
+            binds.setdefault(key, {"url": url, **engine_options(url, key)})
+        app.config["DATABASE_REPLICAS"] = [key for key in binds if key.startswith(REPLICA_PREFIX)]
+        if app.config["DATABASE_REPLICAS"]:
+            app.before_request(self._route_request)
+            app.after_request(self._remember_writes)
+
+    @staticmethod
+    def _route_request():
+        from .extensions import db
+
+        if request.method not in ("GET", "HEAD"):
+            return
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, "_use_primary", False):
+            return
+        if flask_session.get(STICKY_KEY, 0) > time.time():
+            return
+        db.session.info[REPLICA] = random.choice(replica_keys())
+
+    @staticmethod
+    def _remember_writes(response):
+        from .extensions import db
+
+        if db.session.info.get(WROTE):
+            flask_session[STICKY_KEY] = time.time() + STICKY_SECONDS
+        return response
@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 
-db = SQLAlchemy()
-migrate = Migrate()
+from .db_routing import DatabaseRouter, RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+db_router = DatabaseRouter()
 login_manager = LoginManager()
+
+from .profiling import SQLProfiler
+
+sql_profiler = SQLProfiler()
@@ -0,0 +1,364 @@
+"""Cotação de frete por CEP e faixa de peso, vetorizada com NumPy.
+
+As tabelas das transportadoras ficam em CSV local (``FREIGHT_RATES_PATH``:
+um arquivo ou uma pasta com vários), uma linha por serviço, faixa de CEP
+e faixa de peso::
+
+    carrier,service,cep_start,cep_end,weight_max,price,days,extra_kg_price,cubic_divisor
+    Correios,PAC,01000000,19999999,1,18.90,5,,6000
+
+``weight_max`` é o limite (kg, inclusivo) da faixa; acima da última faixa
+cobra ``extra_kg_price`` por kg adicional, ou o serviço não atende.
+O peso cobrado é o maior entre o peso real e o cúbico
+(``C x L x A / cubic_divisor``, padrão 6000).
+
+Peso e medidas do catálogo ativo ficam em arrays por processo, recarregados
+quando a versão do catálogo (``http_cache.catalog_version``) muda. O preço
+de todo o catálogo é calculado de uma vez por faixa de CEP ("zona") e
+memoizado: CEPs diferentes da mesma faixa reaproveitam o resultado, e a
+cotação de N SKUs vira indexação de array.
+"""
+import csv
+import glob
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+from sqlalchemy import Float, cast, select
+
+from .extensions import db
+from .geo import normalize_postal_code
+from .http_cache import FragmentCache, catalog_version
+from .models import Product
+
+RATES_PATH = os.environ.get("FREIGHT_RATES_PATH", "freight_rates")
+DEFAULT_CUBIC_DIVISOR = 6000
+ZONE_CACHE_SIZE = int(os.environ.get("FREIGHT_ZONE_CACHE", "16"))
+MAX_SKUS = 20_000
+REQUIRED_COLUMNS = {"carrier", "service", "cep_start", "cep_end", "weight_max", "price", "days"}
+
+
+class RateTableError(ValueError):
+    pass
+
+
+# ---------- Tabelas de frete ----------
+
+
+@dataclass
+class Band:
+    """Faixas de peso de um serviço numa faixa de CEP."""
+
+    weight_max: np.ndarray  # crescente
+    price: np.ndarray
+    days: int
+    extra_kg_price: float = 0.0
+
+    def prices(self, billable):
+        """Preço para cada peso cobrado (``nan`` = não atende)."""
+        idx = np.searchsorted(self.weight_max, billable, side="left")
+        inside = idx < len(self.weight_max)
+        price = np.full(billable.shape, np.nan)
+        price[inside] = self.price[idx[inside]]
+        if self.extra_kg_price:
+            over = ~inside & ~np.isnan(billable)
+            excess = np.ceil(billable[over] - self.weight_max[-1])
+            price[over] = self.price[-1] + self.extra_kg_price * excess
+        return price
+
+
+@dataclass
+class Service:
+    carrier: str
+    name: str
+    cubic_divisor: float
+    starts: np.ndarray  # início de cada faixa de CEP, crescente
+    ends: np.ndarray
+    bands: list  # um Band por faixa de CEP
+
+    def zone(self, cep):
+        """Índice da faixa de CEP que contém ``cep`` (-1 se não atende)."""
+        index = int(np.searchsorted(self.starts, cep, side="right")) - 1
+        return index if index >= 0 and cep <= self.ends[index] else -1
+
+
+@dataclass
+class RateTable:
+    services: list
+    version: tuple = ()
+
+    def zone(self, cep):
+        return tuple(service.zone(cep) for service in self.services)
+
+
+def _number(row, column, line, cast_to=float, default=None):
+    value = (row.get(column) or "").strip().replace(",", ".")
+    if not value:
+        if default is not None:
+            return default
+        raise RateTableError(f"linha {line}: coluna {column} vazia")
+    try:
+        return cast_to(value)
+    except ValueError:
+        raise RateTableError(f"linha {line}: {column} inválido ({value!r})")
+
+
+def parse_rate_rows(rows):
+    """Lista de ``Service`` a partir de dicts no formato do CSV."""
+    grouped = defaultdict(lambda: defaultdict(list))
+    divisors, extras = {}, {}
+    for line, row in enumerate(rows, start=2):
+        key = (row["carrier"].strip(), row["service"].strip())
+        # planilhas costumam perder o zero à esquerda do CEP
+        start = int(normalize_postal_code(row["cep_start"].strip().zfill(8)) or -1)
+        end = int(normalize_postal_code(row["cep_end"].strip().zfill(8)) or -1)
+        if start < 0 or end < start:
+            raise RateTableError(f"linha {line}: faixa de CEP inválida")
+        grouped[key][(start, end)].append(
+            (
+                _number(row, "weight_max", line),
+                _number(row, "price", line),
+                _number(row, "days", line, int),
+            )
+        )
+        extra = _number(row, "extra_kg_price", line, default=0.0)
+        extras[key, start, end] = max(extras.get((key, start, end), 0.0), extra)
+        divisor = _number(row, "cubic_divisor", line, default=0.0)
+        if divisor:
+            divisors[key] = divisor
+
+    services = []
+    for key in sorted(grouped):
+        ranges = sorted(grouped[key])
+        for (_, prev_end), (start, _) in zip(ranges, ranges[1:]):
+            if start <= prev_end:
+                raise RateTableError(f"{key[0]} {key[1]}: faixas de CEP sobrepostas em {start:08d}")
+        bands = []
+        for start, end in ranges:
+            weights = sorted(grouped[key][start, end])
+            bands.append(
+                Band(
+                    weight_max=np.array([w for w, _, _ in weights]),
+                    price=np.array([p for _, p, _ in weights]),
+                    days=max(d for _, _, d in weights),
+                    extra_kg_price=extras[key, start, end],
+                )
+            )
+        services.append(
+            Service(
+                carrier=key[0],
+                name=key[1],
+                cubic_divisor=divisors.get(key, DEFAULT_CUBIC_DIVISOR),
+                starts=np.array([s for s, _ in ranges], dtype=np.int64),
+                ends=np.array([e for _, e in ranges], dtype=np.int64),
+                bands=bands,
+            )
+        )
+    return services
+
+
+def _rate_files(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.csv")))
+    return [path] if os.path.exists(path) else []
+
+
+def load_rate_table(path=RATES_PATH):
+    files = _rate_files(path)
+    rows = []
+    for name in files:
+        with open(name, newline="", encoding="utf-8-sig") as fh:
+            reader = csv.DictReader(fh)
+            missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+            if missing:
+                raise RateTableError(f"{name}: colunas ausentes: {', '.join(sorted(missing))}")
+            rows.extend(reader)
+    version = tuple((name, os.stat(name).st_mtime_ns) for name in files)
+    return RateTable(services=parse_rate_rows(rows), version=version)
+
+
+_lock = threading.Lock()
+_table = None
+_catalog = None
+
+
+def rate_table():
+    """Tabela carregada; relida quando algum CSV muda."""
+    global _table
+    files = _rate_files(RATES_PATH)
+    version = tuple((name, os.stat(name).st_mtime_ns) for name in files)
+    if _table is None or _table.version != version:
+        with _lock:
+            if _table is None or _table.version != version:
+                _table = load_rate_table(RATES_PATH)
+    return _table
+
+
+# ---------- Catálogo em arrays ----------
+
+
+@dataclass
+class CatalogArrays:
+    token: str
+    skus: list
+    positions: dict  # sku -> posição nos arrays
+    weight: np.ndarray  # kg, nan sem peso
+    volume: np.ndarray  # cm³, 0 sem medidas
+
+
+def _load_catalog(token):
+    rows = db.session.execute(
+        select(
+            Product.sku,
+            cast(Product.weight, Float),
+            cast(Product.length, Float),
+            cast(Product.width, Float),
+            cast(Product.height, Float),
+        )
+        .where(Product.active.is_(True))
+        .order_by(Product.id)
+    ).all()
+    skus = [row[0] for row in rows]
+    numbers = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), 4)
+    volume = np.nan_to_num(numbers[:, 1] * numbers[:, 2] * numbers[:, 3], nan=0.0)
+    return CatalogArrays(
+        token=token,
+        skus=skus,
+        positions={sku: i for i, sku in enumerate(skus)},
+        weight=numbers[:, 0],
+        volume=volume,
+    )
+
+
+def catalog_arrays():
+    global _catalog
+    token = catalog_version().token
+    if _catalog is None or _catalog.token != token:
+        with _lock:
+            if _catalog is None or _catalog.token != token:
+                _catalog = _load_catalog(token)
+    return _catalog
+
+
+# ---------- Cotação ----------
+
+
+_zones = FragmentCache(ZONE_CACHE_SIZE)
+
+
+def billable_weight(weight, volume, cubic_divisor=DEFAULT_CUBIC_DIVISOR):
+    """Maior entre peso real e cúbico; ``nan`` se não há peso real."""
+    return np.maximum(weight, volume / cubic_divisor)
+
+
+def _zone_prices(table, catalog, zone):
+    """Preço de todo o catálogo para a zona (memoizado). ``[produtos, serviços]``."""
+    key = (table.version, catalog.token, zone)
+    prices = _zones.get(key)
+    if prices is None:
+        prices = np.full((len(catalog.skus), len(table.services)), np.nan, dtype=np.float32)
+        for column, (service, index) in enumerate(zip(table.services, zone)):
+            if index >= 0:
+                billable = billable_weight(catalog.weight, catalog.volume, service.cubic_divisor)
+                prices[:, column] = service.bands[index].prices(billable)
+        _zones.put(key, prices)
+    return prices
+
+
+@dataclass
+class Quote:
+    postal_code: str
+    services: list  # [{"carrier", "service", "days"}] que atendem o CEP
+    skus: list
+    prices: np.ndarray  # [len(skus), len(services)], nan = sem cotação
+    missing: list = field(default_factory=list)
+
+    def as_dict(self):
+        """JSON em colunas: uma lista de preços por serviço, na ordem de ``skus``.
+
+        Preços como string (igual ao catálogo), ``None`` sem cotação. Uma
+        lista por serviço serializa bem mais rápido que uma por SKU.
+        """
+        services = []
+        for column, service in enumerate(self.services):
+            prices = self.prices[:, column].astype(float).tolist()
+            services.append(
+                {**service, "prices": [None if p != p else f"{p:.2f}" for p in prices]}
+            )
+        return {
+            "cep": self.postal_code,
+            "skus": self.skus,
+            "services": services,
+            "missing": self.missing,
+        }
+
+
+def _served(table, zone):
+    columns = [i for i, index in enumerate(zone) if index >= 0]
+    services = [
+        {
+            "carrier": table.services[i].carrier,
+            "service": table.services[i].name,
+            "days": table.services[i].bands[zone[i]].days,
+        }
+        for i in columns
+    ]
+    return columns, services
+
+
+def quote_skus(postal_code, skus=None):
+    """Frete de cada SKU para o CEP (todo o catálogo ativo se ``skus`` é None)."""
+    cep = normalize_postal_code(postal_code)
+    if cep is None:
+        raise ValueError("CEP inválido.")
+    table, catalog = rate_table(), catalog_arrays()
+    zone = table.zone(int(cep))
+    columns, services = _served(table, zone)
+
+    if skus is None:
+        found, positions, missing = catalog.skus, slice(None), []
+    else:
+        skus = [str(sku) for sku in skus]
+        lookup = catalog.positions.get
+        positions = np.array([lookup(sku, -1) for sku in skus], dtype=np.intp)
+        known = positions >= 0
+        found, missing = skus, []
+        if not known.all():
+            found = [sku for sku, ok in zip(skus, known.tolist()) if ok]
+            missing = [sku for sku, ok in zip(skus, known.tolist()) if not ok]
+            positions = positions[known]
+
+    prices = _zone_prices(table, catalog, zone)[positions][:, columns]
+    return Quote(cep, services, found, prices, missing)
+
+
+def quote_cart(postal_code, items):
+    """Frete de ``{sku: quantidade}`` como uma remessa única.
+
+    Soma pesos reais e volumes dos itens antes de aplicar o cúbico de cada
+    serviço; item sem peso cadastrado deixa o carrinho sem cotação.
+    Devolve ``(serviços com "price", SKUs desconhecidos)``.
+    """
+    cep = normalize_postal_code(postal_code)
+    if cep is None:
+        raise ValueError("CEP inválido.")
+    table, catalog = rate_table(), catalog_arrays()
+    zone = table.zone(int(cep))
+    columns, services = _served(table, zone)
+
+    missing = [sku for sku in items if sku not in catalog.positions]
+    known = [(catalog.positions[sku], qty) for sku, qty in items.items() if sku in catalog.positions]
+    positions = np.array([p for p, _ in known], dtype=np.intp)
+    quantities = np.array([q for _, q in known], dtype=float)
+    weight = np.array([(catalog.weight[positions] * quantities).sum()])
+    volume = np.array([(catalog.volume[positions] * quantities).sum()])
+
+    for column, service in zip(columns, services):
+        rates = table.services[column]
+        price = rates.bands[zone[column]].prices(
+            billable_weight(weight, volume, rates.cubic_divisor)
+        )[0]
+        service["price"] = None if np.isnan(price) or not known else f"{price:.2f}"
+    return services, missing
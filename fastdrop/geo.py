@@ -0,0 +1,117 @@
+"""Localização aproximada por CEP, para comparar distâncias entre CDs.
+
+Não depende de serviço de geocodificação: a faixa de CEP dá a UF e a
+distância é calculada a partir da capital. É precisão de centenas de
+quilômetros, suficiente para escolher o CD mais próximo entre regiões.
+"""
+import bisect
+import math
+import re
+
+# (início, fim, UF) pelos 5 primeiros dígitos do CEP (faixas dos Correios)
+CEP_RANGES = [
+    (1000, 19999, "SP"),
+    (20000, 28999, "RJ"),
+    (29000, 29999, "ES"),
+    (30000, 39999, "MG"),
+    (40000, 48999, "BA"),
+    (49000, 49999, "SE"),
+    (50000, 56999, "PE"),
+    (57000, 57999, "AL"),
+    (58000, 58999, "PB"),
+    (59000, 59999, "RN"),
+    (60000, 63999, "CE"),
+    (64000, 64999, "PI"),
+    (65000, 65999, "MA"),
+    (66000, 68899, "PA"),
+    (68900, 68999, "AP"),
+    (69000, 69299, "AM"),
+    (69300, 69399, "RR"),
+    (69400, 69899, "AM"),
+    (69900, 69999, "AC"),
+    (70000, 72799, "DF"),
+    (72800, 72999, "GO"),
+    (73000, 73699, "DF"),
+    (73700, 76799, "GO"),
+    (76800, 76999, "RO"),
+    (77000, 77999, "TO"),
+    (78000, 78899, "MT"),
+    (79000, 79999, "MS"),
+    (80000, 87999, "PR"),
+    (88000, 89999, "SC"),
+    (90000, 99999, "RS"),
+]
+_RANGE_STARTS = [start for start, _, _ in CEP_RANGES]
+
+# coordenadas das capitais (lat, lon)
+STATE_CAPITALS = {
+    "AC": (-9.97, -67.81),
+    "AL": (-9.67, -35.74),
+    "AM": (-3.12, -60.02),
+    "AP": (0.03, -51.07),
+    "BA": (-12.97, -38.50),
+    "CE": (-3.73, -38.52),
+    "DF": (-15.79, -47.88),
+    "ES": (-20.32, -40.34),
+    "GO": (-16.69, -49.25),
+    "MA": (-2.53, -44.30),
+    "MG": (-19.92, -43.94),
+    "MS": (-20.47, -54.62),
+    "MT": (-15.60, -56.10),
+    "PA": (-1.46, -48.50),
+    "PB": (-7.12, -34.86),
+    "PE": (-8.05, -34.88),
+    "PI": (-5.09, -42.80),
+    "PR": (-25.43, -49.27),
+    "RJ": (-22.91, -43.17),
+    "RN": (-5.79, -35.21),
+    "RO": (-8.76, -63.90),
+    "RR": (2.82, -60.67),
+    "RS": (-30.03, -51.23),
+    "SC": (-27.60, -48.55),
+    "SE": (-10.91, -37.07),
+    "SP": (-23.55, -46.63),
+    "TO": (-10.18, -48.33),
+}
+
+_CEP_IN_TEXT = re.compile(r"(?<!\d)(\d{5})-?(\d{3})(?!\d)")
+
+
+def normalize_postal_code(value):
+    """CEP só com os 8 dígitos, ou ``None`` se não for um CEP."""
+    digits = re.sub(r"\D", "", str(value or ""))
+    return digits if len(digits) == 8 else None
+
+
+def find_postal_code(text):
+    """Último CEP que aparece num endereço em texto livre."""
+    matches = _CEP_IN_TEXT.findall(text or "")
+    return "".join(matches[-1]) if matches else None
+
+
+def postal_code_state(postal_code):
+    cep = normalize_postal_code(postal_code)
+    if cep is None:
+        return None
+    prefix = int(cep[:5])
+    index = bisect.bisect_right(_RANGE_STARTS, prefix) - 1
+    if index < 0:
+        return None
+    start, end, state = CEP_RANGES[index]
+    return state if start <= prefix <= end else None
+
+
+def postal_code_location(postal_code):
+    """``(lat, lon)`` aproximado do CEP, ou ``None``."""
+    return STATE_CAPITALS.get(postal_code_state(postal_code))
+
+
+def distance_km(a, b):
+    """Distância em linha reta (haversine) entre dois ``(lat, lon)``."""
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
@@ -0,0 +1,191 @@
+"""Respostas condicionais (ETag/Last-Modified) para catálogo e listagens.
+
+O conteúdo dessas páginas só muda quando algum produto muda. Toda escrita
+em ``Product`` incrementa o contador ``catalog`` de ``cache_versions`` na
+mesma transação (flush do ORM, ou ``bump_version`` nas escritas em lote).
+A rota lê só essa linha: se o ETag do cliente bate, responde ``304`` sem
+carregar produtos nem renderizar template.
+
+Páginas que dependem do saldo (filtro "com estoque") somam ao ETag o
+estado do ``stock_outbox``, que já ganha uma linha a cada alteração de
+saldo; assim reservas e baixas não disputam a linha do contador.
+
+Com ``HTTP_FRAGMENT_CACHE`` > 0 (padrão 256), o corpo renderizado também
+fica num LRU por processo, indexado pelo ETag: clientes sem cache recebem
+a página pronta enquanto a versão não muda.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import Response, current_app, make_response, request, session
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import CacheVersion, Product, StockOutbox
+from .sql import upsert_statement
+
+CATALOG = "catalog"
+FRAGMENT_CACHE_SIZE = int(os.environ.get("HTTP_FRAGMENT_CACHE", "256"))
+CACHE_CONTROL = "private, no-cache"
+
+_versions = CacheVersion.__table__
+
+
+# ---------- Versão ----------
+
+
+def bump_version(name=CATALOG, connection=None):
+    """Incrementa o contador ``name`` na transação corrente."""
+    now = datetime.utcnow()
+    stmt = upsert_statement(_versions)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": _versions.c.version + 1, "updated_at": now},
+    )
+    (connection or db.session).execute(stmt, {"name": name, "version": 1, "updated_at": now})
+
+
+def _bump_on_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Product):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        bump_version(CATALOG, session.connection())
+        return
+
+
+def register_http_cache_events():
+    if not event.contains(Session, "after_flush", _bump_on_flush):
+        event.listen(Session, "after_flush", _bump_on_flush)
+
+
+@dataclass
+class Version:
+    token: str
+    last_modified: datetime = None
+
+
+def catalog_version(stock=False):
+    """Versão atual do catálogo (com ``stock=True``, também do saldo)."""
+    columns = [
+        select(_versions.c.version).where(_versions.c.name == CATALOG).scalar_subquery(),
+        select(_versions.c.updated_at).where(_versions.c.name == CATALOG).scalar_subquery(),
+    ]
+    if stock:
+        columns += [
+            select(func.max(StockOutbox.id)).scalar_subquery(),
+            select(func.count(StockOutbox.id))
+            .where(StockOutbox.processed_at.is_(None))
+            .scalar_subquery(),
+        ]
+    version, updated_at, *stock_state = db.session.execute(select(*columns)).one()
+    token = ":".join(str(value) for value in (version or 0, *stock_state))
+    # Last-Modified só vale quando a página depende apenas do contador
+    last_modified = None
+    if updated_at is not None and not stock:
+        last_modified = updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+    return Version(token=token, last_modified=last_modified)
+
+
+# ---------- Cache dos corpos renderizados ----------
+
+
+class FragmentCache:
+    """LRU por processo de ``etag -> (corpo, content_type)``."""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+fragments = FragmentCache(FRAGMENT_CACHE_SIZE)
+
+
+# ---------- Resposta ----------
+
+
+@lru_cache(maxsize=64)
+def _template_digest(names):
+    # muda o ETag quando um deploy altera os templates da página
+    env = current_app.jinja_env
+    digest = hashlib.sha1()
+    for name in names:
+        source, _, _ = env.loader.get_source(env, name)
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _etag(version, templates):
+    key = f"{version.token}|{_template_digest(templates)}|{request.full_path}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _not_modified(etag, version):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(version.last_modified and since and since >= version.last_modified)
+
+
+def _with_validators(response, etag, version):
+    response.set_etag(etag)
+    if version.last_modified is not None:
+        response.last_modified = version.last_modified
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Cookie")
+    return response
+
+
+def cached_response(version, render, templates=()):
+    """Resposta de ``render()`` com ETag, ``304`` e o cache de corpos.
+
+    ``render`` só é chamado quando o cliente não tem a versão atual e o
+    corpo não está no ``FragmentCache``. ``templates`` são os templates
+    HTML da página (entram no ETag); vazio para respostas JSON.
+    """
+    if templates and session.get("_flashes"):
+        # o base.html mostraria as mensagens flash do usuário: não cacheia
+        return make_response(render())
+
+    etag = _etag(version, tuple(templates))
+    if _not_modified(etag, version):
+        return _with_validators(Response(status=304), etag, version)
+
+    cached = fragments.get(etag)
+    if cached is not None:
+        body, content_type = cached
+        return _with_validators(Response(body, content_type=content_type), etag, version)
+
+    response = make_response(render())
+    if response.status_code != 200:
+        return response
+    fragments.put(etag, (response.get_data(), response.content_type))
+    return _with_validators(response, etag, version)
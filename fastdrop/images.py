@@ -0,0 +1,90 @@
+"""Geração de miniaturas e variantes WebP das imagens de produto.
+
+Roda como job na fila ``images`` (``flask worker``): o admin salva o
+produto, a rota enfileira o processamento e volta na hora. As variantes ficam em
+chaves derivadas do sha256 do original, então a mesma imagem enviada
+para vários produtos só é processada uma vez.
+"""
+import hashlib
+import io
+import logging
+
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Product
+from .storage import get_bucket, get_s3_client
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (300, 300)
+WEBP_MAX_SIZE = (1200, 1200)
+WEBP_QUALITY = 80
+VARIANTS_FOLDER = "variants"
+
+
+def _render_webp(original, max_size, quality):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(original)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        image.thumbnail(max_size)
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=quality, method=4)
+        return out.getvalue()
+
+
+def _put_webp(key, data):
+    get_s3_client().put_object(
+        Bucket=get_bucket(),
+        Key=key,
+        Body=data,
+        ContentType="image/webp",
+        CacheControl="public, max-age=31536000, immutable",
+    )
+
+
+def process_product_image(product_id):
+    """Gera (ou reaproveita) miniatura e WebP da imagem atual do produto."""
+    product = db.session.get(Product, product_id)
+    if product is None or not product.image_key:
+        return False
+
+    original = (
+        get_s3_client()
+        .get_object(Bucket=get_bucket(), Key=product.image_key)["Body"]
+        .read()
+    )
+    content_hash = hashlib.sha256(original).hexdigest()
+    if content_hash == product.image_hash and product.thumbnail_key:
+        return False
+
+    done = db.session.execute(
+        select(Product.thumbnail_key, Product.webp_key).where(
+            Product.image_hash == content_hash,
+            Product.thumbnail_key.is_not(None),
+            Product.webp_key.is_not(None),
+        )
+    ).first()
+    if done is not None:
+        thumbnail_key, webp_key = done
+    else:
+        thumbnail_key = f"{VARIANTS_FOLDER}/{content_hash}/thumb.webp"
+        webp_key = f"{VARIANTS_FOLDER}/{content_hash}/full.webp"
+        _put_webp(thumbnail_key, _render_webp(original, THUMBNAIL_SIZE, WEBP_QUALITY))
+        _put_webp(webp_key, _render_webp(original, WEBP_MAX_SIZE, WEBP_QUALITY))
+
+    product.image_hash = content_hash
+    product.thumbnail_key = thumbnail_key
+    product.webp_key = webp_key
+    db.session.commit()
+    return done is None
+
+
+def schedule_image_processing(product_id):
+    """Enfileira o processamento (a rota faz o commit junto com o produto)."""
+    from .jobs import enqueue
+
+    return enqueue("images.process", product_id)
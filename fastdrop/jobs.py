@@ -0,0 +1,307 @@
+"""Fila de jobs no próprio banco, sem Redis/Celery.
+
+- ``@job("nome", queue=..., max_attempts=..., every=...)`` registra a função;
+- ``enqueue("nome", *args, delay=..., **kwargs)`` adiciona o job na sessão
+  atual (vai junto com o commit de quem chamou);
+- ``flask worker`` roda as filas, cada uma com seu número de threads.
+
+Os workers disputam os jobs com ``SELECT ... FOR UPDATE SKIP LOCKED`` no
+Postgres; no SQLite a reserva é um ``UPDATE`` condicional no status. Jobs
+que falham voltam para a fila com backoff exponencial; jobs com
+``every`` são reagendados ao terminar.
+
+Enquanto um job roda, uma thread renova ``locked_at`` a cada
+``HEARTBEAT_INTERVAL``; só volta para a fila o job cujo worker parou de
+dar sinal por ``STALE_AFTER`` (worker morto), nunca um job longo que
+ainda está rodando.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from .extensions import db
+from .models import Job
+from .sql import upsert_statement
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+BACKOFF_BASE = 5  # segundos
+BACKOFF_MAX = 3600
+HEARTBEAT_INTERVAL = 30  # segundos
+# jobs "running" sem heartbeat há mais tempo que isso são considerados órfãos
+STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL * 6)
+
+
+@dataclass
+class JobSpec:
+    func: object
+    name: str
+    queue: str
+    max_attempts: int
+    every: int = None
+
+
+registry = {}
+
+
+def job(name, queue="default", max_attempts=5, every=None):
+    """Registra uma função como job. ``every`` (segundos) a torna recorrente."""
+
+    def decorator(func):
+        registry[name] = JobSpec(func, name, queue, max_attempts, every)
+        return func
+
+    return decorator
+
+
+def enqueue(name, *args, delay=None, run_at=None, queue=None, **kwargs):
+    """Adiciona um job à sessão atual. Quem chama faz o commit."""
+    spec = registry.get(name)
+    if run_at is None:
+        run_at = datetime.utcnow() + (
+            timedelta(seconds=delay) if delay else timedelta()
+        )
+    job_row = Job(
+        name=name,
+        queue=queue or (spec.queue if spec else "default"),
+        args=json.dumps({"args": list(args), "kwargs": kwargs}),
+        max_attempts=spec.max_attempts if spec else 5,
+        run_at=run_at,
+        status="queued",
+        attempts=0,
+    )
+    db.session.add(job_row)
+    return job_row
+
+
+def ensure_recurring_jobs():
+    """Garante uma linha por job recorrente (idempotente entre workers)."""
+    rows = [
+        {
+            "name": spec.name,
+            "queue": spec.queue,
+            "args": json.dumps({"args": [], "kwargs": {}}),
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": spec.max_attempts,
+            "run_at": datetime.utcnow(),
+            "interval_seconds": spec.every,
+            "unique_key": f"recurring:{spec.name}",
+        }
+        for spec in registry.values()
+        if spec.every
+    ]
+    if rows:
+        stmt = upsert_statement(Job.__table__).on_conflict_do_nothing(
+            index_elements=["unique_key"]
+        )
+        db.session.execute(stmt, rows)
+    db.session.commit()
+
+
+def claim_job(queue, worker_id):
+    """Reserva o próximo job vencido da fila. Retorna o ``Job`` ou None."""
+    now = datetime.utcnow()
+    candidate = (
+        select(Job.id)
+        .where(Job.queue == queue, Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+    )
+    if db.session.get_bind().dialect.name == "postgresql":
+        candidate = candidate.with_for_update(skip_locked=True)
+
+    job_id = db.session.scalar(candidate)
+    if job_id is None:
+        db.session.commit()
+        return None
+    # no SQLite (sem SKIP LOCKED) outro worker pode ter levado o mesmo id:
+    # só fica com o job quem conseguir trocar o status
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(
+            status="running",
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=Job.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return None
+    return db.session.get(Job, job_id)
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _heartbeat(app, job_id, worker_id, stop_event):
+    """Renova ``locked_at`` do job até ``stop_event`` (sessão própria)."""
+    while not stop_event.wait(HEARTBEAT_INTERVAL):
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(Job)
+                    .where(
+                        Job.id == job_id,
+                        Job.status == "running",
+                        Job.locked_by == worker_id,
+                    )
+                    .values(locked_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.warning("Heartbeat do job %s falhou", job_id, exc_info=True)
+
+
+def run_job(job_row):
+    """Executa um job já reservado e grava o resultado."""
+    stop_event = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat,
+        args=(current_app._get_current_object(), job_row.id, job_row.locked_by, stop_event),
+        name=f"heartbeat-{job_row.id}",
+        daemon=True,
+    )
+    beat.start()
+    try:
+        return _run_job(job_row)
+    finally:
+        stop_event.set()
+        beat.join()
+
+
+def _run_job(job_row):
+    spec = registry.get(job_row.name)
+    try:
+        if spec is None:
+            raise LookupError(f"Job não registrado: {job_row.name}")
+        payload = json.loads(job_row.args or "{}")
+        spec.func(*payload.get("args", []), **payload.get("kwargs", {}))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        job_row = db.session.get(Job, job_row.id)
+        job_row.last_error = traceback.format_exc()[-4000:]
+        job_row.locked_by = None
+        if job_row.interval_seconds:
+            job_row.status = "queued"
+            job_row.attempts = 0
+            job_row.run_at = datetime.utcnow() + timedelta(
+                seconds=job_row.interval_seconds
+            )
+        elif job_row.attempts < job_row.max_attempts:
+            job_row.status = "queued"
+            job_row.run_at = datetime.utcnow() + _backoff(job_row.attempts)
+        else:
+            job_row.status = "failed"
+            job_row.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.exception("Job %s (%s) falhou", job_row.id, job_row.name)
+        return False
+
+    job_row = db.session.get(Job, job_row.id)
+    job_row.locked_by = None
+    job_row.last_error = None
+    if job_row.interval_seconds:
+        job_row.status = "queued"
+        job_row.attempts = 0
+        job_row.run_at = datetime.utcnow() + timedelta(
+            seconds=job_row.interval_seconds
+        )
+    else:
+        job_row.status = "done"
+        job_row.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def requeue_stale_jobs():
+    """Devolve à fila jobs "running" cujo worker parou de mandar heartbeat."""
+    count = db.session.execute(
+        update(Job)
+        .where(
+            Job.status == "running", Job.locked_at < datetime.utcnow() - STALE_AFTER
+        )
+        .values(status="queued", locked_by=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+class Worker:
+    """Roda as filas indicadas, ``{fila: threads}``, até receber SIGTERM/SIGINT.
+
+    No desligamento as threads terminam o job em andamento e param de
+    buscar novos.
+    """
+
+    def __init__(self, app, queues, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.threads = []
+
+    def _loop(self, queue, slot):
+        worker_id = f"{self.worker_id}:{queue}:{slot}"
+        while not self.stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    job_row = claim_job(queue, worker_id)
+                    if job_row is not None:
+                        run_job(job_row)
+                        continue
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Erro no worker %s", worker_id)
+            self.stop_event.wait(self.poll_interval)
+
+    def stop(self, *_):
+        logger.info("Encerrando worker %s...", self.worker_id)
+        self.stop_event.set()
+
+    def run(self, install_signal_handlers=True):
+        if install_signal_handlers:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        with self.app.app_context():
+            ensure_recurring_jobs()
+            requeue_stale_jobs()
+
+        for queue, concurrency in self.queues.items():
+            for slot in range(concurrency):
+                thread = threading.Thread(
+                    target=self._loop,
+                    args=(queue, slot),
+                    name=f"worker-{queue}-{slot}",
+                    daemon=True,
+                )
+                thread.start()
+                self.threads.append(thread)
+
+        while not self.stop_event.wait(60):
+            with self.app.app_context():
+                requeue_stale_jobs()
+        for thread in self.threads:
+            thread.join()
@@ -2,6 +2,8 @@ from datetime import datetime
 from flask_login import UserMixin
 from .extensions import db
 
+DEFAULT_LOCATION = "CD-DEFAULT"
+
 class User(UserMixin, db.Model):
     __tablename__ = "users"
 
@@ -50,33 +52,146 @@ class Product(db.Model):
     width = db.Column(db.Numeric(10, 2))   # cm
     height = db.Column(db.Numeric(10, 2))
     length = db.Column(db.Numeric(10, 2))
+    image_key = db.Column(db.String(255))  # chave da imagem no S3
+    image_hash = db.Column(db.String(64), index=True)  # sha256 do original processado
+    thumbnail_key = db.Column(db.String(255))
+    webp_key = db.Column(db.String(255))
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    stock = db.relationship("ProductStock", back_populates="product", uselist=False)
+    stocks = db.relationship("ProductStock", back_populates="product")
     order_items = db.relationship("OrderItem", back_populates="product")
 
+    @property
+    def stock(self):
+        # saldo do CD padrão (formulário do admin e importação)
+        for stock in self.stocks:
+            if (stock.location or DEFAULT_LOCATION) == DEFAULT_LOCATION:
+                return stock
+        return None
+
+    @stock.setter
+    def stock(self, stock):
+        current = self.stock
+        if current is not None and current is not stock:
+            self.stocks.remove(current)
+        stock.location = stock.location or DEFAULT_LOCATION
+        if stock not in self.stocks:
+            self.stocks.append(stock)
+
+    @property
+    def image_url(self):
+        from .storage import public_url
+
+        return public_url(self.image_key)
+
+    @property
+    def thumbnail_url(self):
+        from .storage import public_url
+
+        return public_url(self.thumbnail_key)
+
+    @property
+    def webp_url(self):
+        from .storage import public_url
+
+        return public_url(self.webp_key)
+
     def __repr__(self):
         return f"<Product {self.sku}>"
 
 class ProductStock(db.Model):
     __tablename__ = "product_stock"
+    __table_args__ = (
+        db.UniqueConstraint("product_id", "location", name="uq_product_stock_location"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
-    location = db.Column(db.String(50), default="CD-DEFAULT")
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
+    location = db.Column(db.String(50), default=DEFAULT_LOCATION)  # Warehouse.code
     estoque_total = db.Column(db.Integer, default=0)
     estoque_reservado = db.Column(db.Integer, default=0)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    product = db.relationship("Product", back_populates="stock")
+    product = db.relationship("Product", back_populates="stocks")
 
     @property
     def estoque_disponivel(self):
         return max(0, (self.estoque_total or 0) - (self.estoque_reservado or 0))
 
+class Warehouse(db.Model):
+    # centro de distribuição; ``code`` é o ``location`` de ProductStock
+    __tablename__ = "warehouses"
+
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(50), unique=True, nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    postal_code = db.Column(db.String(9))
+    latitude = db.Column(db.Float)  # sem coordenadas, usa o CEP
+    longitude = db.Column(db.Float)
+    priority = db.Column(db.Integer, default=0)  # menor ganha no empate de distância
+    active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StockOutbox(db.Model):
+    # produtos cujo saldo mudou e ainda não foi enviado aos Blings
+    __tablename__ = "stock_outbox"
+    __table_args__ = (
+        db.Index("ix_stock_outbox_pending", "processed_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    attempts = db.Column(db.Integer, default=0)  # quantas vezes o lote foi pego
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)  # pego por um propagador (envio em andamento)
+    processed_at = db.Column(db.DateTime)
+
+class StockSyncFailure(db.Model):
+    # saldo que não chegou ao Bling de um vendedor: volta com backoff e,
+    # esgotadas as tentativas, fica parado (dead_at) até ser reenviado à mão
+    __tablename__ = "stock_sync_failures"
+    __table_args__ = (
+        db.UniqueConstraint("vendor_id", "product_id", name="uq_stock_sync_failures_vendor_product"),
+        db.Index("ix_stock_sync_failures_due", "dead_at", "retry_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer, db.ForeignKey("vendors.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    retry_at = db.Column(db.DateTime, nullable=False)
+    dead_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StockReservation(db.Model):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        db.Index("ix_stock_reservations_status_expires", "status", "expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True)
+    product_stock_id = db.Column(db.Integer, db.ForeignKey("product_stock.id"), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default="active")  # active, released, consumed, expired
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Order(db.Model):
     __tablename__ = "orders"
+    __table_args__ = (
+        db.UniqueConstraint("vendor_id", "external_order_id", name="uq_orders_vendor_external"),
+        # listagem do admin: keyset em (created_at, id) com e sem filtro
+        db.Index("ix_orders_created", "created_at", "id"),
+        db.Index("ix_orders_status_created", "status", "created_at", "id"),
+        db.Index("ix_orders_vendor_created", "vendor_id", "created_at", "id"),
+        db.Index("ix_orders_external_number", "external_number"),
+        # fila da alocação de CD: pedidos pagos ainda sem reserva
+        db.Index("ix_orders_allocation", "status", "allocated_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey("vendors.id"), nullable=False)
@@ -88,10 +203,12 @@ class Order(db.Model):
     customer_phone = db.Column(db.String(50))
     customer_email = db.Column(db.String(120))
     shipping_address = db.Column(db.Text)
+    shipping_postal_code = db.Column(db.String(9))
     status = db.Column(db.String(30), default="pendente")  # pendente, em_separacao, enviado, entregue, cancelado
     total_cost = db.Column(db.Numeric(10, 2), default=0)
     total_vendor_price = db.Column(db.Numeric(10, 2), default=0)
     tracking_code = db.Column(db.String(120))
+    allocated_at = db.Column(db.DateTime)  # reservado em CD(s) pela alocação
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -106,7 +223,7 @@ class OrderItem(db.Model):
     __tablename__ = "order_items"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     sku = db.Column(db.String(100))
     quantity = db.Column(db.Integer, nullable=False)
@@ -118,6 +235,62 @@ class OrderItem(db.Model):
     order = db.relationship("Order", back_populates="items")
     product = db.relationship("Product", back_populates="order_items")
 
+class DailyVendorSales(db.Model):
+    """Pedidos por vendedor, dia (UTC) e status, mantidos por ``fastdrop.rollups``."""
+
+    __tablename__ = "daily_vendor_sales"
+    __table_args__ = (
+        db.UniqueConstraint("vendor_id", "day", "status", name="uq_daily_vendor_sales"),
+        db.Index("ix_daily_vendor_sales_day", "day"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer, db.ForeignKey("vendors.id"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)  # soma das quantidades
+    cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    vendor_revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class DailyProductSales(db.Model):
+    """Vendas por produto, vendedor e dia (UTC), sem pedidos cancelados."""
+
+    __tablename__ = "daily_product_sales"
+    __table_args__ = (
+        db.UniqueConstraint("vendor_id", "day", "product_id", name="uq_daily_product_sales"),
+        db.Index("ix_daily_product_sales_product_day", "product_id", "day"),
+        db.Index("ix_daily_product_sales_day", "day"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer, db.ForeignKey("vendors.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    vendor_revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class RollupDirty(db.Model):
+    """Fila de (vendedor, dia) cujos rollups precisam ser recalculados."""
+
+    __tablename__ = "rollup_dirty"
+
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CacheVersion(db.Model):
+    """Contadores de versão usados nos ETags (ver ``fastdrop.http_cache``)."""
+
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class BlingAccount(db.Model):
     __tablename__ = "bling_accounts"
 
@@ -126,13 +299,37 @@ class BlingAccount(db.Model):
     access_token = db.Column(db.String(500), nullable=False)
     refresh_token = db.Column(db.String(500), nullable=False)
     token_expires_at = db.Column(db.DateTime, nullable=False)
+    orders_synced_at = db.Column(db.DateTime)  # high-water mark da importação de pedidos
+    company_id = db.Column(db.String(100), index=True)  # companyId enviado nos webhooks
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     vendor = db.relationship("Vendor", back_populates="bling_account")
 
+class BlingWebhookEvent(db.Model):
+    # inbox durável: o webhook só grava aqui, um worker processa depois
+    __tablename__ = "bling_webhook_events"
+    __table_args__ = (
+        db.Index("ix_bling_webhook_events_pending", "processed_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(100), unique=True, nullable=False)
+    company_id = db.Column(db.String(100))
+    event = db.Column(db.String(100))  # ex.: order.created
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)  # pego por um drain em andamento
+    processed_at = db.Column(db.DateTime)
+
 class Payment(db.Model):
     __tablename__ = "payments"
+    __table_args__ = (
+        db.UniqueConstraint("provider", "external_payment_id", name="uq_payments_provider_external"),
+        db.Index("ix_payments_order_id", "order_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
@@ -140,8 +337,73 @@ class Payment(db.Model):
     external_payment_id = db.Column(db.String(100))
     status = db.Column(db.String(50))  # created, pending, approved, rejected, refunded
     amount = db.Column(db.Numeric(10, 2))
-    raw_response = db.Column(db.Text)
+    raw_response = db.Column(db.Text)  # legado: payloads novos vão para payment_payloads
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     order = db.relationship("Order", back_populates="payments")
+    payload = db.relationship("PaymentPayload", uselist=False, lazy="select")
+
+    @property
+    def raw(self):
+        """Resposta bruta do provedor (descompactada só quando lida)."""
+        if self.payload is not None:
+            return self.payload.text
+        return self.raw_response
+
+class PaymentPayload(db.Model):
+    """Resposta bruta do provedor, compactada, fora da tabela ``payments``."""
+
+    __tablename__ = "payment_payloads"
+
+    payment_id = db.Column(db.Integer, db.ForeignKey("payments.id"), primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False)  # zstd, zlib
+    size = db.Column(db.Integer, nullable=False)  # bytes antes de compactar
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        from .payments.payloads import decompress
+
+        return decompress(self.data, self.encoding).decode("utf-8")
+
+class PaymentNotification(db.Model):
+    """Inbox de notificações do Mercado Pago: uma linha pendente por pagamento."""
+
+    __tablename__ = "payment_notifications"
+    __table_args__ = (
+        db.Index("ix_payment_notifications_pending", "processed_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    external_payment_id = db.Column(db.String(100), unique=True, nullable=False)
+    notifications = db.Column(db.Integer, default=1)  # quantas chegaram desde o último processamento
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_claim", "queue", "status", "run_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    queue = db.Column(db.String(50), nullable=False, default="default")
+    args = db.Column(db.Text, default="[]")  # JSON: {"args": [...], "kwargs": {...}}
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    interval_seconds = db.Column(db.Integer)  # jobs recorrentes
+    unique_key = db.Column(db.String(150), unique=True)
+    last_error = db.Column(db.Text)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} ({self.status})>"
@@ -0,0 +1,79 @@
+"""Migração dos payloads inline para ``payment_payloads`` e estatísticas."""
+import json
+
+from sqlalchemy import func, select, update
+
+from ..extensions import db
+from ..models import Payment, PaymentPayload
+from ..sql import upsert_statement
+from .payloads import compact_json, compress
+
+BATCH_SIZE = 1000
+
+
+def compact_raw_responses(batch_size=BATCH_SIZE):
+    """Move ``payments.raw_response`` para ``payment_payloads``. Retorna quantos moveu."""
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            select(Payment.id, Payment.raw_response)
+            .where(Payment.raw_response.is_not(None))
+            .order_by(Payment.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return moved
+        payload_rows = []
+        for payment_id, raw in rows:
+            try:
+                text = compact_json(json.loads(raw))
+            except ValueError:
+                text = raw  # não é JSON: guarda como veio
+            encoding, data, size = compress(text)
+            payload_rows.append(
+                {"payment_id": payment_id, "encoding": encoding, "size": size, "data": data}
+            )
+        stmt = upsert_statement(PaymentPayload.__table__).on_conflict_do_nothing(
+            index_elements=["payment_id"]
+        )
+        db.session.execute(stmt, payload_rows)
+        db.session.execute(
+            update(Payment)
+            .where(Payment.id.in_([row.id for row in rows]))
+            .values(raw_response=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        moved += len(rows)
+
+
+def storage_stats():
+    """Bytes guardados inline, no side table e o original antes de compactar."""
+    inline = db.session.execute(
+        select(
+            func.count(Payment.raw_response),
+            func.coalesce(func.sum(func.length(Payment.raw_response)), 0),
+        )
+    ).one()
+    side = db.session.execute(
+        select(
+            func.count(PaymentPayload.payment_id),
+            func.coalesce(func.sum(func.length(PaymentPayload.data)), 0),
+            func.coalesce(func.sum(PaymentPayload.size), 0),
+        )
+    ).one()
+    by_encoding = dict(
+        db.session.execute(
+            select(PaymentPayload.encoding, func.count()).group_by(PaymentPayload.encoding)
+        ).all()
+    )
+    original = side[2]
+    return {
+        "inline_rows": inline[0],
+        "inline_bytes": inline[1],
+        "compressed_rows": side[0],
+        "compressed_bytes": side[1],
+        "original_bytes": original,
+        "ratio": round(side[1] / original, 3) if original else None,
+        "encodings": by_encoding,
+    }
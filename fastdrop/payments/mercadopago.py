@@ -0,0 +1,89 @@
+"""Cliente da API do Mercado Pago e verificação das notificações.
+
+A URL base vem de ``MERCADOPAGO_API_URL`` (aponte para um servidor falso
+local nos testes) e o token de ``MERCADOPAGO_ACCESS_TOKEN``. A sessão HTTP
+é única por processo, criada (e o ``requests`` importado) no primeiro uso,
+com keep-alive e retries nos erros transitórios.
+"""
+import hashlib
+import hmac
+import os
+import threading
+
+MERCADOPAGO_API_URL = os.environ.get("MERCADOPAGO_API_URL", "https://api.mercadopago.com")
+REQUEST_TIMEOUT = 15
+SIGNATURE_HEADER = "X-Signature"
+REQUEST_ID_HEADER = "X-Request-Id"
+
+
+class MercadoPagoError(Exception):
+    pass
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"GET"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def fetch_payment(payment_id):
+    """Detalhe de ``/v1/payments/{id}`` (fonte da verdade do status)."""
+    token = os.environ.get("MERCADOPAGO_ACCESS_TOKEN")
+    if not token:
+        raise MercadoPagoError("MERCADOPAGO_ACCESS_TOKEN não configurado.")
+    resp = get_session().get(
+        f"{MERCADOPAGO_API_URL}/v1/payments/{payment_id}",
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if resp.status_code >= 400:
+        raise MercadoPagoError(
+            f"Mercado Pago respondeu {resp.status_code} para o pagamento {payment_id}"
+        )
+    return resp.json()
+
+
+def verify_signature(data_id, request_id, header_value):
+    """Confere o ``x-signature`` (``ts=...,v1=...``) com o segredo do webhook.
+
+    O manifesto assinado é ``id:<data.id>;request-id:<x-request-id>;ts:<ts>;``.
+    Sem ``MERCADOPAGO_WEBHOOK_SECRET`` configurado, recusa tudo.
+    """
+    secret = os.environ.get("MERCADOPAGO_WEBHOOK_SECRET")
+    if not secret or not header_value:
+        return False
+    parts = dict(
+        part.strip().split("=", 1) for part in header_value.split(",") if "=" in part
+    )
+    ts, received = parts.get("ts"), parts.get("v1")
+    if not ts or not received:
+        return False
+    manifest = f"id:{str(data_id).lower()};"
+    if request_id:
+        manifest += f"request-id:{request_id};"
+    manifest += f"ts:{ts};"
+    expected = hmac.new(secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, received)
@@ -0,0 +1,261 @@
+"""Notificações de pagamento do Mercado Pago: inbox, lote e transições.
+
+A rota ``/payments/webhook`` só valida a assinatura e faz upsert em
+``payment_notifications`` pelo ``external_payment_id``: rajadas e reenvios
+do mesmo pagamento viram uma única linha pendente. O
+``drain_payment_notifications`` (job ``payments.drain``) pega um lote,
+consulta cada pagamento uma vez na API, grava ``Payment`` em lote, guarda
+a resposta bruta compactada em ``payment_payloads`` e aplica as
+transições de status dos pedidos com ``UPDATE`` condicionais agrupados
+por status de destino.
+"""
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select, update
+
+from ..extensions import db
+from ..models import Order, Payment, PaymentNotification, PaymentPayload
+from ..rollups import mark_orders_dirty
+from ..sql import upsert_statement
+from ..stock import release_orders
+from .mercadopago import fetch_payment
+from .payloads import compact_json, compress
+
+logger = logging.getLogger(__name__)
+
+PROVIDER = "mercadopago"
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+FETCH_WORKERS = int(os.environ.get("MERCADOPAGO_FETCH_WORKERS", "8"))
+
+# status do Mercado Pago -> (status do pedido, status de origem permitidos).
+# ``rejected``/``cancelled`` não mexem no pedido: o comprador pode tentar
+# de novo com outro pagamento na mesma ``external_reference``.
+ORDER_TRANSITIONS = {
+    "approved": ("em_separacao", ("pendente",)),
+    "refunded": ("cancelado", ("pendente", "em_separacao")),
+    "charged_back": ("cancelado", ("pendente", "em_separacao")),
+}
+# vários pagamentos do mesmo pedido no lote: vale o de maior prioridade
+STATUS_PRIORITY = {"approved": 3, "charged_back": 2, "refunded": 1}
+REVERSED = ("refunded", "charged_back")
+
+
+def store_notification(payment_id):
+    """Enfileira o pagamento; se já houver linha, volta a ficar pendente."""
+    now = datetime.utcnow()
+    stmt = upsert_statement(PaymentNotification.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["external_payment_id"],
+        set_={
+            "notifications": PaymentNotification.__table__.c.notifications + 1,
+            "attempts": 0,
+            "error": None,
+            "received_at": now,
+            "processed_at": None,
+        },
+    )
+    db.session.execute(
+        stmt,
+        {
+            "external_payment_id": str(payment_id),
+            "notifications": 1,
+            "attempts": 0,
+            "received_at": now,
+        },
+    )
+    db.session.commit()
+
+
+def _fetch_all(payment_ids):
+    """Busca os pagamentos em paralelo. Devolve ``({id: payload}, {id: erro})``."""
+    payloads, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+        futures = {pid: pool.submit(fetch_payment, pid) for pid in payment_ids}
+        for pid, future in futures.items():
+            try:
+                payloads[pid] = future.result()
+            except Exception as exc:
+                failures[pid] = str(exc)[:500]
+    return payloads, failures
+
+
+def _order_id(payload):
+    try:
+        return int(payload.get("external_reference"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _save_payments(payloads, now):
+    """Upsert de ``payments`` e ``payment_payloads``; devolve ``{order_id: status}``."""
+    payment_rows, order_status = [], {}
+    for pid, payload in payloads.items():
+        order_id = _order_id(payload)
+        payment_rows.append(
+            {
+                "order_id": order_id,
+                "provider": PROVIDER,
+                "external_payment_id": pid,
+                "status": payload.get("status"),
+                "amount": Decimal(str(payload.get("transaction_amount") or 0)),
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        status = payload.get("status")
+        if order_id not in order_status or STATUS_PRIORITY.get(status, 0) > STATUS_PRIORITY.get(
+            order_status[order_id], 0
+        ):
+            order_status[order_id] = status
+
+    stmt = upsert_statement(Payment.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["provider", "external_payment_id"],
+        set_={
+            "order_id": stmt.excluded.order_id,
+            "status": stmt.excluded.status,
+            "amount": stmt.excluded.amount,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.session.execute(stmt, payment_rows)
+
+    payment_ids = dict(
+        db.session.execute(
+            select(Payment.external_payment_id, Payment.id).where(
+                Payment.provider == PROVIDER,
+                Payment.external_payment_id.in_(list(payloads)),
+            )
+        ).all()
+    )
+    payload_rows = []
+    for pid, payload in payloads.items():
+        encoding, data, size = compress(compact_json(payload))
+        payload_rows.append(
+            {"payment_id": payment_ids[pid], "encoding": encoding, "size": size, "data": data}
+        )
+    stmt = upsert_statement(PaymentPayload.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["payment_id"],
+        set_={c: stmt.excluded[c] for c in ("encoding", "size", "data")},
+    )
+    db.session.execute(stmt, payload_rows)
+
+    # estorno de uma tentativa não cancela pedido com outro pagamento aprovado
+    reversed_orders = [oid for oid, status in order_status.items() if status in REVERSED]
+    if reversed_orders:
+        for order_id in db.session.scalars(
+            select(Payment.order_id)
+            .where(Payment.order_id.in_(reversed_orders), Payment.status == "approved")
+            .distinct()
+        ):
+            order_status[order_id] = "approved"
+    return order_status
+
+
+def apply_order_transitions(order_status, now=None):
+    """Aplica ``{order_id: status_mp}`` em lote. Retorna quantos pedidos mudaram."""
+    now = now or datetime.utcnow()
+    by_target = defaultdict(lambda: defaultdict(list))
+    for order_id, mp_status in order_status.items():
+        transition = ORDER_TRANSITIONS.get(mp_status)
+        if transition and order_id is not None:
+            target, sources = transition
+            by_target[target][sources].append(order_id)
+
+    changed = {}
+    for target, groups in by_target.items():
+        for sources, order_ids in groups.items():
+            ids = db.session.scalars(
+                select(Order.id)
+                .where(Order.id.in_(order_ids), Order.status.in_(sources))
+                .order_by(Order.id)
+                .with_for_update()
+            ).all()
+            if not ids:
+                continue
+            db.session.execute(
+                update(Order)
+                .where(Order.id.in_(ids))
+                .values(status=target, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            changed.update(dict.fromkeys(ids, target))
+
+    if changed:
+        # UPDATE em lote não passa pelo after_flush dos rollups
+        mark_orders_dirty(changed)
+        release_orders([oid for oid, status in changed.items() if status == "cancelado"])
+    return len(changed)
+
+
+def drain_payment_notifications(batch_size=BATCH_SIZE):
+    """Processa um lote do inbox. Retorna quantas notificações foram lidas."""
+    pending = db.session.scalars(
+        select(PaymentNotification)
+        .where(PaymentNotification.processed_at.is_(None))
+        .order_by(PaymentNotification.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not pending:
+        db.session.commit()
+        return 0
+
+    now = datetime.utcnow()
+    payloads, failures = _fetch_all([n.external_payment_id for n in pending])
+
+    known_orders = set(
+        db.session.scalars(
+            select(Order.id).where(
+                Order.id.in_({_order_id(p) for p in payloads.values()} - {None})
+            )
+        )
+    )
+    for pid, payload in list(payloads.items()):
+        if _order_id(payload) not in known_orders:
+            failures[pid] = f"Pedido não encontrado: {payload.get('external_reference')!r}"
+            del payloads[pid]
+
+    changed = 0
+    if payloads:
+        order_status = _save_payments(payloads, now)
+        changed = apply_order_transitions(order_status, now)
+
+    for notification in pending:
+        error = failures.get(notification.external_payment_id)
+        if error is None:
+            notification.processed_at = now
+            notification.error = None
+            continue
+        notification.attempts = (notification.attempts or 0) + 1
+        notification.error = error
+        if notification.attempts >= MAX_ATTEMPTS:
+            notification.processed_at = now
+    db.session.commit()
+
+    if changed:
+        from ..admin.stats import invalidate_dashboard_stats
+
+        invalidate_dashboard_stats()
+    logger.info(
+        "Pagamentos: %s notificações, %s falhas, %s pedidos alterados",
+        len(pending),
+        len(failures),
+        changed,
+    )
+    return len(pending)
+
+
+def notification_backlog():
+    return db.session.scalar(
+        select(func.count(PaymentNotification.id)).where(
+            PaymentNotification.processed_at.is_(None)
+        )
+    )
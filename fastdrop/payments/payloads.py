@@ -0,0 +1,44 @@
+"""Compactação das respostas brutas dos provedores de pagamento.
+
+Usa zstd quando o pacote ``zstandard`` está instalado e zlib caso
+contrário; o codec fica gravado junto do dado, então os dois convivem na
+mesma tabela. O JSON é normalizado (sem espaços, chaves ordenadas) antes
+de compactar.
+"""
+import json
+import zlib
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compact_json(payload):
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+
+def compress(text):
+    """Retorna ``(codec, dados, tamanho_original)``."""
+    raw = text.encode("utf-8")
+    zstandard = _zstd()
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), len(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL), len(raw)
+
+
+def decompress(data, encoding):
+    if encoding == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("Payload em zstd, mas o pacote zstandard não está instalado.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Codec desconhecido: {encoding}")
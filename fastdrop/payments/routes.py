@@ -0,0 +1,28 @@
+from flask import Blueprint, abort, request
+
+from .mercadopago import REQUEST_ID_HEADER, SIGNATURE_HEADER, verify_signature
+from .notifications import store_notification
+
+payments_bp = Blueprint("payments", __name__)
+
+
+@payments_bp.route("/webhook", methods=["POST"])
+def webhook():
+    """Notificação do Mercado Pago: valida, enfileira e responde na hora."""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict) or not isinstance(body.get("data") or {}, dict):
+        abort(400)
+    topic = request.args.get("type") or body.get("type")
+    data_id = request.args.get("data.id") or (body.get("data") or {}).get("id")
+    if not data_id:
+        abort(400)
+    if not verify_signature(
+        data_id,
+        request.headers.get(REQUEST_ID_HEADER),
+        request.headers.get(SIGNATURE_HEADER),
+    ):
+        abort(401)
+    # merchant_order e outros tópicos não mudam pagamento
+    if topic == "payment":
+        store_notification(data_id)
+    return "", 200
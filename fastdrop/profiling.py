@@ -0,0 +1,220 @@
+"""Perfil de SQL por requisição e detecção de N+1.
+
+``SQLProfiler`` escuta ``before/after_cursor_execute`` de todos os engines
+e, durante uma requisição, conta as consultas, soma o tempo no banco e
+agrupa os statements pelo "formato" (texto com parâmetros, listas de
+``IN`` colapsadas). Ao fim da requisição:
+
+- responde com ``Server-Timing: db;dur=...;desc="N queries", app;dur=...``;
+- loga uma linha JSON em ``fastdrop.perf`` (endpoint, status, consultas,
+  tempos e statements repetidos);
+- acumula por endpoint os números mostrados em ``/admin/perf``.
+
+Um mesmo formato executado ``N_PLUS_ONE_THRESHOLD`` vezes ou mais na mesma
+requisição é marcado como suspeita de N+1. Liga com
+``SQL_PROFILING=1`` (desligado, os eventos nem são registrados).
+
+Para testes, ``assert_query_budget(client, url, max_queries)`` faz a
+requisição e falha se ela passar do orçamento de consultas.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("fastdrop.perf")
+
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+MAX_PATTERNS = 200
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|:\w+|%\(\w+\)s|%s)\s*,)+\s*(?:\?|:\w+|%\(\w+\)s|%s)\s*\)")
+
+
+def statement_shape(statement):
+    """Texto normalizado do statement: ``IN (?, ?, ?)`` vira ``IN (...)``."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    return _PARAM_LIST.sub("(...)", shape)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "shapes", "started")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.started = time.perf_counter()
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(s, n) for s, n in self.shapes.most_common() if n >= threshold]
+
+
+class SQLProfiler:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.patterns = {}
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            "SQL_PROFILING", os.environ.get("SQL_PROFILING", "") in ("1", "true")
+        )
+        app.extensions["sql_profiler"] = self
+        if not app.config["SQL_PROFILING"]:
+            return
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._before)
+            event.listen(Engine, "after_cursor_execute", self._after)
+            self._listening = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # ----- eventos do SQLAlchemy -----
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @staticmethod
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        if not has_request_context():
+            return
+        stats = g.get("sql_stats")
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.shapes[statement_shape(statement)] += 1
+
+    # ----- ciclo da requisição -----
+
+    @staticmethod
+    def _start_request():
+        g.sql_stats = RequestStats()
+
+    def _finish_request(self, response):
+        stats = g.pop("sql_stats", None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.db_time * 1000
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={db_ms:.1f};desc="{stats.queries} queries", app;dur={total_ms:.1f}',
+        )
+
+        endpoint = request.endpoint or request.path
+        repeated = stats.repeated()
+        logger.info(
+            json.dumps(
+                {
+                    "endpoint": endpoint,
+                    "method": request.method,
+                    "status": response.status_code,
+                    "queries": stats.queries,
+                    "db_ms": round(db_ms, 1),
+                    "total_ms": round(total_ms, 1),
+                    "repeated": [{"sql": s[:300], "count": n} for s, n in repeated],
+                },
+                ensure_ascii=False,
+            )
+        )
+        self._record(endpoint, stats.queries, db_ms, total_ms, repeated)
+        return response
+
+    def _record(self, endpoint, queries, db_ms, total_ms, repeated):
+        with self._lock:
+            row = self.endpoints.setdefault(
+                endpoint,
+                {"requests": 0, "queries": 0, "db_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            row["requests"] += 1
+            row["queries"] += queries
+            row["db_ms"] += db_ms
+            row["total_ms"] += total_ms
+            row["max_ms"] = max(row["max_ms"], total_ms)
+            for shape, count in repeated:
+                key = (endpoint, shape)
+                pattern = self.patterns.get(key)
+                if pattern is None:
+                    if len(self.patterns) >= MAX_PATTERNS:
+                        continue
+                    pattern = self.patterns[key] = {"requests": 0, "max_count": 0}
+                pattern["requests"] += 1
+                pattern["max_count"] = max(pattern["max_count"], count)
+
+    # ----- relatórios -----
+
+    def slowest_endpoints(self, limit=20):
+        with self._lock:
+            rows = [
+                {
+                    "endpoint": endpoint,
+                    "requests": row["requests"],
+                    "avg_ms": row["total_ms"] / row["requests"],
+                    "avg_db_ms": row["db_ms"] / row["requests"],
+                    "avg_queries": row["queries"] / row["requests"],
+                    "max_ms": row["max_ms"],
+                }
+                for endpoint, row in self.endpoints.items()
+            ]
+        rows.sort(key=lambda r: r["avg_ms"], reverse=True)
+        return rows[:limit]
+
+    def suspected_n_plus_one(self, limit=50):
+        with self._lock:
+            rows = [
+                {"endpoint": endpoint, "sql": shape, **pattern}
+                for (endpoint, shape), pattern in self.patterns.items()
+            ]
+        rows.sort(key=lambda r: (r["max_count"], r["requests"]), reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.patterns.clear()
+
+
+# ---------- Orçamento de consultas (testes) ----------
+
+
+@contextmanager
+def count_queries():
+    """Conta as consultas executadas dentro do bloco (qualquer engine)."""
+    shapes = Counter()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        shapes[statement_shape(statement)] += 1
+
+    event.listen(Engine, "after_cursor_execute", _count)
+    try:
+        yield shapes
+    finally:
+        event.remove(Engine, "after_cursor_execute", _count)
+
+
+def assert_query_budget(client, url, max_queries, method="GET", **kwargs):
+    """Faz a requisição com o test client e falha se passar de ``max_queries``."""
+    with count_queries() as shapes:
+        response = client.open(url, method=method, **kwargs)
+    total = sum(shapes.values())
+    if total > max_queries:
+        detail = "\n".join(f"  {n}x {s[:200]}" for s, n in shapes.most_common(10))
+        raise AssertionError(
+            f"{method} {url}: {total} consultas (orçamento {max_queries})\n{detail}"
+        )
+    return response
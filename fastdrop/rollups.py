@@ -0,0 +1,288 @@
+"""Rollups diários de vendas: ``daily_vendor_sales`` e ``daily_product_sales``.
+
+Relatórios e dashboards leem essas tabelas em vez de varrer ``orders`` e
+``order_items``. A atualização é incremental:
+
+- todo flush do ORM que cria/altera/remove um ``Order`` (status, datas,
+  totais) ou um ``OrderItem`` grava o par (vendedor, dia) em
+  ``rollup_dirty`` na mesma transação; escritas em lote fora do ORM
+  (importação do Bling) chamam ``mark_orders_dirty``;
+- ``refresh_rollups`` (job ``rollups.refresh``) drena a fila e recalcula
+  só aqueles vendedores/dias com ``DELETE`` + ``INSERT ... SELECT``.
+
+``rebuild_rollups`` recalcula tudo (ou a partir de uma data): use depois
+de cargas feitas direto no banco. O dia é a data UTC de ``created_at``.
+"""
+from datetime import date, datetime, time as dt_time, timedelta
+
+from sqlalchemy import delete, distinct, event, func, insert, inspect, literal_column, select
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import (
+    DailyProductSales,
+    DailyVendorSales,
+    Order,
+    OrderItem,
+    RollupDirty,
+)
+
+BATCH_SIZE = 5000
+_ORDER_FIELDS = ("status", "created_at", "vendor_id", "total_cost", "total_vendor_price")
+
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+# ---------- Fila de (vendedor, dia) ----------
+
+
+def _insert_dirty(pairs, connection=None):
+    rows = [
+        {"vendor_id": vendor_id, "day": day}
+        for vendor_id, day in set(pairs)
+        if vendor_id is not None and day is not None
+    ]
+    if rows:
+        (connection or db.session).execute(insert(RollupDirty), rows)
+
+
+def mark_orders_dirty(order_ids, connection=None):
+    """Enfileira os (vendedor, dia) dos pedidos informados."""
+    order_ids = list(set(order_ids))
+    if not order_ids:
+        return
+    executor = connection or db.session
+    rows = executor.execute(
+        select(Order.vendor_id, Order.created_at).where(Order.id.in_(order_ids))
+    ).all()
+    _insert_dirty(((vendor_id, _day(created_at)) for vendor_id, created_at in rows), executor)
+
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(state.obj(), attr)
+
+
+def _capture_order_changes(session, flush_context):
+    pairs = []
+    item_order_ids = []
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Order):
+            pairs.append((obj.vendor_id, _day(obj.created_at)))
+        elif isinstance(obj, OrderItem):
+            item_order_ids.append(obj.order_id)
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if not any(state.attrs[f].history.has_changes() for f in _ORDER_FIELDS):
+                continue
+            pairs.append((obj.vendor_id, _day(obj.created_at)))
+            # mudou de dia ou de vendedor: o par antigo também muda
+            pairs.append(
+                (_old_value(state, "vendor_id"), _day(_old_value(state, "created_at")))
+            )
+        elif isinstance(obj, OrderItem):
+            item_order_ids.append(obj.order_id)
+
+    connection = session.connection()
+    _insert_dirty(pairs, connection)
+    if item_order_ids:
+        mark_orders_dirty([oid for oid in item_order_ids if oid is not None], connection)
+
+
+def register_rollup_events():
+    if not event.contains(Session, "after_flush", _capture_order_changes):
+        event.listen(Session, "after_flush", _capture_order_changes)
+
+
+# ---------- Recalculo ----------
+
+
+def _order_scope(vendor_ids, start, end):
+    criteria = []
+    if vendor_ids is not None:
+        criteria.append(Order.vendor_id.in_(vendor_ids))
+    if start is not None:
+        criteria.append(Order.created_at >= datetime.combine(start, dt_time.min))
+    if end is not None:
+        criteria.append(Order.created_at < datetime.combine(end, dt_time.min))
+    return criteria
+
+
+def _rollup_scope(model, vendor_ids, start, end):
+    criteria = []
+    if vendor_ids is not None:
+        criteria.append(model.vendor_id.in_(vendor_ids))
+    if start is not None:
+        criteria.append(model.day >= start)
+    if end is not None:
+        criteria.append(model.day < end)
+    return criteria
+
+
+def _recompute(vendor_ids=None, start=None, end=None):
+    """Apaga e recalcula os rollups do escopo (vendedores × [start, end))."""
+    order_scope = _order_scope(vendor_ids, start, end)
+    day = func.date(Order.created_at)
+    status = func.coalesce(Order.status, literal_column("'pendente'"))
+
+    db.session.execute(
+        delete(DailyVendorSales).where(
+            *_rollup_scope(DailyVendorSales, vendor_ids, start, end)
+        )
+    )
+    db.session.execute(
+        delete(DailyProductSales).where(
+            *_rollup_scope(DailyProductSales, vendor_ids, start, end)
+        )
+    )
+
+    items = (
+        select(
+            OrderItem.order_id,
+            func.sum(OrderItem.quantity).label("quantity"),
+        )
+        .where(OrderItem.order_id.in_(select(Order.id).where(*order_scope)))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    db.session.execute(
+        insert(DailyVendorSales).from_select(
+            ["vendor_id", "day", "status", "orders", "items", "cost", "vendor_revenue"],
+            select(
+                Order.vendor_id,
+                day,
+                status,
+                func.count(Order.id),
+                func.coalesce(func.sum(items.c.quantity), 0),
+                func.coalesce(func.sum(Order.total_cost), 0),
+                func.coalesce(func.sum(Order.total_vendor_price), 0),
+            )
+            .outerjoin(items, items.c.order_id == Order.id)
+            .where(*order_scope)
+            .group_by(Order.vendor_id, day, status),
+        )
+    )
+    db.session.execute(
+        insert(DailyProductSales).from_select(
+            ["vendor_id", "product_id", "day", "orders", "quantity", "cost", "vendor_revenue"],
+            select(
+                Order.vendor_id,
+                OrderItem.product_id,
+                day,
+                func.count(distinct(Order.id)),
+                func.sum(OrderItem.quantity),
+                func.sum(OrderItem.subtotal_cost),
+                func.sum(OrderItem.subtotal_vendor_price),
+            )
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(*order_scope, Order.status != "cancelado")
+            .group_by(Order.vendor_id, OrderItem.product_id, day),
+        )
+    )
+
+
+def refresh_rollups(batch_size=BATCH_SIZE):
+    """Drena um lote de ``rollup_dirty``. Retorna quantas entradas consumiu."""
+    pending = db.session.execute(
+        select(RollupDirty.id, RollupDirty.vendor_id, RollupDirty.day)
+        .order_by(RollupDirty.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not pending:
+        db.session.commit()
+        return 0
+
+    vendors_by_day = {}
+    for row in pending:
+        vendors_by_day.setdefault(row.day, set()).add(row.vendor_id)
+    for day, vendor_ids in sorted(vendors_by_day.items()):
+        _recompute(sorted(vendor_ids), day, day + timedelta(days=1))
+    db.session.execute(
+        delete(RollupDirty).where(RollupDirty.id.in_([row.id for row in pending]))
+    )
+    db.session.commit()
+
+    from .admin.stats import invalidate_dashboard_stats
+
+    invalidate_dashboard_stats()
+    return len(pending)
+
+
+def rebuild_rollups(since=None):
+    """Recalcula os rollups de todos os vendedores (a partir de ``since``)."""
+    db.session.execute(
+        delete(RollupDirty).where(*([RollupDirty.day >= since] if since else []))
+    )
+    _recompute(start=since)
+    db.session.commit()
+
+    from .admin.stats import invalidate_dashboard_stats
+
+    invalidate_dashboard_stats()
+
+
+# ---------- Leitura ----------
+
+
+def vendor_sales(vendor_id, start, end):
+    """Totais do vendedor em [start, end): pedidos, itens, receita, custo e margem."""
+    row = db.session.execute(
+        select(
+            func.coalesce(func.sum(DailyVendorSales.orders), 0),
+            func.coalesce(func.sum(DailyVendorSales.items), 0),
+            func.coalesce(func.sum(DailyVendorSales.cost), 0),
+            func.coalesce(func.sum(DailyVendorSales.vendor_revenue), 0),
+        ).where(
+            DailyVendorSales.vendor_id == vendor_id,
+            DailyVendorSales.day >= start,
+            DailyVendorSales.day < end,
+            DailyVendorSales.status != "cancelado",
+        )
+    ).one()
+    orders, items, cost, revenue = row
+    return {
+        "orders": orders,
+        "items": items,
+        "cost": cost,
+        "vendor_revenue": revenue,
+        "margin": revenue - cost,
+    }
+
+
+def orders_by_status(vendor_id=None):
+    """``{status: (pedidos, receita)}`` de todo o histórico (ou de um vendedor)."""
+    stmt = select(
+        DailyVendorSales.status,
+        func.sum(DailyVendorSales.orders),
+        func.sum(DailyVendorSales.vendor_revenue),
+    ).group_by(DailyVendorSales.status)
+    if vendor_id is not None:
+        stmt = stmt.where(DailyVendorSales.vendor_id == vendor_id)
+    return {status: (orders, revenue) for status, orders, revenue in db.session.execute(stmt)}
+
+
+def top_products(start, end, limit=20, vendor_id=None):
+    """Produtos mais vendidos em [start, end): (product_id, quantidade, receita)."""
+    stmt = (
+        select(
+            DailyProductSales.product_id,
+            func.sum(DailyProductSales.quantity).label("quantity"),
+            func.sum(DailyProductSales.vendor_revenue).label("vendor_revenue"),
+        )
+        .where(DailyProductSales.day >= start, DailyProductSales.day < end)
+        .group_by(DailyProductSales.product_id)
+        .order_by(func.sum(DailyProductSales.quantity).desc())
+        .limit(limit)
+    )
+    if vendor_id is not None:
+        stmt = stmt.where(DailyProductSales.vendor_id == vendor_id)
+    return db.session.execute(stmt).all()
+
+
+def month_start(today=None):
+    today = today or datetime.utcnow().date()
+    return date(today.year, today.month, 1)
@@ -0,0 +1,322 @@
+"""Busca de produtos por nome, descrição e SKU.
+
+Os índices são específicos de cada banco e criados por ``flask search
+init`` (idempotente; ``flask seed --create-tables`` também chama):
+
+- Postgres: coluna gerada ``products.search_vector`` (``tsvector``, SKU e
+  nome com peso A, descrição com peso C) com índice GIN, e índices de
+  trigramas (``pg_trgm``) em ``lower(sku)`` e ``name`` para SKU parcial e
+  nomes digitados com erro. A coluna gerada se mantém sozinha.
+- SQLite: tabelas FTS5 ``products_fts`` (SKU, nome e descrição) e
+  ``products_sku_fts`` (trigramas do SKU), ambas external content sobre
+  ``products`` e mantidas por triggers.
+
+Nos dois casos o prefixo de SKU usa o índice em ``lower(sku)``. Cada
+estratégia contribui com no máximo ``limit`` resultados, unidos num
+ranking só (menor ``rank`` = mais relevante): prefixo de SKU, SKU parcial,
+texto (nome/SKU antes de descrição) e, no Postgres, semelhança do nome.
+Consultas com cara de SKU (sem espaço, com dígito) só buscam no SKU.
+"""
+import logging
+import re
+
+from sqlalchemy import Float, Integer, column, text
+
+from .extensions import db
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 1000
+MAX_CANDIDATES = 500  # Postgres: linhas ranqueadas por ts_rank_cd
+MIN_QUERY_LENGTH = 2
+SKU_PREFIX_RANK = -1_000_000.0
+SKU_INFIX_RANK = -1_000.0
+# tamanhos do índice de prefixos do FTS5 (``prefix=`` de products_fts)
+SQLITE_PREFIX_MIN, SQLITE_PREFIX_MAX = 2, 6
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_available = {}
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _tokens(q):
+    return _TOKEN.findall((q or "").lower())
+
+
+def _query_words(tokens, typing):
+    """``[(palavra, é_prefixo)]``: só a última palavra, se ainda digitando."""
+    return [(token, typing and i == len(tokens) - 1) for i, token in enumerate(tokens)]
+
+
+def _like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# ---------- DDL ----------
+
+_POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A')
+        || setweight(to_tsvector('portuguese', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_lower ON products (lower(sku) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_trgm ON products USING gin (lower(sku) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+)
+
+_SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        sku, name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6'
+    )
+    """,
+    # SKU parcial: trigramas casam qualquer trecho com 3+ caracteres
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_sku_fts USING fts5(
+        sku, content='products', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, sku, name, description)
+        VALUES (new.id, new.sku, new.name, new.description);
+        INSERT INTO products_sku_fts (rowid, sku) VALUES (new.id, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, sku, name, description)
+        VALUES ('delete', old.id, old.sku, old.name, old.description);
+        INSERT INTO products_sku_fts (products_sku_fts, rowid, sku)
+        VALUES ('delete', old.id, old.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF sku, name, description ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, sku, name, description)
+        VALUES ('delete', old.id, old.sku, old.name, old.description);
+        INSERT INTO products_fts (rowid, sku, name, description)
+        VALUES (new.id, new.sku, new.name, new.description);
+        INSERT INTO products_sku_fts (products_sku_fts, rowid, sku)
+        VALUES ('delete', old.id, old.sku);
+        INSERT INTO products_sku_fts (rowid, sku) VALUES (new.id, new.sku);
+    END
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_lower ON products (lower(sku))",
+)
+
+_SQLITE_REBUILD = (
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+    "INSERT INTO products_sku_fts (products_sku_fts) VALUES ('rebuild')",
+)
+
+
+def search_index_exists():
+    dialect = _dialect()
+    if dialect not in _available:
+        if dialect == "postgresql":
+            sql = (
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'products' AND column_name = 'search_vector'"
+            )
+        elif dialect == "sqlite":
+            sql = (
+                "SELECT 1 FROM sqlite_master WHERE name = 'products_fts' "
+                "AND EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'products_sku_fts')"
+            )
+        else:
+            return False
+        _available[dialect] = db.session.execute(text(sql)).first() is not None
+    return _available[dialect]
+
+
+def ensure_search_index():
+    """Cria (se faltar) os índices de busca do banco em uso."""
+    dialect = _dialect()
+    if dialect == "postgresql":
+        statements = _POSTGRES_DDL
+    elif dialect == "sqlite":
+        created = not search_index_exists()
+        statements = _SQLITE_DDL
+    else:
+        raise RuntimeError(f"Busca não suportada para o banco '{dialect}'.")
+    for statement in statements:
+        db.session.execute(text(statement))
+    if dialect == "sqlite" and created:
+        # as tabelas FTS nascem vazias: indexa os produtos que já existem
+        for statement in _SQLITE_REBUILD:
+            db.session.execute(text(statement))
+    db.session.commit()
+    _available.pop(dialect, None)
+
+
+def rebuild_search_index():
+    """Reindexa tudo (no SQLite, depois de cargas com os triggers ausentes)."""
+    if _dialect() == "sqlite":
+        for statement in _SQLITE_REBUILD:
+            db.session.execute(text(statement))
+    else:
+        db.session.execute(text("REINDEX INDEX ix_products_search_vector"))
+    db.session.commit()
+
+
+# ---------- Consulta ----------
+
+
+def _looks_like_sku(q):
+    return not any(c.isspace() for c in q) and any(c.isdigit() for c in q)
+
+
+def _sku_prefix(q):
+    """``(WHERE, params)`` do prefixo de SKU, usando o índice em ``lower(sku)``."""
+    prefix = q.lower()
+    if _dialect() == "postgresql":
+        return "lower(sku) LIKE :sku_prefix", {"sku_prefix": _like_escape(prefix) + "%"}
+    # limite superior (exclusivo) do prefixo: incrementa o último caractere
+    return "lower(sku) >= :sku_from AND lower(sku) < :sku_to", {
+        "sku_from": prefix,
+        "sku_to": prefix[:-1] + chr(ord(prefix[-1]) + 1),
+    }
+
+
+def _needs_infix(q):
+    # SKU parcial só quando nenhum SKU começa com o texto: trechos comuns
+    # ("seed-00") casam com o catálogo inteiro e custam caro
+    if len(q) < 3:
+        return False
+    where, params = _sku_prefix(q)
+    return db.session.execute(
+        text(f"SELECT 1 FROM products WHERE {where} LIMIT 1"), params
+    ).first() is None
+
+
+def _postgres_match(q, words, limit):
+    where, params = _sku_prefix(q)
+    params.update(q=q.lower(), limit=limit, candidates=max(limit, MAX_CANDIDATES))
+    # ranks fixos vão no SQL: parâmetro sem tipo no UNION vira text no Postgres
+    # sem ORDER BY: text_pattern_ops não serve para ordenar, e o empate é
+    # desfeito pelo id na consulta de fora
+    branches = [
+        f"""(SELECT id, {SKU_PREFIX_RANK} AS rank FROM products
+            WHERE {where} LIMIT :limit)""",
+    ]
+    if _needs_infix(q):
+        params["sku_infix"] = "%" + _like_escape(q.lower()) + "%"
+        branches.append(
+            f"""(SELECT id, {SKU_INFIX_RANK} - similarity(lower(sku), :q) AS rank FROM (
+                    SELECT id, sku FROM products WHERE lower(sku) LIKE :sku_infix
+                    LIMIT :candidates
+                ) AS infix ORDER BY rank LIMIT :limit)"""
+        )
+    if words and not _looks_like_sku(q):
+        params["tsquery"] = " & ".join(
+            f"{word}:*" if prefix else word for word, prefix in words
+        )
+        # ts_rank_cd só sobre os primeiros candidatos: termos comuns casam
+        # com boa parte do catálogo
+        branches.append(
+            """(SELECT id, -ts_rank_cd(search_vector, to_tsquery('portuguese', :tsquery)) AS rank
+                FROM (
+                    SELECT id, search_vector FROM products
+                    WHERE search_vector @@ to_tsquery('portuguese', :tsquery)
+                    LIMIT :candidates
+                ) AS fts ORDER BY rank LIMIT :limit)"""
+        )
+        branches.append(
+            """(SELECT id, 1 - similarity(name, :q) AS rank FROM (
+                    SELECT id, name FROM products WHERE name % :q LIMIT :candidates
+                ) AS fuzzy ORDER BY rank LIMIT :limit)"""
+        )
+    return " UNION ALL ".join(branches), params
+
+
+def _sqlite_match(q, words, limit):
+    where, params = _sku_prefix(q)
+    params["limit"] = limit
+    branches = [
+        f"""SELECT * FROM (SELECT id, {SKU_PREFIX_RANK} AS rank FROM products
+            WHERE {where} ORDER BY lower(sku) LIMIT :limit)""",
+    ]
+    if _needs_infix(q):
+        params["sku_infix"] = '"' + q.replace('"', '""') + '"'
+        branches.append(
+            f"""SELECT * FROM (SELECT rowid AS id, {SKU_INFIX_RANK} AS rank
+                FROM products_sku_fts WHERE products_sku_fts MATCH :sku_infix
+                ORDER BY rowid DESC LIMIT :limit)"""
+        )
+    terms = []
+    for word, prefix in words:
+        if not prefix:
+            terms.append(f'"{word}"')
+        elif len(word) >= SQLITE_PREFIX_MIN:
+            # prefixo maior que o índice de prefixos lê a lista inteira do
+            # termo (~6 ms em palavras comuns): corta no tamanho indexado
+            terms.append(f'"{word[:SQLITE_PREFIX_MAX]}"*')
+    if terms and not _looks_like_sku(q):
+        terms = " ".join(terms)
+        # o bm25 do FTS5 varre a lista inteira de cada termo a cada consulta
+        # (~20 ms para palavras comuns em 500k produtos): ranqueia por campo
+        # (SKU/nome antes de descrição) e, no empate, pelos mais novos
+        params.update(fts_name=f"{{sku name}} : ({terms})", fts=terms)
+        branches.append(
+            """SELECT * FROM (SELECT rowid AS id, 0.0 AS rank FROM products_fts
+                WHERE products_fts MATCH :fts_name ORDER BY rowid DESC LIMIT :limit)"""
+        )
+        branches.append(
+            """SELECT * FROM (SELECT rowid AS id, 1.0 AS rank FROM products_fts
+                WHERE products_fts MATCH :fts ORDER BY rowid DESC LIMIT :limit)"""
+        )
+    return " UNION ALL ".join(branches), params
+
+
+def _fallback_match(q, limit):
+    # sem índice (banco sem `flask search init`): varredura com LIKE
+    pattern = "%" + _like_escape(q.lower()) + "%"
+    sql = """SELECT id, CASE WHEN lower(sku) LIKE :pattern ESCAPE '\\' THEN -1.0 ELSE 0.0 END AS rank
+        FROM products
+        WHERE lower(sku) LIKE :pattern ESCAPE '\\' OR lower(name) LIKE :pattern ESCAPE '\\'
+        LIMIT :limit"""
+    return sql, {"pattern": pattern, "limit": limit}
+
+
+def search_match(q, limit=MAX_RESULTS):
+    """Subquery ``(id, rank)`` dos produtos que casam com ``q``, ou ``None``.
+
+    ``None`` quando ``q`` é curta demais. Um ``id`` aparece uma vez, com o
+    melhor rank entre as estratégias; ordene por ``rank`` ascendente (e
+    pelo id, no empate).
+    """
+    q = (q or "").lstrip()
+    if len(q.strip()) < MIN_QUERY_LENGTH:
+        return None
+    limit = max(1, min(limit, MAX_RESULTS))
+    # sem espaço no fim, a última palavra ainda está sendo digitada: vira prefixo
+    words = _query_words(_tokens(q), typing=not q[-1:].isspace())
+    q = q.strip()
+
+    if not search_index_exists():
+        logger.warning("Índice de busca ausente: rode `flask search init`.")
+        union, params = _fallback_match(q, limit)
+    elif _dialect() == "postgresql":
+        union, params = _postgres_match(q, words, limit)
+    else:
+        union, params = _sqlite_match(q, words, limit)
+
+    stmt = (
+        text(f"SELECT id, MIN(rank) AS rank FROM ({union}) AS candidates GROUP BY id")
+        .bindparams(**params)
+        .columns(column("id", Integer), column("rank", Float))
+    )
+    return stmt.subquery("search")
@@ -0,0 +1,308 @@
+"""Massa de dados sintética para medir o app em volume de produção.
+
+``seed_database`` gera usuários/vendedores, produtos com estoque, pedidos
+com itens e pagamentos usando ``INSERT`` em lote (executemany) com IDs
+calculados a partir do maior ID atual, sem criar objetos do ORM. Os dados
+são determinísticos para a mesma ``seed``.
+
+    flask seed --vendors 1000 --products 100000 --orders 5000000
+
+Todos os usuários gerados usam a senha ``SEED_PASSWORD``; o admin é
+``seed-admin@fastdrop.local``.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select, text
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .http_cache import CATALOG, bump_version
+from .models import (
+    Order,
+    OrderItem,
+    Payment,
+    Product,
+    ProductStock,
+    User,
+    Vendor,
+)
+from .stock import DEFAULT_LOCATION
+
+SEED_PASSWORD = "seed123"
+SEED_ADMIN_EMAIL = "seed-admin@fastdrop.local"
+BATCH_SIZE = 5000
+ORDER_STATUSES = (
+    ("pendente", 15),
+    ("em_separacao", 10),
+    ("enviado", 20),
+    ("entregue", 50),
+    ("cancelado", 5),
+)
+PAYMENT_STATUS = {
+    "pendente": "pending",
+    "cancelado": "rejected",
+}
+HISTORY_DAYS = 730
+
+# vocabulário dos nomes/descrições (para a busca ter o que ranquear)
+PRODUCT_TYPES = (
+    "Camiseta", "Caneca", "Capa de Celular", "Mochila", "Garrafa Térmica",
+    "Fone Bluetooth", "Luminária", "Tapete", "Relógio", "Carregador",
+    "Suporte Veicular", "Necessaire", "Organizador", "Toalha", "Boné",
+    "Meia", "Óculos de Sol", "Pulseira", "Caixa de Som", "Mouse Sem Fio",
+)
+PRODUCT_ATTRIBUTES = (
+    "Algodão", "Inox", "Silicone", "Couro Sintético", "Bambu", "Cerâmica",
+    "Magnético", "Dobrável", "Impermeável", "Infantil", "Premium", "Slim",
+    "LED", "Ergonômico", "Vintage", "Esportivo",
+)
+PRODUCT_COLORS = (
+    "Preto", "Branco", "Azul", "Vermelho", "Verde", "Rosa", "Cinza", "Amarelo",
+)
+
+
+@dataclass
+class SeedReport:
+    counts: dict = field(default_factory=dict)
+
+    def add(self, table, rows):
+        self.counts[table] = self.counts.get(table, 0) + rows
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _insert(model, rows, report):
+    if rows:
+        db.session.execute(insert(model.__table__), rows)
+        report.add(model.__tablename__, len(rows))
+        rows.clear()
+
+
+def _flush_batch(batches, report, limit=BATCH_SIZE):
+    # ordem importa: chaves estrangeiras precisam existir antes
+    if any(len(rows) >= limit for rows in batches.values()):
+        for model, rows in batches.items():
+            _insert(model, rows, report)
+        db.session.commit()
+
+
+def seed_vendors(count, rng, report, password_hash):
+    user_id, vendor_id = _next_id(User), _next_id(Vendor)
+    now = datetime.utcnow()
+    batches = {User: [], Vendor: []}
+    vendor_ids = []
+    for i in range(count):
+        uid, vid = user_id + i, vendor_id + i
+        batches[User].append(
+            {
+                "id": uid,
+                "name": f"Vendedor {uid}",
+                "email": f"vendor{uid}@seed.fastdrop.local",
+                "password_hash": password_hash,
+                "role": "vendor",
+                "active": True,
+                "created_at": now - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+            }
+        )
+        batches[Vendor].append(
+            {
+                "id": vid,
+                "user_id": uid,
+                "company_name": f"Loja {vid}",
+                "document": f"{rng.randint(10**13, 10**14 - 1)}",
+                "bling_connected": False,
+                "created_at": now,
+            }
+        )
+        vendor_ids.append(vid)
+        _flush_batch(batches, report)
+    _flush_batch(batches, report, limit=0)
+    return vendor_ids
+
+
+def _product_name(rng):
+    return (
+        f"{rng.choice(PRODUCT_TYPES)} {rng.choice(PRODUCT_ATTRIBUTES)} "
+        f"{rng.choice(PRODUCT_COLORS)}"
+    )
+
+
+def _product_description(rng):
+    attributes = rng.sample(PRODUCT_ATTRIBUTES, 3)
+    return (
+        f"{rng.choice(PRODUCT_TYPES)} {attributes[0].lower()} e "
+        f"{attributes[1].lower()}, acabamento {attributes[2].lower()}. "
+        f"Disponível em {rng.choice(PRODUCT_COLORS).lower()}."
+    )
+
+
+def seed_products(count, rng, report):
+    product_id = _next_id(Product)
+    now = datetime.utcnow()
+    batches = {Product: [], ProductStock: []}
+    prices = {}
+    for i in range(count):
+        pid = product_id + i
+        cost = Decimal(rng.randint(500, 50000)) / 100
+        wholesale = (cost * Decimal("1.35")).quantize(Decimal("0.01"))
+        batches[Product].append(
+            {
+                "id": pid,
+                "sku": f"SEED-{pid:08d}",
+                "name": _product_name(rng),
+                "description": _product_description(rng),
+                "cost_price": cost,
+                "wholesale_price": wholesale,
+                "suggested_price": (wholesale * Decimal("1.6")).quantize(Decimal("0.01")),
+                "weight": Decimal(rng.randint(50, 20000)) / 1000,
+                "width": rng.randint(5, 60),
+                "height": rng.randint(2, 60),
+                "length": rng.randint(5, 80),
+                "active": rng.random() > 0.05,
+                "created_at": now - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+            }
+        )
+        batches[ProductStock].append(
+            {
+                "product_id": pid,
+                "location": DEFAULT_LOCATION,
+                "estoque_total": rng.choice((0, rng.randint(1, 500))),
+                "estoque_reservado": 0,
+                "updated_at": now,
+            }
+        )
+        prices[pid] = (cost, wholesale)
+        _flush_batch(batches, report)
+    _flush_batch(batches, report, limit=0)
+    return prices
+
+
+def seed_orders(count, vendor_ids, prices, rng, report, max_items=4):
+    order_id, payment_id = _next_id(Order), _next_id(Payment)
+    now = datetime.utcnow()
+    statuses = [s for s, _ in ORDER_STATUSES]
+    weights = [w for _, w in ORDER_STATUSES]
+    product_ids = list(prices)
+    batches = {Order: [], OrderItem: [], Payment: []}
+    for i in range(count):
+        oid = order_id + i
+        status = rng.choices(statuses, weights)[0]
+        created_at = now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        total_cost = total_vendor = Decimal(0)
+        for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(1, max_items))):
+            cost, wholesale = prices[product_id]
+            quantity = rng.randint(1, 3)
+            batches[OrderItem].append(
+                {
+                    "order_id": oid,
+                    "product_id": product_id,
+                    "sku": f"SEED-{product_id:08d}",
+                    "quantity": quantity,
+                    "unit_cost": cost,
+                    "unit_vendor_price": wholesale,
+                    "subtotal_cost": cost * quantity,
+                    "subtotal_vendor_price": wholesale * quantity,
+                }
+            )
+            total_cost += cost * quantity
+            total_vendor += wholesale * quantity
+        batches[Order].append(
+            {
+                "id": oid,
+                "vendor_id": rng.choice(vendor_ids),
+                "origin": "bling",
+                "external_order_id": f"seed-{oid}",
+                "external_number": str(oid),
+                "customer_name": f"Cliente {rng.randint(1, 10**6)}",
+                "shipping_postal_code": f"{rng.randint(1000, 99999):05d}{rng.randint(0, 999):03d}",
+                "status": status,
+                "total_cost": total_cost,
+                "total_vendor_price": total_vendor,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+        )
+        batches[Payment].append(
+            {
+                "id": payment_id + i,
+                "order_id": oid,
+                "provider": "mercadopago",
+                "external_payment_id": f"seed-{payment_id + i}",
+                "status": PAYMENT_STATUS.get(status, "approved"),
+                "amount": total_vendor,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+        )
+        _flush_batch(batches, report)
+    _flush_batch(batches, report, limit=0)
+
+
+def _sync_sequences(*models):
+    """No Postgres, IDs explícitos não avançam as sequences: acerta no fim."""
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            )
+        )
+    db.session.commit()
+
+
+def ensure_seed_admin(password_hash):
+    if User.query.filter_by(email=SEED_ADMIN_EMAIL).first() is None:
+        db.session.add(
+            User(
+                name="Admin (seed)",
+                email=SEED_ADMIN_EMAIL,
+                password_hash=password_hash,
+                role="admin",
+                active=True,
+            )
+        )
+        db.session.commit()
+
+
+def seed_database(vendors=100, products=10_000, orders=100_000, seed=42, progress=None):
+    """Gera a massa de dados e devolve o ``SeedReport`` com linhas por tabela."""
+    rng = random.Random(seed)
+    report = SeedReport()
+    # um hash só: gerar 1k hashes scrypt levaria minutos
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    ensure_seed_admin(password_hash)
+
+    vendor_ids = seed_vendors(vendors, rng, report, password_hash)
+    if progress:
+        progress(f"{len(vendor_ids)} vendedores")
+    prices = seed_products(products, rng, report)
+    if progress:
+        progress(f"{len(prices)} produtos")
+    if orders and vendor_ids and prices:
+        seed_orders(orders, vendor_ids, prices, rng, report)
+        if progress:
+            progress(f"{orders} pedidos")
+
+    _sync_sequences(User, Vendor, Product, ProductStock, Order, OrderItem, Payment)
+
+    # inserts em lote não passam pelo after_flush dos rollups nem do catálogo
+    from .rollups import rebuild_rollups
+
+    rebuild_rollups()
+    bump_version(CATALOG)
+    db.session.commit()
+    if progress:
+        progress("rollups recalculados")
+
+    from .admin.stats import invalidate_dashboard_stats
+
+    invalidate_dashboard_stats()
+    return report
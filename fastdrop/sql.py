@@ -0,0 +1,13 @@
+from .extensions import db
+
+
+def upsert_statement(table):
+    """``INSERT ... ON CONFLICT`` do dialeto em uso (Postgres ou SQLite)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Upsert não suportado para o banco '{dialect}'.")
+    return dialect_insert(table)
@@ -0,0 +1,358 @@
+"""Reserva e baixa de estoque em ``ProductStock``.
+
+Todas as alterações de saldo são ``UPDATE`` condicionais executados no
+banco (nunca ler-modificar-gravar no ORM), sempre na mesma ordem de
+``product_stock.id`` para que transações concorrentes não entrem em
+deadlock. Cada pedido reserva ou libera todas as suas linhas numa única
+transação.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import (
+    DEFAULT_LOCATION,
+    Order,
+    OrderItem,
+    ProductStock,
+    StockOutbox,
+    StockReservation,
+)
+
+RESERVATION_TTL = timedelta(minutes=30)
+# só reservas de pedidos ainda não pagos nem alocados vencem; as demais
+# ficam até o envio (baixa) ou o cancelamento (devolução)
+EXPIRING_STATUSES = ("pendente",)
+SHIPPABLE_STATUSES = ("em_separacao",)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, quantity):
+        super().__init__(
+            f"Estoque insuficiente para o produto {product_id} (pedido: {quantity})."
+        )
+        self.product_id = product_id
+        self.quantity = quantity
+
+
+_available = func.coalesce(ProductStock.estoque_total, 0) - func.coalesce(
+    ProductStock.estoque_reservado, 0
+)
+
+
+# ---------- Outbox de alterações de saldo ----------
+
+
+def record_stock_changes(product_ids, connection=None):
+    """Registra no outbox os produtos cujo saldo disponível mudou.
+
+    Grava na mesma transação da alteração, então o envio aos Blings só
+    acontece se o saldo novo foi de fato confirmado.
+    """
+    rows = [{"product_id": product_id} for product_id in set(product_ids)]
+    if not rows:
+        return
+    (connection or db.session).execute(insert(StockOutbox), rows)
+
+
+def _stock_changed(instance):
+    state = inspect(instance)
+    return any(
+        state.attrs[attr].history.has_changes()
+        for attr in ("estoque_total", "estoque_reservado", "product_id")
+    )
+
+
+def _capture_stock_changes(session, flush_context):
+    product_ids = [
+        obj.product_id
+        for obj in list(session.new) + list(session.deleted)
+        if isinstance(obj, ProductStock)
+    ]
+    product_ids += [
+        obj.product_id
+        for obj in session.dirty
+        if isinstance(obj, ProductStock) and _stock_changed(obj)
+    ]
+    record_stock_changes(
+        [pid for pid in product_ids if pid is not None], session.connection()
+    )
+
+
+def register_stock_events():
+    """Alterações de ``ProductStock`` feitas pelo ORM entram no outbox."""
+    if not event.contains(Session, "after_flush", _capture_stock_changes):
+        event.listen(Session, "after_flush", _capture_stock_changes)
+
+
+# ---------- Reservas ----------
+
+
+def _order_lines(order_id):
+    rows = db.session.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id == order_id)
+        .group_by(OrderItem.product_id)
+    )
+    return {product_id: int(quantity) for product_id, quantity in rows}
+
+
+def _stock_ids(product_ids, location):
+    rows = db.session.execute(
+        select(ProductStock.product_id, ProductStock.id).where(
+            ProductStock.product_id.in_(product_ids),
+            ProductStock.location == location,
+        )
+    )
+    return dict(rows.all())
+
+
+def _reserve_lines(order_id, lines, location, ttl):
+    """Reserva ``{product_id: qty}`` em ``location``. Não faz commit."""
+    stock_ids = _stock_ids(lines.keys(), location)
+    missing = set(lines) - set(stock_ids)
+    if missing:
+        product_id = min(missing)
+        raise InsufficientStock(product_id, lines[product_id])
+
+    expires_at = datetime.utcnow() + ttl
+    reservations = []
+    # ordem determinística de lock: product_stock.id crescente
+    for product_id, stock_id in sorted(stock_ids.items(), key=lambda kv: kv[1]):
+        quantity = lines[product_id]
+        result = db.session.execute(
+            update(ProductStock)
+            .where(ProductStock.id == stock_id, _available >= quantity)
+            .values(
+                estoque_reservado=func.coalesce(ProductStock.estoque_reservado, 0)
+                + quantity,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise InsufficientStock(product_id, quantity)
+        reservations.append(
+            {
+                "order_id": order_id,
+                "product_stock_id": stock_id,
+                "quantity": quantity,
+                "status": "active",
+                "expires_at": expires_at,
+            }
+        )
+
+    db.session.execute(StockReservation.__table__.insert(), reservations)
+    record_stock_changes(lines.keys())
+    return reservations
+
+
+def reserve_order(order, location=DEFAULT_LOCATION, ttl=RESERVATION_TTL):
+    """Reserva todas as linhas do pedido de uma vez.
+
+    Se alguma linha não tiver saldo, nada é reservado e
+    ``InsufficientStock`` é levantada. Chamar de novo para um pedido que já
+    tem reservas ativas não reserva em dobro.
+    """
+    try:
+        # trava a linha do pedido antes de olhar as reservas: chamadas
+        # simultâneas para o mesmo pedido entram em fila (o UPDATE trava
+        # também no SQLite, onde ``FOR UPDATE`` é ignorado)
+        claimed = db.session.execute(
+            update(Order)
+            .where(Order.id == order.id)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        active = db.session.scalar(
+            select(func.count(StockReservation.id)).where(
+                StockReservation.order_id == order.id,
+                StockReservation.status == "active",
+            )
+        )
+        lines = _order_lines(order.id) if claimed and not active else None
+        if not lines:
+            db.session.rollback()
+            return False
+        _reserve_lines(order.id, lines, location, ttl)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+
+def _close_reservations(reservations, new_status):
+    """Encerra reservas ativas e devolve/baixa o saldo. Não faz commit.
+
+    A troca de status é condicional, então uma reserva liberada por duas
+    rotinas ao mesmo tempo (ex.: cancelamento e expiração) só é
+    devolvida ao estoque uma vez.
+    """
+    closed = 0
+    changed = set()
+    for reservation_id, stock_id, product_id, quantity in sorted(
+        reservations, key=lambda r: (r[1], r[0])
+    ):
+        result = db.session.execute(
+            update(StockReservation)
+            .where(
+                StockReservation.id == reservation_id,
+                StockReservation.status == "active",
+            )
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            continue
+        values = {
+            "estoque_reservado": func.coalesce(ProductStock.estoque_reservado, 0)
+            - quantity,
+            "updated_at": datetime.utcnow(),
+        }
+        if new_status == "consumed":
+            values["estoque_total"] = (
+                func.coalesce(ProductStock.estoque_total, 0) - quantity
+            )
+        db.session.execute(
+            update(ProductStock)
+            .where(ProductStock.id == stock_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        changed.add(product_id)
+        closed += 1
+    record_stock_changes(changed)
+    return closed
+
+
+def _active_reservations(*criteria, limit=None):
+    return db.session.execute(
+        select(
+            StockReservation.id,
+            StockReservation.product_stock_id,
+            ProductStock.product_id,
+            StockReservation.quantity,
+        )
+        .join(ProductStock, ProductStock.id == StockReservation.product_stock_id)
+        .where(StockReservation.status == "active", *criteria)
+        .order_by(StockReservation.id)
+        .limit(limit)
+    ).all()
+
+
+def _finish_order(order, new_status):
+    reservations = _active_reservations(StockReservation.order_id == order.id)
+    try:
+        closed = _close_reservations(reservations, new_status)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return closed
+
+
+def release_order(order):
+    """Devolve ao estoque tudo o que o pedido tem reservado."""
+    return _finish_order(order, "released")
+
+
+def consume_order(order):
+    """Dá baixa definitiva no estoque reservado (pedido enviado)."""
+    return _finish_order(order, "consumed")
+
+
+def release_orders(order_ids):
+    """Devolve ao estoque as reservas de vários pedidos. Não faz commit."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    reservations = _active_reservations(StockReservation.order_id.in_(order_ids))
+    return _close_reservations(reservations, "released")
+
+
+def consume_orders(order_ids):
+    """Dá baixa nas reservas de vários pedidos. Não faz commit."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    reservations = _active_reservations(StockReservation.order_id.in_(order_ids))
+    return _close_reservations(reservations, "consumed")
+
+
+def ship_orders(order_ids, now=None):
+    """Marca pedidos em separação como enviados e dá baixa no estoque.
+
+    A troca de status é condicional (``em_separacao`` -> ``enviado``) e a
+    baixa acontece na mesma transação. Só envia pedidos com reservas
+    ativas: sem reserva não há o que baixar, e o envio venderia estoque
+    que não foi separado (pedido pago ainda não alocado). Retorna os ids
+    que mudaram; os demais ficam como estão.
+    """
+    from .admin.stats import invalidate_dashboard_stats
+    from .rollups import mark_orders_dirty
+
+    now = now or datetime.utcnow()
+    try:
+        ids = db.session.scalars(
+            select(Order.id)
+            .where(
+                Order.id.in_(list(order_ids)),
+                Order.status.in_(SHIPPABLE_STATUSES),
+                select(StockReservation.id)
+                .where(
+                    StockReservation.order_id == Order.id,
+                    StockReservation.status == "active",
+                )
+                .exists(),
+            )
+            .order_by(Order.id)
+            .with_for_update()
+        ).all()
+        if ids:
+            db.session.execute(
+                update(Order)
+                .where(Order.id.in_(ids))
+                .values(status="enviado", updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            consume_orders(ids)
+            # UPDATE em lote não passa pelo after_flush dos rollups
+            mark_orders_dirty(ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if ids:
+        invalidate_dashboard_stats()
+    return ids
+
+
+def expire_reservations(now=None, batch_size=500):
+    """Libera reservas vencidas de pedidos pendentes e não alocados.
+
+    Pedidos pagos ou já alocados seguram o saldo até ``ship_orders`` ou o
+    cancelamento, qualquer que seja o ``expires_at``. Retorna quantas
+    reservas foram expiradas.
+    """
+    now = now or datetime.utcnow()
+    expiring_orders = select(Order.id).where(
+        Order.status.in_(EXPIRING_STATUSES), Order.allocated_at.is_(None)
+    )
+    total = 0
+    while True:
+        reservations = _active_reservations(
+            StockReservation.expires_at <= now,
+            StockReservation.order_id.in_(expiring_orders),
+            limit=batch_size,
+        )
+        if not reservations:
+            return total
+        try:
+            total += _close_reservations(reservations, "expired")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
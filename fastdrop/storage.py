@@ -0,0 +1,184 @@
+"""Acesso ao S3 das imagens de produto.
+
+O boto3 só é importado no primeiro uso (custa ~0,25 s no boot de cada
+worker) e o client é criado uma vez por processo e reutilizado (é
+thread-safe). O fluxo normal é o navegador enviar o arquivo direto para o
+S3 com um POST pré-assinado e a aplicação só gravar a chave; arquivos
+grandes usam multipart com URLs pré-assinadas por parte.
+``AWS_S3_ENDPOINT_URL`` permite apontar para um MinIO/moto local.
+"""
+import os
+import threading
+import uuid
+
+from werkzeug.utils import secure_filename
+
+UPLOAD_FOLDER = "products"
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+PRESIGN_EXPIRES = 600
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MAX_MULTIPART_PARTS = 1000
+
+_s3_client = None
+_transfer_config = None
+_s3_lock = threading.Lock()
+
+
+def _region():
+    return os.getenv("AWS_S3_REGION") or os.getenv("AWS_REGION") or "us-east-2"
+
+
+def get_bucket():
+    bucket = (
+        os.getenv("AWS_BUCKET_NAME")
+        or os.getenv("S3_BUCKET_NAME")
+        or os.getenv("AWS_S3_BUCKET")
+    )
+    if not bucket:
+        raise RuntimeError("Bucket S3 não configurado nas variáveis de ambiente.")
+    return bucket
+
+
+def get_s3_client():
+    """Client do S3 compartilhado pelo processo, criado no primeiro uso."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+
+                _s3_client = boto3.client(
+                    "s3",
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    region_name=_region(),
+                    endpoint_url=os.getenv("AWS_S3_ENDPOINT_URL") or None,
+                )
+    return _s3_client
+
+
+def _get_transfer_config():
+    global _transfer_config
+    if _transfer_config is None:
+        from boto3.s3.transfer import TransferConfig
+
+        _transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_PART_SIZE,
+            multipart_chunksize=MULTIPART_PART_SIZE,
+        )
+    return _transfer_config
+
+
+def public_url(key):
+    if not key:
+        return None
+    endpoint = os.getenv("AWS_S3_ENDPOINT_URL")
+    if endpoint:
+        return f"{endpoint.rstrip('/')}/{get_bucket()}/{key}"
+    return f"https://{get_bucket()}.s3.{_region()}.amazonaws.com/{key}"
+
+
+def new_object_key(filename, folder=UPLOAD_FOLDER):
+    filename = secure_filename(filename or "")
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "jpg"
+    return f"{folder}/{uuid.uuid4().hex}.{ext}"
+
+
+def is_upload_key(key, folder=UPLOAD_FOLDER):
+    """Só aceita chaves geradas por ``new_object_key`` na pasta esperada."""
+    return bool(key) and key.startswith(f"{folder}/") and ".." not in key
+
+
+def upload_image_to_s3(file_obj, folder=UPLOAD_FOLDER):
+    """Envia o arquivo pelo servidor e devolve a chave no S3.
+
+    Caminho de fallback para navegadores sem JavaScript; o formulário
+    normalmente envia direto ao S3 com ``create_presigned_post``.
+    """
+    if not file_obj or file_obj.filename == "":
+        return None
+
+    key = new_object_key(file_obj.filename, folder)
+    # IMPORTANTE: sem ACL (bucket owner enforced)
+    get_s3_client().upload_fileobj(
+        file_obj,
+        get_bucket(),
+        key,
+        ExtraArgs={"ContentType": file_obj.mimetype},
+        Config=_get_transfer_config(),
+    )
+    return key
+
+
+def create_presigned_post(filename, content_type, folder=UPLOAD_FOLDER):
+    """Formulário pré-assinado para o navegador enviar a imagem ao S3."""
+    key = new_object_key(filename, folder)
+    post = get_s3_client().generate_presigned_post(
+        Bucket=get_bucket(),
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, MAX_IMAGE_SIZE],
+        ],
+        ExpiresIn=PRESIGN_EXPIRES,
+    )
+    return {"url": post["url"], "fields": post["fields"], "key": key}
+
+
+def start_multipart_upload(filename, content_type, size, folder=UPLOAD_FOLDER):
+    """Inicia um upload multipart e devolve uma URL pré-assinada por parte."""
+    parts = max(1, -(-int(size) // MULTIPART_PART_SIZE))
+    if parts > MAX_MULTIPART_PARTS:
+        raise ValueError("Arquivo grande demais.")
+
+    s3 = get_s3_client()
+    bucket = get_bucket()
+    key = new_object_key(filename, folder)
+    upload_id = s3.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType=content_type
+    )["UploadId"]
+    urls = [
+        s3.generate_presigned_url(
+            "upload_part",
+            Params={
+                "Bucket": bucket,
+                "Key": key,
+                "UploadId": upload_id,
+                "PartNumber": number,
+            },
+            ExpiresIn=PRESIGN_EXPIRES,
+        )
+        for number in range(1, parts + 1)
+    ]
+    return {
+        "key": key,
+        "upload_id": upload_id,
+        "part_size": MULTIPART_PART_SIZE,
+        "urls": urls,
+    }
+
+
+def complete_multipart_upload(key, upload_id, parts):
+    """``parts``: lista de ``{"PartNumber": n, "ETag": "..."}`` vinda do navegador."""
+    get_s3_client().complete_multipart_upload(
+        Bucket=get_bucket(),
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": sorted(
+                (
+                    {"PartNumber": int(p["PartNumber"]), "ETag": p["ETag"]}
+                    for p in parts
+                ),
+                key=lambda p: p["PartNumber"],
+            )
+        },
+    )
+    return key
+
+
+def abort_multipart_upload(key, upload_id):
+    get_s3_client().abort_multipart_upload(
+        Bucket=get_bucket(), Key=key, UploadId=upload_id
+    )
@@ -0,0 +1,78 @@
+"""Jobs registrados na fila (ver ``fastdrop.jobs``)."""
+from .jobs import job
+
+QUEUE_DEFAULT = "default"
+QUEUE_IMAGES = "images"
+QUEUE_SYNC = "sync"
+
+
+@job("images.process", queue=QUEUE_IMAGES)
+def process_image(product_id):
+    from .images import process_product_image
+
+    process_product_image(product_id)
+
+
+@job("bling.connect", queue=QUEUE_DEFAULT, max_attempts=2)
+def connect_bling(vendor_id, code, redirect_uri):
+    # o code do OAuth expira em poucos minutos: não adianta insistir muito
+    from .bling.accounts import connect_vendor
+
+    connect_vendor(vendor_id, code, redirect_uri)
+
+
+@job("bling.import_orders", queue=QUEUE_SYNC, every=300)
+def import_bling_orders():
+    from .bling.orders import import_all_vendors
+
+    import_all_vendors()
+
+
+@job("bling.drain_webhooks", queue=QUEUE_SYNC, every=5)
+def drain_bling_webhooks():
+    from .bling.webhooks import BATCH_SIZE, drain_webhook_inbox
+
+    while drain_webhook_inbox() == BATCH_SIZE:
+        pass
+
+
+@job("payments.drain", queue=QUEUE_SYNC, every=5)
+def drain_payment_notifications():
+    from .payments.notifications import BATCH_SIZE, drain_payment_notifications as drain
+
+    while drain() == BATCH_SIZE:
+        pass
+
+
+@job("stock.propagate", queue=QUEUE_SYNC, every=10)
+def propagate_stock():
+    from .bling import stock_sync
+
+    # emenda lotes enquanto houver backlog
+    while True:
+        stock_sync.propagate_stock()
+        run = stock_sync.last_run
+        if run.get("changes", 0) < stock_sync.BATCH_SIZE or run.get("failed_vendors"):
+            break
+
+
+@job("stock.expire_reservations", queue=QUEUE_DEFAULT, every=60)
+def expire_reservations():
+    from .stock import expire_reservations as expire
+
+    expire()
+
+
+@job("stock.allocate", queue=QUEUE_DEFAULT, every=60)
+def allocate_orders():
+    from .allocation import allocate_all
+
+    allocate_all()
+
+
+@job("rollups.refresh", queue=QUEUE_SYNC, every=30)
+def refresh_rollups():
+    from .rollups import BATCH_SIZE, refresh_rollups as refresh
+
+    while refresh() >= BATCH_SIZE:
+        pass
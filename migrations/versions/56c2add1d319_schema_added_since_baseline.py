@@ -0,0 +1,376 @@
+"""schema added since baseline
+
+Tabelas, colunas, índices e unique constraints criados depois do
+schema inicial, mais os índices de busca de ``fastdrop/search.py`` (os
+mesmos de ``flask search init``, que continua idempotente).
+
+Revision ID: 56c2add1d319
+Revises: bd6750a0c853
+Create Date: 2026-10-18 05:28:39.372092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+DEFAULT_LOCATION = "CD-DEFAULT"
+
+POSTGRES_SEARCH = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A')
+        || setweight(to_tsvector('portuguese', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_lower ON products (lower(sku) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_trgm ON products USING gin (lower(sku) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+)
+
+SQLITE_SEARCH = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        sku, name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_sku_fts USING fts5(
+        sku, content='products', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, sku, name, description)
+        VALUES (new.id, new.sku, new.name, new.description);
+        INSERT INTO products_sku_fts (rowid, sku) VALUES (new.id, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, sku, name, description)
+        VALUES ('delete', old.id, old.sku, old.name, old.description);
+        INSERT INTO products_sku_fts (products_sku_fts, rowid, sku)
+        VALUES ('delete', old.id, old.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF sku, name, description ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, sku, name, description)
+        VALUES ('delete', old.id, old.sku, old.name, old.description);
+        INSERT INTO products_fts (rowid, sku, name, description)
+        VALUES (new.id, new.sku, new.name, new.description);
+        INSERT INTO products_sku_fts (products_sku_fts, rowid, sku)
+        VALUES ('delete', old.id, old.sku);
+        INSERT INTO products_sku_fts (rowid, sku) VALUES (new.id, new.sku);
+    END
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_lower ON products (lower(sku))",
+    # as tabelas FTS nascem vazias: indexa os produtos que já existem
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+    "INSERT INTO products_sku_fts (products_sku_fts) VALUES ('rebuild')",
+)
+
+POSTGRES_SEARCH_DROP = (
+    "DROP INDEX IF EXISTS ix_products_name_trgm",
+    "DROP INDEX IF EXISTS ix_products_sku_trgm",
+    "DROP INDEX IF EXISTS ix_products_sku_lower",
+    "DROP INDEX IF EXISTS ix_products_search_vector",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+)
+
+SQLITE_SEARCH_DROP = (
+    "DROP TRIGGER IF EXISTS products_fts_au",
+    "DROP TRIGGER IF EXISTS products_fts_ad",
+    "DROP TRIGGER IF EXISTS products_fts_ai",
+    "DROP TABLE IF EXISTS products_sku_fts",
+    "DROP TABLE IF EXISTS products_fts",
+    "DROP INDEX IF EXISTS ix_products_sku_lower",
+)
+
+
+def _search_statements(postgres, sqlite):
+    dialect = op.get_context().dialect.name
+    return {"postgresql": postgres, "sqlite": sqlite}.get(dialect, ())
+
+
+# revision identifiers, used by Alembic.
+revision = '56c2add1d319'
+down_revision = 'bd6750a0c853'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('bling_webhook_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.String(length=100), nullable=False),
+    sa.Column('company_id', sa.String(length=100), nullable=True),
+    sa.Column('event', sa.String(length=100), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    with op.batch_alter_table('bling_webhook_events', schema=None) as batch_op:
+        batch_op.create_index('ix_bling_webhook_events_pending', ['processed_at', 'id'], unique=False)
+
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('queue', sa.String(length=50), nullable=False),
+    sa.Column('args', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('max_attempts', sa.Integer(), nullable=True),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('interval_seconds', sa.Integer(), nullable=True),
+    sa.Column('unique_key', sa.String(length=150), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('unique_key')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_claim', ['queue', 'status', 'run_at'], unique=False)
+
+    op.create_table('payment_notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('external_payment_id', sa.String(length=100), nullable=False),
+    sa.Column('notifications', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('external_payment_id')
+    )
+    with op.batch_alter_table('payment_notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_notifications_pending', ['processed_at', 'id'], unique=False)
+
+    op.create_table('rollup_dirty',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('warehouses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('postal_code', sa.String(length=9), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('code')
+    )
+    op.create_table('stock_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_stock_outbox_pending', ['processed_at', 'id'], unique=False)
+
+    op.create_table('daily_product_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('vendor_revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['vendor_id'], ['vendors.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('vendor_id', 'day', 'product_id', name='uq_daily_product_sales')
+    )
+    with op.batch_alter_table('daily_product_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_product_sales_day', ['day'], unique=False)
+        batch_op.create_index('ix_daily_product_sales_product_day', ['product_id', 'day'], unique=False)
+
+    op.create_table('daily_vendor_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('items', sa.Integer(), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('vendor_revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['vendor_id'], ['vendors.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('vendor_id', 'day', 'status', name='uq_daily_vendor_sales')
+    )
+    with op.batch_alter_table('daily_vendor_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_vendor_sales_day', ['day'], unique=False)
+
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_stock_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_stock_id'], ['product_stock.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_reservations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_reservations_order_id'), ['order_id'], unique=False)
+        batch_op.create_index('ix_stock_reservations_status_expires', ['status', 'expires_at'], unique=False)
+
+    op.create_table('payment_payloads',
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.Column('encoding', sa.String(length=10), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['payment_id'], ['payments.id'], ),
+    sa.PrimaryKeyConstraint('payment_id')
+    )
+    with op.batch_alter_table('bling_accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('orders_synced_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('company_id', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_bling_accounts_company_id'), ['company_id'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shipping_postal_code', sa.String(length=9), nullable=True))
+        batch_op.add_column(sa.Column('allocated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_orders_allocation', ['status', 'allocated_at', 'id'], unique=False)
+        batch_op.create_index('ix_orders_created', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_orders_external_number', ['external_number'], unique=False)
+        batch_op.create_index('ix_orders_status_created', ['status', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_orders_vendor_created', ['vendor_id', 'created_at', 'id'], unique=False)
+        batch_op.create_unique_constraint('uq_orders_vendor_external', ['vendor_id', 'external_order_id'])
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_order_id', ['order_id'], unique=False)
+        batch_op.create_unique_constraint('uq_payments_provider_external', ['provider', 'external_payment_id'])
+
+    # estoque sem local vira o CD padrão antes da unique (product_id, location);
+    # produto com duas linhas no mesmo local precisa ser consolidado à mão
+    op.execute(
+        sa.text("UPDATE product_stock SET location = :location WHERE location IS NULL")
+        .bindparams(location=DEFAULT_LOCATION)
+    )
+    with op.batch_alter_table('product_stock', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_stock_product_id'), ['product_id'], unique=False)
+        batch_op.create_unique_constraint('uq_product_stock_location', ['product_id', 'location'])
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_key', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('image_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_key', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('webp_key', sa.String(length=255), nullable=True))
+        batch_op.create_index(batch_op.f('ix_products_image_hash'), ['image_hash'], unique=False)
+
+    # ### end Alembic commands ###
+
+    for statement in _search_statements(POSTGRES_SEARCH, SQLITE_SEARCH):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in _search_statements(POSTGRES_SEARCH_DROP, SQLITE_SEARCH_DROP):
+        op.execute(statement)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_image_hash'))
+        batch_op.drop_column('webp_key')
+        batch_op.drop_column('thumbnail_key')
+        batch_op.drop_column('image_hash')
+        batch_op.drop_column('image_key')
+
+    with op.batch_alter_table('product_stock', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_product_stock_location', type_='unique')
+        batch_op.drop_index(batch_op.f('ix_product_stock_product_id'))
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_payments_provider_external', type_='unique')
+        batch_op.drop_index('ix_payments_order_id')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_orders_vendor_external', type_='unique')
+        batch_op.drop_index('ix_orders_vendor_created')
+        batch_op.drop_index('ix_orders_status_created')
+        batch_op.drop_index('ix_orders_external_number')
+        batch_op.drop_index('ix_orders_created')
+        batch_op.drop_index('ix_orders_allocation')
+        batch_op.drop_column('allocated_at')
+        batch_op.drop_column('shipping_postal_code')
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+
+    with op.batch_alter_table('bling_accounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_bling_accounts_company_id'))
+        batch_op.drop_column('company_id')
+        batch_op.drop_column('orders_synced_at')
+
+    op.drop_table('payment_payloads')
+    with op.batch_alter_table('stock_reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_reservations_status_expires')
+        batch_op.drop_index(batch_op.f('ix_stock_reservations_order_id'))
+
+    op.drop_table('stock_reservations')
+    with op.batch_alter_table('daily_vendor_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_vendor_sales_day')
+
+    op.drop_table('daily_vendor_sales')
+    with op.batch_alter_table('daily_product_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_product_sales_product_day')
+        batch_op.drop_index('ix_daily_product_sales_day')
+
+    op.drop_table('daily_product_sales')
+    with op.batch_alter_table('stock_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_outbox_pending')
+
+    op.drop_table('stock_outbox')
+    op.drop_table('warehouses')
+    op.drop_table('rollup_dirty')
+    with op.batch_alter_table('payment_notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_notifications_pending')
+
+    op.drop_table('payment_notifications')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_claim')
+
+    op.drop_table('jobs')
+    op.drop_table('cache_versions')
+    with op.batch_alter_table('bling_webhook_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_bling_webhook_events_pending')
+
+    op.drop_table('bling_webhook_events')
+    # ### end Alembic commands ###